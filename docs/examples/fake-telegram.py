@@ -0,0 +1,196 @@
+"""
+Step1ne Headhunter System - 本機 Fake Telegram（測試 webhook 模式用）
+
+同時扮演 Telegram 的兩端：
+- Fake Bot API：接收 Bot 的 getMe / setWebhook / sendMessage 等呼叫並記錄
+- Fake update 發送端：把假的 update POST 到 Bot 的 webhook，量測「訊息 → 回覆」延遲
+
+使用方式：
+    # 1. 先啟動 fake（等待 Bot 註冊 webhook）
+    python fake-telegram.py --updates 200 --duplicates 0.1
+
+    # 2. 另一個終端機啟動 Bot，指向 fake Bot API
+    TELEGRAM_API_BASE=http://127.0.0.1:8081/bot WEBHOOK_URL=http://127.0.0.1:8443/telegram \\
+        python telegram-bot.py --webhook --workers 4
+
+需要安裝：pip install aiohttp
+"""
+
+from aiohttp import web, ClientSession
+import argparse
+import asyncio
+import json
+import random
+import time
+
+# ========================================
+# Fake Bot API
+# ========================================
+
+class FakeBotAPI:
+    """記錄 Bot 呼叫的 Telegram Bot API 替身"""
+
+    def __init__(self):
+        self.webhook_url = None
+        self.webhook_secret = None
+        self.webhook_ready = asyncio.Event()
+        self.message_id = 0
+        self.calls = {}
+        self.replies = {}  # chat_id → asyncio.Future（收到第一則回覆時完成）
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = await self._read_params(request)
+
+        if method == 'getMe':
+            return self._ok({'id': 1, 'is_bot': True, 'first_name': 'Step1ne', 'username': 'step1ne_fake_bot'})
+
+        if method == 'setWebhook':
+            self.webhook_url = params.get('url')
+            self.webhook_secret = params.get('secret_token')
+            self.webhook_ready.set()
+            return self._ok(True)
+
+        if method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params.get('chat_id', 0))
+            future = self.replies.get(chat_id)
+            if future and not future.done():
+                future.set_result(time.perf_counter())
+            self.message_id += 1
+            return self._ok({
+                'message_id': self.message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text', '')
+            })
+
+        # 其他方法（answerCallbackQuery、deleteWebhook...）一律成功
+        return self._ok(True)
+
+    async def _read_params(self, request):
+        if request.content_type == 'application/json':
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            if isinstance(value, str):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            params[key] = value
+        return params
+
+    def _ok(self, result):
+        return web.json_response({'ok': True, 'result': result})
+
+
+# ========================================
+# Fake update 發送端
+# ========================================
+
+def make_update(update_id, chat_id, text):
+    """組合一個最小可用的 message update"""
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': f'Tester{chat_id}'},
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        }
+    }
+
+
+async def send_updates(api, webhook_url, count, text, duplicate_ratio, concurrency, timeout):
+    """送出 update 並等待 Bot 回覆，回傳延遲清單（秒）"""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {'X-Telegram-Bot-Api-Secret-Token': api.webhook_secret} if api.webhook_secret else {}
+
+    async with ClientSession() as session:
+        async def send_one(update_id):
+            chat_id = 100000 + update_id
+            future = asyncio.get_running_loop().create_future()
+            api.replies[chat_id] = future
+            update = make_update(update_id, chat_id, text)
+
+            async with semaphore:
+                started = time.perf_counter()
+                async with session.post(webhook_url, json=update, headers=headers) as response:
+                    response.raise_for_status()
+                # 模擬 Telegram 重送：同一個 update 再送一次，Bot 應該只回覆一次
+                if random.random() < duplicate_ratio:
+                    async with session.post(webhook_url, json=update, headers=headers) as response:
+                        response.raise_for_status()
+                try:
+                    replied = await asyncio.wait_for(future, timeout)
+                    latencies.append(replied - started)
+                except asyncio.TimeoutError:
+                    print(f'  ⚠️  update {update_id} 沒有收到回覆')
+
+        await asyncio.gather(*(send_one(i) for i in range(1, count + 1)))
+
+    return latencies
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+
+async def run(args):
+    api = FakeBotAPI()
+    app = web.Application()
+    app.router.add_post('/bot{token}/{method}', api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', args.api_port).start()
+
+    print(f'🧪 Fake Bot API：http://127.0.0.1:{args.api_port}/bot')
+    print('   等待 Bot 呼叫 setWebhook...')
+    await api.webhook_ready.wait()
+    webhook_url = args.webhook or api.webhook_url
+    print(f'✅ Webhook 已註冊：{webhook_url}')
+
+    started = time.perf_counter()
+    latencies = await send_updates(
+        api, webhook_url, args.updates, args.text,
+        args.duplicates, args.concurrency, args.timeout
+    )
+    elapsed = time.perf_counter() - started
+
+    # 等一下讓重送的 update（若未被去重）有機會產生多餘回覆
+    await asyncio.sleep(1)
+    replies = api.calls.get('sendMessage', 0)
+
+    print(f'\n📊 送出 {args.updates} 個 update，{elapsed:.2f} 秒')
+    print(f'   收到回覆：{len(latencies)} 個（sendMessage 共 {replies} 次）')
+    print(f'   延遲 p50：{percentile(latencies, 0.50) * 1000:.1f} ms')
+    print(f'   延遲 p95：{percentile(latencies, 0.95) * 1000:.1f} ms')
+    print(f'   延遲 p99：{percentile(latencies, 0.99) * 1000:.1f} ms')
+    if replies > args.updates:
+        print(f'❌ 有 {replies - args.updates} 則重複回覆，去重失效')
+
+    await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本機 Fake Telegram（webhook 模式測試）")
+    parser.add_argument("--api-port", type=int, default=8081, help="Fake Bot API 監聽 port")
+    parser.add_argument("--webhook", help="Bot 的 webhook 網址（預設使用 setWebhook 註冊的網址）")
+    parser.add_argument("--updates", type=int, default=100, help="送出的 update 數量")
+    parser.add_argument("--text", default="/start", help="訊息內容")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="重送比例（0~1）")
+    parser.add_argument("--concurrency", type=int, default=20, help="同時送出的 update 數量")
+    parser.add_argument("--timeout", type=float, default=10.0, help="等待回覆的秒數")
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+Step1ne Headhunter System - 壓力測試
+
+用 python-bot.py 的 API 函數產生負載，量測各情境的延遲分布。
+採用開放式（open-loop）到達模型：請求依 Poisson 到達率送出，不會因為
+後端變慢而自動降速，延遲從「預定送出時間」起算，排隊時間也會計入。
+
+情境：
+- search       search_candidates(grade=...)
+- get          get_candidate(id)
+- grade        grade_candidate(id)
+- batch_match  match_candidates_to_job(job_id, ids)
+
+使用方式：
+    # 自動啟動本機替身 API（stub-api.py）並執行 30 秒、每秒 50 個請求
+    python load-test.py --spawn-stub --rate 50 --duration 30 --mix search=2,get=10,grade=3,batch_match=1
+
+    # 對既有環境測試（請勿對正式環境執行）
+    python load-test.py --api http://localhost:3001/api --rate 10 --duration 60
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import importlib.util
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+EXAMPLES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_bot_client():
+    """載入 python-bot.py（檔名含連字號，無法直接 import）"""
+    spec = importlib.util.spec_from_file_location('python_bot', os.path.join(EXAMPLES_DIR, 'python-bot.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# ========================================
+# 延遲直方圖
+# ========================================
+
+class LatencyHistogram:
+    """
+    對數刻度直方圖（每 10 倍切 BUCKETS_PER_DECADE 格，約 6% 解析度）
+
+    記憶體固定，適合長時間壓測；百分位數取所在 bucket 的上界。
+    """
+
+    BUCKETS_PER_DECADE = 40
+    MIN_MS = 0.1
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.lock = threading.Lock()
+
+    def _bucket(self, ms):
+        return max(int(math.log10(max(ms, self.MIN_MS) / self.MIN_MS) * self.BUCKETS_PER_DECADE), 0)
+
+    def _upper_bound(self, bucket):
+        return self.MIN_MS * 10 ** ((bucket + 1) / self.BUCKETS_PER_DECADE)
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        bucket = self._bucket(ms)
+        with self.lock:
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        target = p * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return min(self._upper_bound(bucket), self.max_ms)
+        return self.max_ms
+
+    def merge(self, other):
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 2) if self.count else 0,
+            'p50_ms': round(self.percentile(0.50), 2),
+            'p90_ms': round(self.percentile(0.90), 2),
+            'p99_ms': round(self.percentile(0.99), 2),
+            'max_ms': round(self.max_ms, 2),
+            'buckets': {f'{self._upper_bound(b):.2f}': n for b, n in sorted(self.buckets.items())}
+        }
+
+    def render(self, width=40):
+        """ASCII 直方圖（合併成每 10 倍 4 格顯示）"""
+        coarse = {}
+        step = self.BUCKETS_PER_DECADE // 4
+        for bucket, count in self.buckets.items():
+            coarse[bucket // step] = coarse.get(bucket // step, 0) + count
+        if not coarse:
+            return ''
+        peak = max(coarse.values())
+        lines = []
+        for b in range(min(coarse), max(coarse) + 1):
+            count = coarse.get(b, 0)
+            upper = self.MIN_MS * 10 ** ((b + 1) * step / self.BUCKETS_PER_DECADE)
+            lines.append(f'   ≤{upper:>9.1f} ms │{"█" * round(count / peak * width):<{width}} {count}')
+        return '\n'.join(lines)
+
+
+# ========================================
+# 情境
+# ========================================
+
+class Scenarios:
+    """各情境的呼叫方式（候選人/職缺 ID 在開始前先抓好）"""
+
+    def __init__(self, bot, batch_size):
+        self.bot = bot
+        self.batch_size = batch_size
+        self.candidate_ids = [c['id'] for c in bot.search_candidates()]
+        self.job_ids = [j['id'] for j in bot.search_jobs()]
+        if not self.candidate_ids or not self.job_ids:
+            raise RuntimeError('API 沒有候選人或職缺資料，無法執行壓測')
+
+    def search(self, rng):
+        return self.bot.search_candidates(grade=rng.choice(['S', 'A+', 'A', 'B']))
+
+    def get(self, rng):
+        return self.bot.get_candidate(rng.choice(self.candidate_ids))
+
+    def grade(self, rng):
+        return self.bot.grade_candidate(rng.choice(self.candidate_ids))
+
+    def batch_match(self, rng):
+        ids = rng.sample(self.candidate_ids, min(self.batch_size, len(self.candidate_ids)))
+        return self.bot.match_candidates_to_job(rng.choice(self.job_ids), ids)
+
+
+def parse_mix(text):
+    """'search=2,get=10' → {'search': 2.0, 'get': 10.0}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if not hasattr(Scenarios, name) or name.startswith('_'):
+            raise argparse.ArgumentTypeError(f'未知的情境：{name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ========================================
+# 開放式負載產生器
+# ========================================
+
+def run_load(scenarios, mix, rate, duration, max_inflight, seed):
+    """依 Poisson 到達率送出請求，回傳 {情境: {'latency', 'errors'}}"""
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    stats = {n: {'latency': LatencyHistogram(), 'errors': {}} for n in names}
+    lock = threading.Lock()
+
+    def execute(name, scheduled_at, call_seed):
+        try:
+            getattr(scenarios, name)(random.Random(call_seed))
+            stats[name]['latency'].record(time.perf_counter() - scheduled_at)
+        except Exception as e:
+            error = str(e)[:80]
+            with lock:
+                stats[name]['errors'][error] = stats[name]['errors'].get(error, 0) + 1
+
+    started = time.perf_counter()
+    next_arrival = started
+    sent = 0
+    with ThreadPoolExecutor(max_workers=max_inflight) as pool:
+        while True:
+            next_arrival += rng.expovariate(rate)
+            if next_arrival - started > duration:
+                break
+            wait = next_arrival - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            name = rng.choices(names, weights)[0]
+            pool.submit(execute, name, next_arrival, rng.random())
+            sent += 1
+
+            if sent % max(int(rate * 5), 1) == 0:
+                print(f'  ⏱️  {next_arrival - started:5.1f}s 已送出 {sent} 個請求')
+
+    return stats, sent, time.perf_counter() - started
+
+
+# ========================================
+# 替身 API
+# ========================================
+
+def spawn_stub(port, stub_args):
+    """啟動 stub-api.py 子行程並等待就緒"""
+    cmd = [sys.executable, os.path.join(EXAMPLES_DIR, 'stub-api.py'), '--port', str(port)] + stub_args
+    process = subprocess.Popen(cmd)
+    health = f'http://127.0.0.1:{port}/api/health'
+    for _ in range(100):
+        try:
+            if requests.get(health, timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('替身 API 啟動失敗')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Step1ne API 壓力測試")
+    parser.add_argument("--api", default="http://127.0.0.1:3999/api", help="API Base URL")
+    parser.add_argument("--spawn-stub", action="store_true", help="自動啟動本機替身 API（stub-api.py）")
+    parser.add_argument("--stub-args", default="", help="傳給 stub-api.py 的參數，例如 '--latency 20 --error-rate 0.01'")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("search=2,get=10,grade=3,batch_match=1"),
+                        help="情境權重，例如 search=2,get=10,grade=3,batch_match=1")
+    parser.add_argument("--rate", type=float, default=20, help="平均到達率（每秒請求數）")
+    parser.add_argument("--duration", type=float, default=30, help="壓測秒數")
+    parser.add_argument("--max-inflight", type=int, default=64, help="同時進行的請求上限（超過的排隊，排隊時間計入延遲）")
+    parser.add_argument("--batch-size", type=int, default=20, help="batch_match 每次的候選人數")
+    parser.add_argument("--no-cache", action="store_true", help="停用 python-bot.py 的回應快取")
+    parser.add_argument("--seed", type=int, default=1, help="亂數種子")
+    parser.add_argument("--output", help="輸出 JSON 報告")
+
+    args = parser.parse_args()
+
+    stub = None
+    if args.spawn_stub:
+        port = int(args.api.rsplit(':', 1)[1].split('/')[0])
+        stub = spawn_stub(port, args.stub_args.split())
+
+    try:
+        bot = load_bot_client()
+        bot.API_BASE = args.api.rstrip('/')
+        if args.no_cache:
+            bot.RESPONSE_CACHE = bot.ResponseCache(max_entries=0, cache_dir=None)
+
+        print(f'🔥 開始壓測：{args.api}')
+        print(f'   到達率 {args.rate}/s，{args.duration}s，情境 {args.mix}\n')
+
+        scenarios = Scenarios(bot, args.batch_size)
+        stats, sent, elapsed = run_load(scenarios, args.mix, args.rate, args.duration, args.max_inflight, args.seed)
+    finally:
+        if stub:
+            stub.terminate()
+            stub.wait()
+
+    overall = LatencyHistogram()
+    report = {'api': args.api, 'rate': args.rate, 'duration_s': round(elapsed, 2), 'sent': sent, 'scenarios': {}}
+
+    print(f'\n📊 結果：送出 {sent} 個請求，{elapsed:.1f} 秒（實際 {sent / elapsed:.1f}/s）\n')
+    print(f'   {"情境":<12}{"成功":>7}{"錯誤":>7}{"p50":>10}{"p90":>10}{"p99":>10}{"max":>10}')
+    for name, s in stats.items():
+        h = s['latency']
+        errors = sum(s['errors'].values())
+        overall.merge(h)
+        report['scenarios'][name] = {**h.to_dict(), 'errors': s['errors']}
+        print(f'   {name:<12}{h.count:>7}{errors:>7}'
+              f'{h.percentile(0.5):>8.1f}ms{h.percentile(0.9):>8.1f}ms{h.percentile(0.99):>8.1f}ms{h.max_ms:>8.1f}ms')
+        for error, count in s['errors'].items():
+            print(f'      ❌ {count} × {error}')
+
+    print(f'\n   整體延遲分布：\n{overall.render()}')
+    report['overall'] = overall.to_dict()
+    if not args.no_cache:
+        report['client_cache'] = bot.cache_stats()
+        print(f'\n📦 客戶端快取：{report["client_cache"]}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'\n📄 報告已儲存：{args.output}')
+
+
+if __name__ == '__main__':
+    main()
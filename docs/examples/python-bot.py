@@ -7,6 +7,13 @@ Step1ne Headhunter System - Python Bot 整合範例
 
 import requests
 import json
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
 
 # ========================================
 # 設定
@@ -20,6 +27,190 @@ API_BASE = 'http://localhost:3001/api'  # 開發環境
 # HEADERS = {'Authorization': f'Bearer {API_KEY}'}
 HEADERS = {}
 
+# 回應快取（get_candidate / get_job / search_jobs）
+CACHE_MAX_ENTRIES = 512                          # 記憶體 LRU 上限
+CACHE_DIR = os.environ.get('STEP1NE_CACHE_DIR')  # 設定後會把快取寫到磁碟，重啟後仍可用
+
+# 批量操作
+BULK_CONCURRENCY = 8         # 沒有批量 API 時，同時送出的請求數
+BATCH_STATUS_LIMIT = 200     # PATCH /candidates/batch-status 單次上限
+
+# ========================================
+# 回應快取
+# ========================================
+
+class CachedResponse:
+    """快取命中時回傳的回應（介面與 requests.Response 相容）"""
+    
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+    
+    def json(self):
+        return json.loads(self.text)
+
+
+class ResponseCache:
+    """
+    GET 回應快取
+    
+    - 記憶體 LRU（最多 max_entries 筆），可選擇同步寫到磁碟
+    - 在 Cache-Control max-age 內直接回傳；過期後帶 If-None-Match /
+      If-Modified-Since 重新驗證，304 時沿用快取內容
+    - 批量操作會從多個執行緒同時呼叫：統計與項目都只透過加鎖的方法更新，
+      已存入的項目不再修改（更新時換成新的 dict）
+    """
+    
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, cache_dir=CACHE_DIR):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()  # 批量操作會從多個執行緒存取
+        self.stats = {'fresh_hits': 0, 'revalidated_hits': 0, 'misses': 0, 'invalidations': 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def make_key(url, params=None):
+        return f"{url}?{urlencode(sorted(params.items()))}" if params else url
+    
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+        
+        if self.cache_dir:
+            try:
+                with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._remember(key, entry)
+        return entry
+    
+    def put(self, key, entry):
+        self._remember(key, entry)
+        if self.cache_dir:
+            with open(self._disk_path(key), 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+    
+    def _remember(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def invalidate(self, url):
+        """移除某個網址（含所有查詢參數組合）的快取"""
+        with self.lock:
+            keys = [k for k in self.entries if k == url or k.startswith(url + '?')]
+            for key in keys:
+                del self.entries[key]
+        for key in keys:
+            if self.cache_dir:
+                try:
+                    os.remove(self._disk_path(key))
+                except OSError:
+                    pass
+        # 磁碟上但不在記憶體中的項目（只有無參數的網址能直接算出檔名）
+        if self.cache_dir:
+            try:
+                os.remove(self._disk_path(url))
+            except OSError:
+                pass
+        self.record('invalidations')
+    
+    def refresh(self, key, entry, expires_at):
+        """304 重新驗證成功：以新的到期時間存入 entry 的副本"""
+        self.put(key, {**entry, 'expires_at': expires_at})
+    
+    def record(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+    
+    def snapshot(self):
+        """統計與目前筆數（同一時間點的一致數值）"""
+        with self.lock:
+            stats = dict(self.stats)
+            entries = len(self.entries)
+        hits = stats['fresh_hits'] + stats['revalidated_hits']
+        total = hits + stats['misses']
+        return stats, entries, hits / total if total else 0.0
+    
+    def hit_rate(self):
+        return self.snapshot()[2]
+
+
+RESPONSE_CACHE = ResponseCache()
+
+
+def cached_get(url, params=None):
+    """帶快取與條件式重新驗證的 GET"""
+    key = ResponseCache.make_key(url, params)
+    entry = RESPONSE_CACHE.get(key)
+    
+    if entry is not None and time.time() < entry['expires_at']:
+        RESPONSE_CACHE.record('fresh_hits')
+        return CachedResponse(200, entry['body'])
+    
+    headers = dict(HEADERS)
+    if entry is not None:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    
+    response = requests.get(url, params=params, headers=headers)
+    
+    if response.status_code == 304 and entry is not None:
+        RESPONSE_CACHE.record('revalidated_hits')
+        RESPONSE_CACHE.refresh(key, entry, time.time() + _max_age(response))
+        return CachedResponse(200, entry['body'])
+    
+    RESPONSE_CACHE.record('misses')
+    
+    # 只快取有驗證資訊或 max-age 的成功回應
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    max_age = _max_age(response)
+    if response.status_code == 200 and (etag or last_modified or max_age):
+        RESPONSE_CACHE.put(key, {
+            'body': response.text,
+            'etag': etag,
+            'last_modified': last_modified,
+            'expires_at': time.time() + max_age
+        })
+    
+    return response
+
+
+def _max_age(response):
+    """解析 Cache-Control: max-age（no-cache / no-store 視為 0）"""
+    cache_control = response.headers.get('Cache-Control', '')
+    if 'no-cache' in cache_control or 'no-store' in cache_control:
+        return 0
+    for directive in cache_control.split(','):
+        name, _, value = directive.strip().partition('=')
+        if name == 'max-age' and value.isdigit():
+            return int(value)
+    return 0
+
+
+def cache_stats():
+    """快取統計（命中率、重新驗證次數等）"""
+    stats, entries, hit_rate = RESPONSE_CACHE.snapshot()
+    return {
+        **stats,
+        'entries': entries,
+        'hit_rate': round(hit_rate, 3)
+    }
+
 # ========================================
 # 候選人管理
 # ========================================
@@ -68,10 +259,7 @@ def search_candidates(keyword=None, status=None, grade=None):
 
 def get_candidate(candidate_id):
     """取得單一候選人詳細資料"""
-    response = requests.get(
-        f'{API_BASE}/candidates/{candidate_id}',
-        headers=HEADERS
-    )
+    response = cached_get(f'{API_BASE}/candidates/{candidate_id}')
     
     if response.status_code == 200:
         return response.json()['data']
@@ -89,6 +277,9 @@ def update_candidate_status(candidate_id, new_status):
         headers=HEADERS
     )
     
+    # 自己寫入的資料，快取一定已過時
+    RESPONSE_CACHE.invalidate(f'{API_BASE}/candidates/{candidate_id}')
+    
     if response.status_code == 200:
         return response.json()['data']
     else:
@@ -101,6 +292,7 @@ def grade_candidate(candidate_id):
         f'{API_BASE}/candidates/{candidate_id}/grade',
         headers=HEADERS
     )
+    RESPONSE_CACHE.invalidate(f'{API_BASE}/candidates/{candidate_id}')
     
     if response.status_code == 200:
         result = response.json()['data']
@@ -113,6 +305,101 @@ def grade_candidate(candidate_id):
         raise Exception(f"API 錯誤: {response.text}")
 
 
+# ========================================
+# 批量操作
+# ========================================
+
+def _fan_out(func, args_list, concurrency=BULK_CONCURRENCY):
+    """
+    以固定併發數執行多個呼叫
+    
+    Returns:
+        與 args_list 同順序的結果列表，每筆為 {'ok', 'data', 'error'}；
+        單筆失敗不影響其他筆
+    """
+    def call(args):
+        try:
+            return {'ok': True, 'data': func(*args), 'error': None}
+        except Exception as e:
+            return {'ok': False, 'data': None, 'error': str(e)}
+    
+    if not args_list:
+        return []
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(args_list))) as pool:
+        return list(pool.map(call, args_list))
+
+
+def get_candidates(candidate_ids, concurrency=BULK_CONCURRENCY):
+    """
+    批量取得候選人詳細資料
+    
+    Returns:
+        與 candidate_ids 同順序的列表，每筆為 {'id', 'ok', 'data', 'error'}
+    """
+    results = _fan_out(get_candidate, [(cid,) for cid in candidate_ids], concurrency)
+    return [{'id': cid, **r} for cid, r in zip(candidate_ids, results)]
+
+
+def grade_many(candidate_ids, concurrency=BULK_CONCURRENCY):
+    """
+    批量 AI 評級
+    
+    Returns:
+        與 candidate_ids 同順序的列表，每筆為 {'id', 'ok', 'data', 'error'}
+    """
+    results = _fan_out(grade_candidate, [(cid,) for cid in candidate_ids], concurrency)
+    return [{'id': cid, **r} for cid, r in zip(candidate_ids, results)]
+
+
+def update_status_many(pairs, concurrency=BULK_CONCURRENCY):
+    """
+    批量更新候選人狀態
+    
+    相同狀態的候選人以 PATCH /candidates/batch-status 一次送出（每批最多
+    BATCH_STATUS_LIMIT 筆）；批量 API 不接受的狀態或舊版後端則改為逐筆更新。
+    
+    Args:
+        pairs: [(candidate_id, new_status), ...]
+    
+    Returns:
+        與 pairs 同順序的列表，每筆為 {'id', 'ok', 'data', 'error'}
+    """
+    results = [None] * len(pairs)
+    by_status = {}
+    for i, (_, status) in enumerate(pairs):
+        by_status.setdefault(status, []).append(i)
+    
+    fallback = []
+    for status, indexes in by_status.items():
+        for start in range(0, len(indexes), BATCH_STATUS_LIMIT):
+            chunk = indexes[start:start + BATCH_STATUS_LIMIT]
+            ids = [pairs[i][0] for i in chunk]
+            
+            response = requests.patch(
+                f'{API_BASE}/candidates/batch-status',
+                json={'ids': ids, 'status': status},
+                headers=HEADERS
+            )
+            if response.status_code != 200:
+                fallback.extend(chunk)
+                continue
+            
+            failed = {str(f['id']): f['reason'] for f in response.json().get('failed', [])}
+            for i in chunk:
+                cid = pairs[i][0]
+                RESPONSE_CACHE.invalidate(f'{API_BASE}/candidates/{cid}')
+                if str(cid) in failed:
+                    results[i] = {'id': cid, 'ok': False, 'data': None, 'error': failed[str(cid)]}
+                else:
+                    results[i] = {'id': cid, 'ok': True, 'data': {'id': cid, 'status': status}, 'error': None}
+    
+    fallback_results = _fan_out(update_candidate_status, [pairs[i] for i in fallback], concurrency)
+    for i, r in zip(fallback, fallback_results):
+        results[i] = {'id': pairs[i][0], **r}
+    
+    return results
+
+
 # ========================================
 # 職缺管理
 # ========================================
@@ -137,11 +424,7 @@ def search_jobs(status=None, company=None, skills=None):
     if skills:
         params['skills'] = skills
     
-    response = requests.get(
-        f'{API_BASE}/jobs',
-        params=params,
-        headers=HEADERS
-    )
+    response = cached_get(f'{API_BASE}/jobs', params)
     
     if response.status_code == 200:
         data = response.json()
@@ -152,10 +435,7 @@ def search_jobs(status=None, company=None, skills=None):
 
 def get_job(job_id):
     """取得單一職缺詳細資料"""
-    response = requests.get(
-        f'{API_BASE}/jobs/{job_id}',
-        headers=HEADERS
-    )
+    response = cached_get(f'{API_BASE}/jobs/{job_id}')
     
     if response.status_code == 200:
         return response.json()['data']
@@ -288,4 +568,5 @@ if __name__ == '__main__':
             print(f"{i}. {candidate_name} - {total_score:.1f}分 ({grade}級)")
             print(f"   亮點：{highlight}")
     
+    print(f"\n📦 快取統計：{cache_stats()}")
     print("\n✅ 測試完成！")
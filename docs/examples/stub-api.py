@@ -0,0 +1,360 @@
+"""
+Step1ne Headhunter System - 本機替身 API（壓力測試用）
+
+提供與 Step1ne API 相同格式的端點，資料為合成的候選人與職缺，
+可注入延遲與錯誤率，讓 load-test.py 在單機離線環境下執行。
+
+- GET   /api/health
+- GET   /api/candidates            （?grade= ?status=）
+- GET   /api/candidates/:id
+- PUT   /api/candidates/:id        （更新狀態）
+- PATCH /api/candidates/batch-status
+- POST  /api/candidates/:id/grade
+- GET   /api/jobs                  （?status=）
+- GET   /api/jobs/:id
+- POST  /api/personas/batch-match  （使用 server/persona-matching 的真實演算法）
+
+使用方式：
+    python stub-api.py --port 3999 --candidates 2000 --latency 20 --jitter 10 --error-rate 0.01
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import re
+import threading
+import time
+
+# ========================================
+# 合成資料
+# ========================================
+
+SKILL_POOL = [
+    'BIM', 'Revit', 'Navisworks', 'AutoCAD', 'Python', 'JavaScript', 'React', 'Vue',
+    'Node.js', 'PostgreSQL', 'Docker', 'Kubernetes', 'AWS', '專案管理', '協調',
+    '施工圖', '工地管理', '客戶溝通', '數位孿生', '自動化', 'PMIS', '管理', '領導'
+]
+POSITIONS = ['BIM 工程師', 'BIM 經理', '後端工程師', '前端工程師', '專案經理', '資料工程師', 'DevOps 工程師']
+COMPANIES = ['大成營造', '遠雄建設', '趨勢科技', '台積電', '新創軟體', '國際顧問', '麗明營造']
+GRADES = ['S', 'A+', 'A', 'A', 'B', 'B', 'C']
+STATUSES = ['未開始', 'AI推薦', '聯繫階段', '面試階段', 'Offer', '備選人才']
+BATCH_STATUSES = {'未開始', 'AI推薦', '聯繫階段', '面試階段', 'Offer', 'on board', '婉拒', '備選人才', '其他'}
+
+
+def make_candidates(count, rng):
+    candidates = []
+    for i in range(1, count + 1):
+        years = rng.randint(0, 15)
+        history = [
+            {'company': rng.choice(COMPANIES), 'position': rng.choice(POSITIONS)}
+            for _ in range(rng.randint(1, 4))
+        ]
+        candidates.append({
+            'id': i,
+            'name': f'候選人{i:05d}',
+            'email': f'candidate{i}@example.com',
+            'phone': f'09{rng.randint(10000000, 99999999)}',
+            'position': history[0]['position'],
+            'skills': rng.sample(SKILL_POOL, rng.randint(2, 8)),
+            'years': years,
+            'jobChanges': len(history) - 1,
+            'workHistory': history,
+            'notes': rng.choice(['', '想技術成長', '考慮海外機會', '希望穩定的大公司', '喜歡新創的快速節奏']),
+            'grade': rng.choice(GRADES),
+            'status': rng.choice(STATUSES)
+        })
+    return candidates
+
+
+def make_jobs(count, rng):
+    jobs = []
+    for i in range(1, count + 1):
+        company = rng.choice(COMPANIES)
+        jobs.append({
+            'id': f'job-{i}',
+            'title': rng.choice(POSITIONS),
+            'department': rng.choice(['工程部', '研發部', '專案部']),
+            'company': {
+                'id': f'company-{i}',
+                'name': company,
+                'description': rng.choice(['穩定成熟的上市公司', '快速發展的新創', '跨國外商']),
+                'culture': rng.choice(['自主 彈性', '流程 制度 SOP', '挑戰 績效', '研發 創新']),
+                'employeeCount': rng.choice([0, 30, 200, 2000])
+            },
+            'requiredSkills': rng.sample(SKILL_POOL, rng.randint(2, 5)),
+            'yearsRequired': rng.randint(0, 8),
+            'workLocation': rng.choice(['台北', '新竹', '台中', '高雄']),
+            'salaryRange': rng.choice(['60-80萬', '80-120萬', '120-180萬']),
+            'status': rng.choice(['開放中', '開放中', '招募中', '已關閉'])
+        })
+    return jobs
+
+
+# ========================================
+# 配對（載入 server/persona-matching 的真實演算法）
+# ========================================
+
+PERSONA_MODULE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'server', 'persona-matching')
+
+
+def load_script(filename):
+    """載入檔名含連字號的 Python 腳本；找不到時回傳 None"""
+    path = os.path.join(PERSONA_MODULE_PATH, filename)
+    if not os.path.exists(path):
+        return None
+    spec = importlib.util.spec_from_file_location(filename.replace('-', '_')[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Matcher:
+    """批量配對：有 persona-matching 模組時用真實演算法，否則用合成分數"""
+
+    def __init__(self):
+        candidate_module = load_script('generate-candidate-persona.py')
+        company_module = load_script('generate-company-persona.py')
+        match_module = load_script('match-personas.py')
+        batch_module = load_script('batch-match.py')
+        self.available = all([candidate_module, company_module, match_module, batch_module])
+        if self.available:
+            self.candidate_generator = candidate_module.CandidatePersonaGenerator()
+            self.company_generator = company_module.CompanyPersonaGenerator()
+            self.matcher = match_module.PersonaMatcher()
+            self.generate_summary = batch_module.generate_summary
+
+    def batch_match(self, job, company, candidates):
+        if not self.available:
+            return self._synthetic(candidates)
+
+        company_persona = self.company_generator.generate_persona(
+            {**job, 'description': ' '.join(job.get('requiredSkills', []))}, company
+        )
+        reports = [
+            self.matcher.match(self.candidate_generator.generate_persona(c), company_persona)
+            for c in candidates
+        ]
+        reports.sort(key=lambda r: r['總分'], reverse=True)
+        return {'summary': self.generate_summary(reports), 'matches': reports}
+
+    def _synthetic(self, candidates):
+        rng = random.Random(len(candidates))
+        reports = sorted(
+            ({'candidateId': c['id'], 'candidateName': c['name'], '總分': round(rng.uniform(50, 95), 1),
+              '等級': 'B', '推薦優先級': '中', '適配亮點': ['✓ 基本條件符合，可進一步評估']}
+             for c in candidates),
+            key=lambda r: r['總分'], reverse=True
+        )
+        average = sum(r['總分'] for r in reports) / len(reports) if reports else 0
+        return {
+            'summary': {'total_candidates': len(reports), 'average_score': round(average, 1),
+                        'grade_distribution': {'S': 0, 'A': 0, 'B': len(reports), 'C': 0, 'D': 0}, 'top_5': []},
+            'matches': reports
+        }
+
+
+# ========================================
+# HTTP 伺服器
+# ========================================
+
+class StubAPI:
+    """替身 API 的資料與設定"""
+
+    def __init__(self, args):
+        rng = random.Random(args.seed)
+        self.candidates = {c['id']: c for c in make_candidates(args.candidates, rng)}
+        self.jobs = {j['id']: j for j in make_jobs(args.jobs, rng)}
+        self.latency = args.latency / 1000
+        self.jitter = args.jitter / 1000
+        self.error_rate = args.error_rate
+        self.batch_latency = args.batch_latency / 1000
+        self.matcher = Matcher()
+        self.lock = threading.Lock()
+        self.requests = 0
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive，避免每個請求都重新建立連線
+    api = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def _dispatch(self, method):
+        api = self.api
+        with api.lock:
+            api.requests += 1
+
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+
+        if url.path == '/api/health':
+            return self._send(200, {'status': 'ok', 'requests': api.requests})
+
+        # 注入延遲與錯誤
+        delay = api.latency + random.uniform(0, api.jitter)
+        if url.path == '/api/personas/batch-match':
+            delay += api.batch_latency
+        time.sleep(delay)
+        if random.random() < api.error_rate:
+            return self._send(500, {'success': False, 'error': 'injected error'})
+
+        for pattern, route_method, handler in ROUTES:
+            match = re.fullmatch(pattern, url.path)
+            if match and route_method == method:
+                status, payload = handler(api, query, body, *match.groups())
+                return self._send(status, payload, conditional=(method == 'GET'))
+
+        self._send(404, {'success': False, 'error': 'Not found'})
+
+    def _send(self, status, payload, conditional=False):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        if conditional and status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if conditional and status == 200:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def list_candidates(api, query, body):
+    candidates = [
+        c for c in api.candidates.values()
+        if (not query.get('grade') or c['grade'] == query['grade'])
+        and (not query.get('status') or c['status'] == query['status'])
+    ]
+    return 200, {'success': True, 'data': candidates}
+
+
+def get_candidate(api, query, body, candidate_id):
+    candidate = api.candidates.get(int(candidate_id))
+    if candidate is None:
+        return 404, {'success': False, 'error': 'Candidate not found'}
+    return 200, {'success': True, 'data': candidate}
+
+
+def update_candidate(api, query, body, candidate_id):
+    candidate = api.candidates.get(int(candidate_id))
+    if candidate is None:
+        return 404, {'success': False, 'error': 'Candidate not found'}
+    with api.lock:
+        candidate.update({k: v for k, v in body.items() if k in ('status', 'notes', 'grade')})
+    return 200, {'success': True, 'data': candidate}
+
+
+def batch_status(api, query, body):
+    ids, status = body.get('ids') or [], body.get('status')
+    if not ids or len(ids) > 200 or status not in BATCH_STATUSES:
+        return 400, {'success': False, 'error': 'invalid request'}
+    succeeded, failed = [], []
+    with api.lock:
+        for cid in ids:
+            candidate = api.candidates.get(int(cid))
+            if candidate is None:
+                failed.append({'id': cid, 'reason': '找不到此候選人'})
+            else:
+                candidate['status'] = status
+                succeeded.append({'id': cid, 'name': candidate['name']})
+    return 200, {'success': True, 'succeeded': succeeded, 'failed': failed}
+
+
+def grade_candidate(api, query, body, candidate_id):
+    candidate = api.candidates.get(int(candidate_id))
+    if candidate is None:
+        return 404, {'success': False, 'error': 'Candidate not found'}
+    score = min(40 + len(candidate['skills']) * 6 + candidate['years'] * 2, 100)
+    grade = 'S' if score >= 90 else 'A+' if score >= 80 else 'A' if score >= 70 else 'B' if score >= 60 else 'C'
+    return 200, {'success': True, 'data': {'grade': grade, 'score': score, 'breakdown': {'skills': len(candidate['skills'])}}}
+
+
+def list_jobs(api, query, body):
+    jobs = [j for j in api.jobs.values() if not query.get('status') or j['status'] == query['status']]
+    return 200, {'success': True, 'data': jobs}
+
+
+def get_job(api, query, body, job_id):
+    job = api.jobs.get(job_id)
+    if job is None:
+        return 404, {'success': False, 'error': 'Job not found'}
+    return 200, {'success': True, 'data': job}
+
+
+def batch_match(api, query, body):
+    candidates = [api.candidates[int(cid)] for cid in body.get('candidateIds', []) if int(cid) in api.candidates]
+    result = api.matcher.batch_match(body.get('job', {}), body.get('company', {}), candidates)
+    return 200, {'success': True, 'result': result}
+
+
+ROUTES = [
+    (r'/api/candidates', 'GET', list_candidates),
+    (r'/api/candidates/batch-status', 'PATCH', batch_status),
+    (r'/api/candidates/(\d+)', 'GET', get_candidate),
+    (r'/api/candidates/(\d+)', 'PUT', update_candidate),
+    (r'/api/candidates/(\d+)/grade', 'POST', grade_candidate),
+    (r'/api/jobs', 'GET', list_jobs),
+    (r'/api/jobs/([\w-]+)', 'GET', get_job),
+    (r'/api/personas/batch-match', 'POST', batch_match),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Step1ne 本機替身 API（壓力測試用）")
+    parser.add_argument("--host", default="127.0.0.1", help="監聽位址")
+    parser.add_argument("--port", type=int, default=3999, help="監聽 port")
+    parser.add_argument("--candidates", type=int, default=2000, help="合成候選人數量")
+    parser.add_argument("--jobs", type=int, default=50, help="合成職缺數量")
+    parser.add_argument("--latency", type=float, default=0, help="每個請求的基本延遲（毫秒）")
+    parser.add_argument("--jitter", type=float, default=0, help="額外隨機延遲上限（毫秒）")
+    parser.add_argument("--batch-latency", type=float, default=0, help="batch-match 額外延遲（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0, help="隨機回 500 的比例（0~1）")
+    parser.add_argument("--seed", type=int, default=42, help="合成資料亂數種子")
+
+    args = parser.parse_args()
+
+    Handler.api = StubAPI(args)
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+
+    print(f"🧪 Step1ne 替身 API：http://{args.host}:{args.port}/api")
+    print(f"   候選人 {args.candidates} 位，職缺 {args.jobs} 個")
+    print(f"   延遲 {args.latency}±{args.jitter} ms，錯誤率 {args.error_rate:.1%}")
+    if not Handler.api.matcher.available:
+        print("   ⚠️  找不到 server/persona-matching，batch-match 使用合成分數")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -7,11 +7,22 @@ Step1ne Headhunter System - Telegram Bot 完整範例
 - AI 自動配對
 - 更新候選人狀態
 
-需要安裝：pip install python-telegram-bot requests
+需要安裝：pip install python-telegram-bot requests aiohttp
 """
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, ContextTypes, filters
+from aiohttp import web
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import sqlite3
+import threading
+import time
 import requests
 import json
 
@@ -20,13 +31,49 @@ import json
 # ========================================
 
 TELEGRAM_TOKEN = 'YOUR_BOT_TOKEN_HERE'  # 從 @BotFather 取得
+TELEGRAM_API_BASE = os.environ.get('TELEGRAM_API_BASE', 'https://api.telegram.org/bot')  # 測試時可指向 fake-telegram.py
 API_BASE = 'http://localhost:3001/api'
 # API_BASE = 'https://api-hr.step1ne.com/api'  # 正式環境
 
+API_MAX_CONCURRENCY = 8  # 同時對後端發出的請求上限（所有用戶合計）
+USER_MAX_CONCURRENCY = 2 # 每位用戶同時進行的請求上限，超過的排隊等待
+PREFETCH_MAX_CONCURRENCY = 2  # 背景預抓同時進行的請求上限（不佔用戶的名額）
+
+RESULT_PAGE_SIZE = 10    # 候選人清單每頁筆數
+RESULT_SETS_PER_CHAT = 5 # 每個聊天室保留的結果集數量（舊的訊息翻頁會提示過期）
+RESULT_CACHE_TTL = 600   # 結果集 / 候選人詳情快取秒數
+
+MATCH_WORKERS = 3        # 同時執行的背景配對數量
+MATCH_QUEUE_SIZE = 50    # 配對佇列上限（滿了請用戶稍後再試）
+
+# Webhook 模式（python telegram-bot.py --webhook --workers 4）
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', '')          # 對外網址，例如 https://bot.step1ne.com/telegram
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET', '')    # 對應 X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_HOST = '0.0.0.0'
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = '/telegram'
+# 多個 worker 共用的 SQLite（update_id 紀錄、結果集與候選人詳情快取，含聯絡資料）
+# 放在只有本帳號能讀寫的目錄（0700）
+STATE_DIR = os.environ.get('TELEGRAM_STATE_DIR', os.path.expanduser('~/.step1ne-telegram'))
+WEBHOOK_DEDUP_DB = os.path.join(STATE_DIR, 'telegram-state.sqlite')
+WEBHOOK_DEDUP_TTL = 3600   # update_id 保留秒數
+WEBHOOK_DEDUP_LEASE = 60   # 處理中的 update 租約秒數；worker 中途掛掉時，重送在租約過期後可接手
+SHUTDOWN_TIMEOUT = 30      # 關閉時等待進行中工作的秒數
+
 # ========================================
 # API 呼叫函數
 # ========================================
 
+def private_path(path):
+    """建立只有本帳號能存取的目錄（0700）與檔案（0600），回傳 path"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    os.chmod(directory, 0o700)
+    os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+    os.chmod(path, 0o600)
+    return path
+
+
 def api_get(endpoint, params=None):
     """統一的 GET 請求"""
     response = requests.get(f'{API_BASE}/{endpoint}', params=params)
@@ -45,6 +92,259 @@ def api_post(endpoint, data):
         raise Exception(f"API 錯誤: {response.text}")
 
 
+# ========================================
+# 併發控制（single-flight + 用戶/全域上限）
+# ========================================
+
+class SingleFlight:
+    """相同的請求同時進行時只打一次後端，其他呼叫者共用結果"""
+    
+    def __init__(self):
+        self.inflight = {}
+    
+    async def do(self, key, func):
+        future = self.inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        # shield：某個呼叫者被取消時，不影響其他正在等待的呼叫者
+        return await asyncio.shield(future)
+
+
+class UserLimiter:
+    """
+    每位用戶最多 limit 個同時進行的請求
+    
+    只為目前有請求進行中或排隊的用戶保留 semaphore，最後一個請求結束就移除，
+    用戶數再多也不會累積。
+    """
+    
+    def __init__(self, limit):
+        self.limit = limit
+        self.slots = {}  # user_id → [semaphore, 使用中 + 排隊的請求數]
+    
+    @asynccontextmanager
+    async def acquire(self, user_id):
+        slot = self.slots.get(user_id)
+        if slot is None:
+            slot = self.slots[user_id] = [asyncio.Semaphore(self.limit), 0]
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                yield
+        finally:
+            slot[1] -= 1
+            if slot[1] == 0:
+                del self.slots[user_id]
+
+
+# asyncio 物件要在 Application 的 event loop 內建立（Python 3.10 以前會綁定建立時的 loop），
+# 由 post_init 的 init_concurrency() 設定
+single_flight = None
+api_semaphore = None
+user_limiter = None
+prefetch_semaphore = None
+
+
+def init_concurrency():
+    global single_flight, api_semaphore, user_limiter, prefetch_semaphore
+    single_flight = SingleFlight()
+    api_semaphore = asyncio.Semaphore(API_MAX_CONCURRENCY)
+    user_limiter = UserLimiter(USER_MAX_CONCURRENCY)
+    prefetch_semaphore = asyncio.Semaphore(PREFETCH_MAX_CONCURRENCY)
+
+
+async def call_api(user_id, method, endpoint, payload=None):
+    """
+    非阻塞的 API 呼叫
+    
+    - 每位用戶最多 USER_MAX_CONCURRENCY 個請求，其餘排隊（user_id=None 為背景請求，
+      不佔用戶名額，由呼叫端自行限流）
+    - 相同 (method, endpoint, payload) 的進行中請求合併為一次
+    - 實際送出的請求受 API_MAX_CONCURRENCY 限制
+    """
+    key = (method, endpoint, json.dumps(payload, sort_keys=True, ensure_ascii=False))
+    
+    async def fetch():
+        async with api_semaphore:
+            if method == 'GET':
+                return await asyncio.to_thread(api_get, endpoint, payload)
+            return await asyncio.to_thread(api_post, endpoint, payload)
+    
+    if user_id is None:
+        return await single_flight.do(key, fetch)
+    async with user_limiter.acquire(user_id):
+        return await single_flight.do(key, fetch)
+
+
+# ========================================
+# 結果集快取與分頁
+# ========================================
+
+def format_candidate_line(i, c):
+    """搜尋結果（完整欄位）"""
+    text = f"{i}. {c['name']}\n"
+    text += f"   職位：{c['position']}\n"
+    text += f"   技能：{', '.join(c['skills'][:3])}\n"
+    text += f"   評級：{c.get('grade', '-')} | 狀態：{c['status']}\n\n"
+    return text
+
+
+def format_candidate_brief(i, c):
+    """篩選結果（精簡欄位）"""
+    text = f"{i}. {c['name']} - {c['position']}\n"
+    text += f"   技能：{', '.join(c['skills'][:3])}\n\n"
+    return text
+
+
+RESULT_FORMATTERS = {
+    'candidates': format_candidate_line,
+    'candidates_brief': format_candidate_brief,
+}
+
+
+class ResultCache:
+    """
+    結果集與候選人詳情快取
+
+    webhook 多個 worker 行程時，翻頁或 /view_<id> 可能落在另一個行程，所以預設和
+    UpdateDeduplicator 共用同一個 SQLite 檔案（path=None 時用本行程的記憶體資料庫）。
+    SQLite 呼叫都在 asyncio.to_thread 執行，等鎖時不會卡住其他聊天室。
+    """
+    
+    def __init__(self, path=None, ttl=RESULT_CACHE_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()  # 同一個連線同時只給一個執行緒用
+        self.db = sqlite3.connect(path or ':memory:', timeout=5, isolation_level=None, check_same_thread=False)
+        if path:
+            self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS result_sets '
+            '(set_id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER, data TEXT, created_at REAL)'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS idx_result_sets_chat ON result_sets (chat_id, set_id)')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS candidate_details (candidate_id TEXT PRIMARY KEY, data TEXT, fetched_at REAL)'
+        )
+    
+    async def _run(self, func, *args):
+        def locked():
+            with self.lock:
+                return func(*args)
+        return await asyncio.to_thread(locked)
+    
+    def _put_result_set(self, chat_id, data):
+        cursor = self.db.execute(
+            'INSERT INTO result_sets (chat_id, data, created_at) VALUES (?, ?, ?)',
+            (chat_id, data, time.time())
+        )
+        self.db.execute(
+            'DELETE FROM result_sets WHERE chat_id = ? AND set_id NOT IN '
+            '(SELECT set_id FROM result_sets WHERE chat_id = ? ORDER BY set_id DESC LIMIT ?)',
+            (chat_id, chat_id, RESULT_SETS_PER_CHAT)
+        )
+        if cursor.lastrowid % 100 == 0:
+            self._purge()
+        return cursor.lastrowid
+    
+    def _get(self, sql, params):
+        row = self.db.execute(sql, params).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _purge(self):
+        cutoff = time.time() - self.ttl
+        self.db.execute('DELETE FROM result_sets WHERE created_at < ?', (cutoff,))
+        self.db.execute('DELETE FROM candidate_details WHERE fetched_at < ?', (cutoff,))
+    
+    async def put_result_set(self, chat_id, result_set):
+        """存入結果集並回傳 ID；每個聊天室只保留最新 RESULT_SETS_PER_CHAT 份"""
+        return await self._run(self._put_result_set, chat_id, json.dumps(result_set, ensure_ascii=False))
+    
+    async def get_result_set(self, chat_id, set_id):
+        return await self._run(
+            self._get, 'SELECT data FROM result_sets WHERE chat_id = ? AND set_id = ? AND created_at >= ?',
+            (chat_id, set_id, time.time() - self.ttl)
+        )
+    
+    async def get_detail(self, candidate_id):
+        return await self._run(
+            self._get, 'SELECT data FROM candidate_details WHERE candidate_id = ? AND fetched_at >= ?',
+            (str(candidate_id), time.time() - self.ttl)
+        )
+    
+    async def put_detail(self, candidate_id, detail):
+        await self._run(
+            self.db.execute,
+            'INSERT OR REPLACE INTO candidate_details (candidate_id, data, fetched_at) VALUES (?, ?, ?)',
+            (str(candidate_id), json.dumps(detail, ensure_ascii=False), time.time())
+        )
+    
+    async def purge(self):
+        """清掉過期項目，避免快取無限成長"""
+        await self._run(self._purge)
+    
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+async def cache_result_set(cache, chat_id, title, items, kind, extra_buttons=None):
+    """把完整結果存進快取（翻頁時不必重新查詢），回傳 (結果集 ID, 結果集)"""
+    result_set = {
+        'title': title,
+        'items': items,
+        'kind': kind,
+        # 按鈕存成 [文字, callback_data]，翻頁時再組回 InlineKeyboardButton
+        'extra_buttons': [[[b.text, b.callback_data] for b in row] for row in extra_buttons or []]
+    }
+    return await cache.put_result_set(chat_id, result_set), result_set
+
+
+def render_result_page(set_id, result_set, page):
+    """組合某一頁的文字與翻頁按鈕"""
+    items = result_set['items']
+    total_pages = max((len(items) + RESULT_PAGE_SIZE - 1) // RESULT_PAGE_SIZE, 1)
+    page = min(max(page, 0), total_pages - 1)
+    start = page * RESULT_PAGE_SIZE
+    
+    text = f"{result_set['title']}（第 {page + 1}/{total_pages} 頁）\n\n"
+    format_line = RESULT_FORMATTERS[result_set['kind']]
+    for i, item in enumerate(items[start:start + RESULT_PAGE_SIZE], start + 1):
+        text += format_line(i, item)
+    
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀️ 上一頁", callback_data=f'page:{set_id}:{page - 1}'))
+    if page < total_pages - 1:
+        nav.append(InlineKeyboardButton("下一頁 ▶️", callback_data=f'page:{set_id}:{page + 1}'))
+    
+    extra = [[InlineKeyboardButton(text, callback_data=data) for text, data in row] for row in result_set['extra_buttons']]
+    keyboard = ([nav] if nav else []) + extra
+    return text, InlineKeyboardMarkup(keyboard) if keyboard else None
+
+
+async def fetch_candidate_detail(cache, user_id, candidate_id):
+    """取得候選人詳情並放進快取（所有聊天室、所有 worker 共用）；user_id=None 為背景預抓"""
+    detail = await cache.get_detail(candidate_id)
+    if detail is None:
+        result = await call_api(user_id, 'GET', f'candidates/{candidate_id}')
+        detail = result['data']
+        await cache.put_detail(candidate_id, detail)
+    return detail
+
+
+async def prefetch_candidate_details(cache, candidate_ids):
+    """背景預抓候選人詳情，讓之後點 /view_<id> 直接從快取回覆（不佔用戶的併發名額）"""
+    async def prefetch(candidate_id):
+        async with prefetch_semaphore:
+            return await fetch_candidate_detail(cache, None, candidate_id)
+    
+    results = await asyncio.gather(*(prefetch(cid) for cid in candidate_ids), return_exceptions=True)
+    await cache.purge()
+    return results
+
+
 # ========================================
 # Bot 指令處理
 # ========================================
@@ -72,28 +372,25 @@ async def search_candidates(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """搜尋候選人"""
     try:
         # 取得所有候選人
-        result = api_get('candidates')
+        result = await call_api(update.effective_user.id, 'GET', 'candidates')
         candidates = result['data']
         
         if not candidates:
             await update.message.reply_text("目前沒有候選人資料")
             return
         
-        # 只顯示前 10 位
-        text = f"📋 找到 {len(candidates)} 位候選人（顯示前 10 位）\n\n"
-        
-        for i, c in enumerate(candidates[:10], 1):
-            text += f"{i}. {c['name']}\n"
-            text += f"   職位：{c['position']}\n"
-            text += f"   技能：{', '.join(c['skills'][:3])}\n"
-            text += f"   評級：{c.get('grade', '-')} | 狀態：{c['status']}\n\n"
-        
-        # 建立操作按鈕
+        # 完整結果存進快取，翻頁直接從快取取
         keyboard = [
             [InlineKeyboardButton("🔍 搜尋 A 級候選人", callback_data='filter_grade_A')],
             [InlineKeyboardButton("📊 查看所有評級分布", callback_data='grade_stats')],
         ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        cache = context.bot_data['result_cache']
+        chat_id = update.effective_chat.id
+        set_id, result_set = await cache_result_set(
+            cache, chat_id, f"📋 找到 {len(candidates)} 位候選人",
+            candidates, 'candidates', keyboard
+        )
+        text, reply_markup = render_result_page(set_id, result_set, 0)
         
         await update.message.reply_text(text, reply_markup=reply_markup)
         
@@ -104,7 +401,7 @@ async def search_candidates(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def search_jobs(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """搜尋職缺"""
     try:
-        result = api_get('jobs', params={'status': '開放中'})
+        result = await call_api(update.effective_user.id, 'GET', 'jobs', {'status': '開放中'})
         jobs = result['data']
         
         if not jobs:
@@ -128,25 +425,118 @@ async def search_jobs(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def match_job(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """AI 配對（職缺 vs 候選人）"""
+    """AI 配對（職缺 vs 候選人）：只負責排入背景佇列，不佔用 handler"""
+    # 解析 job_id（從 /match_job-1 中取得）
+    command = update.message.text.split()[0].split('@')[0]
+    job_id = command.replace('/match_', '')
+    
+    # 先佔住佇列位置再回覆：回覆的 await 期間其他 handler 可能把佇列排滿。
+    # 狀態訊息送出後才填入 message_id，worker 會等 ready 之後才開始
+    queue = context.application.bot_data['match_queue']
+    task = {
+        'chat_id': update.effective_chat.id,
+        'user_id': update.effective_user.id,
+        'message_id': None,
+        'job_id': job_id,
+        'ready': asyncio.Event()
+    }
     try:
-        # 解析 job_id（從 /match_job-1 中取得）
-        command = update.message.text
-        job_id = command.replace('/match_', '')
+        queue.put_nowait(task)
+    except asyncio.QueueFull:
+        await update.message.reply_text("⚠️ 目前配對排隊人數已滿，請稍後再試")
+        return
+    
+    # 狀態訊息：之後由背景 worker 編輯這則訊息回報進度
+    try:
+        status_message = await update.message.reply_text(
+            f"⏳ 已加入配對佇列：{job_id}\n"
+            f"前面還有 {queue.qsize() - 1} 個配對工作"
+        )
+        task['message_id'] = status_message.message_id
+    finally:
+        # 回覆失敗時 message_id 仍是 None，worker 直接略過這個工作
+        task['ready'].set()
+
+
+# ========================================
+# 背景配對佇列
+# ========================================
+
+def format_match_result(job, result):
+    """組合配對結果訊息（Top 5 推薦）"""
+    text = f"✅ 配對完成：{job['title']}\n\n"
+    text += f"📊 總候選人：{result['summary']['total']} 位\n"
+    text += f"平均分數：{result['summary']['avgScore']:.1f}\n"
+    text += f"評級分布：A級 {result['summary']['grades']['A']} 位，"
+    text += f"B級 {result['summary']['grades']['B']} 位\n\n"
+    text += f"🏆 Top 5 推薦：\n\n"
+    
+    for i, match in enumerate(result['matches'][:5], 1):
+        text += f"{i}. {match['candidate']['name']}\n"
+        text += f"   分數：{match['score']:.1f} ({match['grade']}級)\n"
+        text += f"   亮點：{match['highlights'][0]}\n"
+        text += f"   /view_{match['candidate']['id']} - 查看詳情\n\n"
+    
+    return text
+
+
+async def view_candidate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """查看候選人詳情（/view_<id>，配對 Top 5 已在背景預抓）"""
+    command = update.message.text.split()[0].split('@')[0]
+    candidate_id = command.replace('/view_', '')
+    
+    try:
+        c = await fetch_candidate_detail(context.bot_data['result_cache'], update.effective_user.id, candidate_id)
         
-        # 取得職缺資料
-        job_result = api_get(f'jobs/{job_id}')
-        job = job_result['data']
+        text = f"👤 {c['name']}\n\n"
+        text += f"職位：{c.get('position', '-')}\n"
+        text += f"年資：{c.get('years', '-')} 年\n"
+        text += f"技能：{', '.join(c.get('skills', [])[:10])}\n"
+        text += f"評級：{c.get('grade', '-')} | 狀態：{c.get('status', '-')}\n"
+        text += f"Email：{c.get('email', '-')}\n"
+        text += f"電話：{c.get('phone', '-')}\n"
+        
+        await update.message.reply_text(text)
         
-        # 取得所有 A 級候選人
-        candidates_result = api_get('candidates', params={'grade': 'A'})
+    except Exception as e:
+        await update.message.reply_text(f"❌ 錯誤：{str(e)}")
+
+
+async def run_match(application, task):
+    """執行一個配對工作：同時抓職缺與候選人 → 批量配對 → 推送結果"""
+    # 等 match_job 送出狀態訊息；沒送成功就不做
+    await task['ready'].wait()
+    if task['message_id'] is None:
+        return
+    
+    bot = application.bot
+    chat_id = task['chat_id']
+    user_id = task['user_id']
+    job_id = task['job_id']
+    
+    async def progress(text):
+        # 進度回報失敗（訊息被刪、內容相同）不影響配對本身
+        try:
+            await bot.edit_message_text(text, chat_id=chat_id, message_id=task['message_id'])
+        except Exception:
+            pass
+    
+    try:
+        await progress(f"🔄 取得職缺與候選人資料：{job_id}")
+        
+        # 職缺與 A 級候選人互不相依，同時抓取
+        job_result, candidates_result = await asyncio.gather(
+            call_api(user_id, 'GET', f'jobs/{job_id}'),
+            call_api(user_id, 'GET', 'candidates', {'grade': 'A'})
+        )
+        job = job_result['data']
         candidates = candidates_result['data']
         
         if len(candidates) < 3:
-            await update.message.reply_text("候選人數量不足（需至少 3 位）")
+            await progress("候選人數量不足（需至少 3 位）")
             return
         
-        await update.message.reply_text(
+        await progress(
             f"🤖 正在配對職缺：{job['title']}\n"
             f"候選人數量：{len(candidates[:10])} 位\n"
             f"請稍候..."
@@ -164,27 +554,50 @@ async def match_job(update: Update, context: ContextTypes.DEFAULT_TYPE):
             'candidateIds': [c['id'] for c in candidates[:10]]  # 取前 10 位
         }
         
-        match_result = api_post('personas/batch-match', match_data)
+        match_result = await call_api(user_id, 'POST', 'personas/batch-match', match_data)
         result = match_result['result']
         
-        # 顯示配對結果
-        text = f"✅ 配對完成！\n\n"
-        text += f"📊 總候選人：{result['summary']['total']} 位\n"
-        text += f"平均分數：{result['summary']['avgScore']:.1f}\n"
-        text += f"評級分布：A級 {result['summary']['grades']['A']} 位，"
-        text += f"B級 {result['summary']['grades']['B']} 位\n\n"
-        text += f"🏆 Top 5 推薦：\n\n"
+        await progress(f"✅ 配對完成：{job['title']}（結果如下）")
         
-        for i, match in enumerate(result['matches'][:5], 1):
-            text += f"{i}. {match['candidate']['name']}\n"
-            text += f"   分數：{match['score']:.1f} ({match['grade']}級)\n"
-            text += f"   亮點：{match['highlights'][0]}\n"
-            text += f"   /view_{match['candidate']['id']} - 查看詳情\n\n"
+        # Top 5 的詳情先在背景預抓，用戶點 /view_<id> 時直接從快取回覆
+        top_ids = [match['candidate']['id'] for match in result['matches'][:5]]
+        application.create_task(prefetch_candidate_details(application.bot_data['result_cache'], top_ids))
         
-        await update.message.reply_text(text)
+        # 用新訊息推送結果，讓用戶收到通知
+        await bot.send_message(chat_id=chat_id, text=format_match_result(job, result))
         
     except Exception as e:
-        await update.message.reply_text(f"❌ 配對失敗：{str(e)}")
+        await progress(f"❌ 配對失敗：{str(e)}")
+
+
+async def match_worker(application, queue):
+    """背景 worker：依序處理佇列中的配對工作"""
+    while True:
+        task = await queue.get()
+        try:
+            await run_match(application, task)
+        finally:
+            queue.task_done()
+
+
+async def start_match_workers(application: Application):
+    """Bot 啟動後（post_init）建立併發控制、配對佇列與 worker"""
+    init_concurrency()
+    queue = asyncio.Queue(maxsize=MATCH_QUEUE_SIZE)
+    application.bot_data['match_queue'] = queue
+    application.bot_data['match_workers'] = [
+        asyncio.create_task(match_worker(application, queue))
+        for _ in range(MATCH_WORKERS)
+    ]
+
+
+async def stop_match_workers(application: Application):
+    """Bot 關閉時停止 worker"""
+    workers = application.bot_data.get('match_workers', [])
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    application.bot_data['result_cache'].close()
 
 
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -192,19 +605,32 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    if query.data == 'filter_grade_A':
+    if query.data.startswith('page:'):
+        # 翻頁：直接從快取取結果，不重新查詢
+        _, set_id, page = query.data.split(':')
+        result_set = await context.bot_data['result_cache'].get_result_set(update.effective_chat.id, int(set_id))
+        if result_set is None:
+            await query.edit_message_text("⌛ 這份結果已過期，請重新搜尋")
+            return
+        
+        text, reply_markup = render_result_page(int(set_id), result_set, int(page))
+        await query.edit_message_text(text, reply_markup=reply_markup)
+    
+    elif query.data == 'filter_grade_A':
         # 搜尋 A 級候選人
         try:
-            result = api_get('candidates', params={'grade': 'A'})
+            result = await call_api(update.effective_user.id, 'GET', 'candidates', {'grade': 'A'})
             candidates = result['data']
             
-            text = f"📊 A 級候選人 ({len(candidates)} 位）\n\n"
-            
-            for i, c in enumerate(candidates[:10], 1):
-                text += f"{i}. {c['name']} - {c['position']}\n"
-                text += f"   技能：{', '.join(c['skills'][:3])}\n\n"
+            cache = context.bot_data['result_cache']
+            chat_id = update.effective_chat.id
+            set_id, result_set = await cache_result_set(
+                cache, chat_id, f"📊 A 級候選人 ({len(candidates)} 位）",
+                candidates, 'candidates_brief'
+            )
+            text, reply_markup = render_result_page(set_id, result_set, 0)
             
-            await query.edit_message_text(text)
+            await query.edit_message_text(text, reply_markup=reply_markup)
             
         except Exception as e:
             await query.edit_message_text(f"❌ 錯誤：{str(e)}")
@@ -212,7 +638,7 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif query.data == 'grade_stats':
         # 顯示評級統計
         try:
-            result = api_get('candidates')
+            result = await call_api(update.effective_user.id, 'GET', 'candidates')
             candidates = result['data']
             
             grades = {'S': 0, 'A+': 0, 'A': 0, 'B': 0, 'C': 0, '未評級': 0}
@@ -234,26 +660,253 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.edit_message_text(f"❌ 錯誤：{str(e)}")
 
 
+# ========================================
+# Webhook 模式
+# ========================================
+
+class UpdateDeduplicator:
+    """
+    過濾重複的 update_id
+    
+    Telegram 在 webhook 沒回 200 時會重送同一個 update；多個 worker 行程
+    共用同一個 port 時，重送可能落在另一個行程，所以預設用 SQLite 檔案
+    讓所有行程共用處理狀態（path=None 時只在本行程記憶體內去重）。
+    
+    claim() 先取得 lease 秒的處理租約，處理完才以 finish() 標記完成：worker 在
+    處理途中掛掉時不會回 200，Telegram 重送後由其他 worker 在租約過期後接手。
+    """
+    
+    CLAIMED = 'claimed'  # 由本行程處理
+    DONE = 'done'        # 已處理完
+    BUSY = 'busy'        # 另一個 worker 正在處理（租約未過期）
+    
+    def __init__(self, path=None, ttl=WEBHOOK_DEDUP_TTL, lease=WEBHOOK_DEDUP_LEASE, memory_size=10000):
+        self.ttl = ttl
+        self.lease = lease
+        self.memory_size = memory_size
+        self.done = OrderedDict()
+        self.leases = {}
+        self.lock = threading.Lock()
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS webhook_updates '
+                '(update_id INTEGER PRIMARY KEY, done INTEGER NOT NULL, expires_at REAL NOT NULL)'
+            )
+    
+    def claim(self, update_id):
+        """取得處理權，回傳 CLAIMED / DONE / BUSY（SQLite 呼叫會阻塞，請在執行緒中呼叫）"""
+        with self.lock:
+            if update_id in self.done:
+                return self.DONE
+            now = time.time()
+            if self.db is None:
+                if self.leases.get(update_id, 0) > now:
+                    return self.BUSY
+                self.leases[update_id] = now + self.lease
+                return self.CLAIMED
+            
+            # 沒有紀錄，或處理中但租約已過期（原本的 worker 掛了）才取得處理權
+            cursor = self.db.execute(
+                'INSERT INTO webhook_updates (update_id, done, expires_at) VALUES (?, 0, ?) '
+                'ON CONFLICT (update_id) DO UPDATE SET expires_at = excluded.expires_at '
+                'WHERE done = 0 AND expires_at < ?',
+                (update_id, now + self.lease, now)
+            )
+            if cursor.rowcount == 1:
+                if update_id % 100 == 0:
+                    self.db.execute(
+                        'DELETE FROM webhook_updates WHERE (done = 1 AND expires_at < ?) OR expires_at < ?',
+                        (now, now - self.ttl)
+                    )
+                return self.CLAIMED
+            row = self.db.execute('SELECT done FROM webhook_updates WHERE update_id = ?', (update_id,)).fetchone()
+            return self.DONE if row and row[0] else self.BUSY
+    
+    def finish(self, update_id):
+        """處理完成：之後的重送都回 DONE"""
+        with self.lock:
+            self.leases.pop(update_id, None)
+            self.done[update_id] = True
+            if len(self.done) > self.memory_size:
+                self.done.popitem(last=False)
+            if self.db is not None:
+                self.db.execute(
+                    'UPDATE webhook_updates SET done = 1, expires_at = ? WHERE update_id = ?',
+                    (time.time() + self.ttl, update_id)
+                )
+    
+    def release(self, update_id):
+        """處理失敗：放棄租約，讓重送立即可以再處理"""
+        with self.lock:
+            self.leases.pop(update_id, None)
+            if self.db is not None:
+                self.db.execute('DELETE FROM webhook_updates WHERE update_id = ? AND done = 0', (update_id,))
+    
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+
+
+async def serve_webhook(worker_index, port):
+    """單一 worker 行程：內嵌 aiohttp server 接收 Telegram update"""
+    state_path = private_path(WEBHOOK_DEDUP_DB)
+    application = build_application(state_path)
+    dedup = UpdateDeduplicator(state_path)
+    
+    async def handle_update(request):
+        if WEBHOOK_SECRET and request.headers.get('X-Telegram-Bot-Api-Secret-Token') != WEBHOOK_SECRET:
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        if 'update_id' not in data:
+            return web.Response(status=400)
+        
+        # 處理完才回 200：途中失敗或 worker 掛掉時 Telegram 會重送
+        update_id = data['update_id']
+        state = await asyncio.to_thread(dedup.claim, update_id)
+        if state == UpdateDeduplicator.BUSY:
+            # 另一個 worker 還在處理：回 503 讓 Telegram 稍後再送，不能當作已完成
+            return web.Response(status=503)
+        if state == UpdateDeduplicator.CLAIMED:
+            try:
+                await application.process_update(Update.de_json(data, application.bot))
+            except BaseException:
+                await asyncio.to_thread(dedup.release, update_id)
+                raise
+            await asyncio.to_thread(dedup.finish, update_id)
+        return web.Response()
+    
+    # run_polling/run_webhook 以外的啟動方式需要自行呼叫 post_init/post_shutdown
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+    
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handle_update)
+    runner = web.AppRunner(app, shutdown_timeout=SHUTDOWN_TIMEOUT)
+    await runner.setup()
+    # reuse_port：多個行程 bind 同一個 port，由核心分配連線（Linux）
+    site = web.TCPSite(runner, WEBHOOK_HOST, port, reuse_port=True)
+    await site.start()
+    
+    # 只由第一個 worker 向 Telegram 註冊 webhook
+    if worker_index == 0 and WEBHOOK_URL:
+        await application.bot.set_webhook(
+            url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=Update.ALL_TYPES
+        )
+    
+    print(f"🌐 Webhook worker #{worker_index} 監聽 {WEBHOOK_HOST}:{port}{WEBHOOK_PATH}")
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    await stop_event.wait()
+    
+    # 優雅關閉：停止收新 update、處理完進行中的 update（runner.cleanup 等待）→ 配對工作 → 關閉 Bot
+    print(f"🛑 Webhook worker #{worker_index} 關閉中...")
+    await runner.cleanup()
+    
+    deadline = loop.time() + SHUTDOWN_TIMEOUT
+    
+    match_queue = application.bot_data['match_queue']
+    try:
+        await asyncio.wait_for(match_queue.join(), max(deadline - loop.time(), 0))
+    except asyncio.TimeoutError:
+        print(f"⚠️  尚有 {match_queue.qsize()} 個配對工作未完成")
+    
+    await application.stop()
+    await application.post_shutdown(application)
+    await application.shutdown()
+    dedup.close()
+
+
+def webhook_process(worker_index, port):
+    """子行程進入點"""
+    asyncio.run(serve_webhook(worker_index, port))
+
+
+def run_webhook(workers, port):
+    """啟動 webhook 模式（可多個 worker 行程共用同一個 port）"""
+    if workers <= 1:
+        webhook_process(0, port)
+        return
+    
+    processes = [
+        multiprocessing.Process(target=webhook_process, args=(i, port))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    
+    # Ctrl+C 會送到整個 process group，子行程自行處理；
+    # SIGTERM 只送到主行程，需要轉發給子行程
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: [p.terminate() for p in processes if p.is_alive()])
+    
+    for process in processes:
+        process.join()
+
+
 # ========================================
 # 主程式
 # ========================================
 
-def main():
-    """啟動 Bot"""
-    # 建立 Application
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+def build_application(cache_path=None):
+    """
+    建立 Application 並註冊所有 handler
+    
+    cache_path：結果集 / 候選人詳情快取的 SQLite 檔案（webhook 多個 worker 共用）；
+    None 時只存在本行程記憶體（long polling 只有一個行程）
+    """
+    application = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .base_url(TELEGRAM_API_BASE)
+        .concurrent_updates(True)  # 同時處理多位用戶；併發量由 call_api 控制
+        .post_init(start_match_workers)
+        .post_shutdown(stop_match_workers)
+        .build()
+    )
+    application.bot_data['result_cache'] = ResultCache(cache_path)
     
     # 註冊指令處理器
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("search_candidates", search_candidates))
     application.add_handler(CommandHandler("search_jobs", search_jobs))
+    # /match_<job_id> 是動態指令，用正規表示式比對
+    application.add_handler(MessageHandler(filters.Regex(r'^/match_\S+'), match_job))
+    application.add_handler(MessageHandler(filters.Regex(r'^/view_\S+'), view_candidate))
     
     # 註冊按鈕處理器
     application.add_handler(CallbackQueryHandler(button_callback))
     
-    # 啟動 Bot
-    print("🤖 Step1ne Telegram Bot 已啟動...")
-    application.run_polling()
+    return application
+
+
+def main():
+    """啟動 Bot"""
+    parser = argparse.ArgumentParser(description="Step1ne Telegram Bot")
+    parser.add_argument("--webhook", action="store_true", help="使用 webhook 模式（預設為 long polling）")
+    parser.add_argument("--workers", type=int, default=1, help="webhook worker 行程數量")
+    parser.add_argument("--port", type=int, default=WEBHOOK_PORT, help="webhook 監聽 port")
+    
+    args = parser.parse_args()
+    
+    if args.webhook:
+        print(f"🤖 Step1ne Telegram Bot 已啟動（webhook，{args.workers} 個 worker）...")
+        run_webhook(args.workers, args.port)
+    else:
+        print("🤖 Step1ne Telegram Bot 已啟動...")
+        build_application().run_polling()
 
 
 if __name__ == '__main__':
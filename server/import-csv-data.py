@@ -2,6 +2,19 @@
 """
 import-csv-data.py - 從 Google Sheets CSV export 匯入到 PostgreSQL
 使用 Python requests 跳過認證問題
+
+每次下載後會把 CSV 存成本機快照（--snapshot-dir，預設 server/.sheet-snapshots）：
+
+    <key>.csv          最近一次下載的內容
+    <key>.meta.json    sha256、ETag / Last-Modified、最近一次成功匯入的 sha256
+
+下次下載時帶 If-None-Match / If-Modified-Since；內容沒變（304 或 checksum 相同）
+就跳過解析與匯入。--offline 只讀快照目錄（可放 candidates.csv / jobs.csv 測試資料）。
+
+匯入候選人前會先合併重複的人（--no-dedup 可關閉）：Email / 電話正規化後相同，
+或姓名 + 技能 + 工作經歷的 MinHash 簽章經 LSH 分桶後相似度達門檻者視為同一人
+（聯絡方式不同、或技能與經歷太少時不合併，見 pyutils/dedup.py），
+保留最早的一列並以其他列補齊空白欄位；--dedup-report 輸出合併明細。
 """
 
 import requests
@@ -10,8 +23,18 @@ import json
 import psycopg2
 from psycopg2.extras import execute_values
 import os
+import hashlib
+import re
+import time
+import functools
 from io import StringIO
 import sys
+import argparse
+from typing import Callable, NamedTuple
+
+from pyutils.tracing import tracer
+from pyutils.profiling import add_profile_arguments, run_with_profile
+from pyutils.dedup import DEDUP_THRESHOLD, CandidateDeduper
 
 # PostgreSQL 連線設定
 DATABASE_URL = os.environ.get('DATABASE_URL') or os.environ.get('POSTGRES_URI')
@@ -43,18 +66,104 @@ SHEETS = {
     }
 }
 
+# 本機快照目錄（可用環境變數 SHEET_SNAPSHOT_DIR 覆寫）
+SNAPSHOT_DIR = os.environ.get('SHEET_SNAPSHOT_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '.sheet-snapshots'
+)
+
 def get_csv_url(sheet_id, gid):
     """生成 Google Sheets CSV export URL"""
     return f'https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}'
 
-def fetch_csv(sheet_id, gid, name):
-    """下載 CSV 資料"""
+class SheetSnapshot:
+    """單一 SHEETS 項目的本機快照（CSV 內容 + checksum + HTTP validators）"""
+    
+    def __init__(self, directory, key):
+        self.key = key
+        self.csv_path = os.path.join(directory, f'{key}.csv')
+        self.meta_path = os.path.join(directory, f'{key}.meta.json')
+        self.meta = {}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+    
+    def exists(self):
+        return os.path.exists(self.csv_path)
+    
+    def read(self):
+        with open(self.csv_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    
+    def validators(self):
+        """條件式下載的 request headers（快照檔不在就不帶，避免 304 卻沒有內容可用）"""
+        headers = {}
+        if not self.exists():
+            return headers
+        if self.meta.get('etag'):
+            headers['If-None-Match'] = self.meta['etag']
+        if self.meta.get('last_modified'):
+            headers['If-Modified-Since'] = self.meta['last_modified']
+        return headers
+    
+    def save(self, text, response=None):
+        os.makedirs(os.path.dirname(self.csv_path), exist_ok=True)
+        # 先寫暫存檔再 rename，中途失敗不會留下半個快照
+        tmp_path = self.csv_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, self.csv_path)
+        self.meta['sha256'] = checksum(text)
+        self.meta['fetched_at'] = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        if response is not None:
+            self.meta['etag'] = response.headers.get('ETag')
+            self.meta['last_modified'] = response.headers.get('Last-Modified')
+        self._write_meta()
+    
+    def is_imported(self, text):
+        """這份內容是否已經成功匯入過"""
+        return self.meta.get('imported_sha256') == checksum(text)
+    
+    def mark_imported(self, text):
+        self.meta['imported_sha256'] = checksum(text)
+        self.meta['imported_at'] = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        self._write_meta()
+    
+    def _write_meta(self):
+        os.makedirs(os.path.dirname(self.meta_path), exist_ok=True)
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+
+def checksum(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+@tracer.traced('fetch_csv')
+def fetch_csv(sheet_id, gid, name, snapshot=None, offline=False):
+    """
+    下載 CSV 資料
+    
+    給定 snapshot 時做條件式下載並更新快照；offline 時只讀快照。
+    下載失敗但有快照時不退回快照，避免把舊資料當成新資料匯入。
+    """
+    if offline:
+        if snapshot is None or not snapshot.exists():
+            print(f'\n❌ {name}：離線模式但找不到快照 {snapshot.csv_path if snapshot else ""}')
+            return None
+        print(f'\n📂 讀取快照 {name}：{snapshot.csv_path}')
+        tracer.count('snapshot_reads')
+        return snapshot.read()
+    
     url = get_csv_url(sheet_id, gid)
     print(f'\n📥 下載 {name}...')
     
     try:
-        response = requests.get(url, timeout=30)
+        headers = snapshot.validators() if snapshot else {}
+        response = requests.get(url, headers=headers, timeout=30)
+        if response.status_code == 304:
+            print('✅ 試算表未變更（304），使用本機快照')
+            tracer.count('not_modified')
+            return snapshot.read()
         response.raise_for_status()
+        tracer.count('bytes', len(response.content))
         
         # 檢查是否成功
         if '<HTML>' in response.text or '<html>' in response.text:
@@ -63,172 +172,416 @@ def fetch_csv(sheet_id, gid, name):
         
         lines = response.text.strip().split('\n')
         print(f'✅ 下載成功：{len(lines)} 行（含標題）')
+        if snapshot:
+            snapshot.save(response.text, response)
         return response.text
     except Exception as e:
         print(f'❌ 下載錯誤：{e}')
         return None
 
+@tracer.traced('parse_csv')
 def parse_csv(csv_text):
-    """解析 CSV 並返回行清單"""
-    f = StringIO(csv_text)
-    reader = csv.DictReader(f)
-    rows = list(reader)
-    return rows
-
-def import_candidates(conn, rows):
-    """匯入候選人資料"""
-    if not rows:
-        print('❌ 沒有候選人資料')
-        return 0
+    """解析 CSV，返回（標題列, 資料列清單）；資料列為 list，依標題位置取值"""
+    reader = csv.reader(StringIO(csv_text))
+    header = next(reader, [])
+    rows = [row for row in reader if row]  # 與 DictReader 相同，略過空白行
+    tracer.count('rows', len(rows))
+    return header, rows
+
+# ========================================
+# 欄位對應（CSV 欄位 → 資料表欄位）
+# ========================================
+
+def to_text(value, default):
+    """文字：欄位存在就原樣使用（空字串也保留），欄位不存在才用預設值"""
+    return default if value is None else value
+
+def to_int(value, default):
+    """整數：空白用預設值"""
+    return int(value) if value else default
+
+def to_json_text(value, default):
+    """JSON 字串欄位：空白用預設值（'{}'）"""
+    return value or default
+
+def to_skill_list(value, default):
+    """逗號分隔 → JSON 陣列"""
+    if not value:
+        return default
+    return json.dumps([s.strip() for s in value.split(',') if s.strip()])
+
+class Column(NamedTuple):
+    db: str         # 資料表欄位
+    source: str     # CSV 欄位（試算表標題）
+    convert: Callable
+    default: object
+
+class TableMapping:
+    """
+    一張資料表的宣告式欄位對應
+
+    SQL 在建立時組好一次；compile(header) 依實際標題列算出欄位位置，
+    產生把 CSV 資料列轉成 INSERT 參數 tuple 的 RowTransformer。
+    """
     
-    print(f'\n📊 匯入 {len(rows)} 位候選人...')
+    def __init__(self, table, id_source, columns, update_columns):
+        self.table = table
+        self.id_source = id_source
+        self.columns = columns
+        db_columns = ['id'] + [c.db for c in columns] + ['created_at', 'updated_at']
+        updates = [f'{c} = EXCLUDED.{c}' for c in update_columns] + ['updated_at = NOW()']
+        # execute_values 用：VALUES %s 由 template 展開
+        self.sql = (
+            f'INSERT INTO {table} ({", ".join(db_columns)}) VALUES %s '
+            f'ON CONFLICT (id) DO UPDATE SET {", ".join(updates)}'
+        )
+        self.template = '(' + ', '.join(['%s'] * (len(columns) + 1)) + ', NOW(), NOW())'
     
-    cursor = conn.cursor()
+    def compile(self, header):
+        return RowTransformer(self, header)
+
+def make_id(name, i):
+    """資料列 ID：id 欄位值 + 列號"""
+    return f"{'unknown' if name is None else name}_{i}".replace(' ', '_')
+
+class RowTransformer:
+    """依標題列位置把資料列轉成 tuple，並統計每個欄位的空白與轉換錯誤"""
     
-    # 清空現有資料（如果重新匯入）
-    # cursor.execute('TRUNCATE TABLE candidates_pipeline CASCADE')
+    def __init__(self, mapping, header):
+        positions = {name.strip(): i for i, name in enumerate(header)}
+        self.mapping = mapping
+        self.width = len(header)
+        self.id_index = positions.get(mapping.id_source)
+        # (欄位位置或 None, 轉換函數, 預設值)；不存在的欄位直接用轉換後的預設值
+        self.plan = [(positions.get(c.source), c.convert, c.default) for c in mapping.columns]
+        self.missing = [c.source for c in mapping.columns if c.source not in positions]
+        self.empty = [0] * len(self.plan)
+        self.errors = [0] * len(self.plan)
     
-    inserted = 0
-    for i, row in enumerate(rows):
-        try:
-            # 構建 SQL INSERT
-            sql = """
-            INSERT INTO candidates_pipeline (
-                id, name, email, phone, location, current_position,
-                years_experience, job_changes, avg_tenure_months, 
-                recent_gap_months, skills, education, source,
-                work_history, leaving_reason, stability_score,
-                education_details, personality, status, recruiter,
-                notes, resume_url, created_at, updated_at
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-            ON CONFLICT (id) DO UPDATE SET
-                name = EXCLUDED.name,
-                email = EXCLUDED.email,
-                status = EXCLUDED.status,
-                updated_at = NOW();
-            """
-            
-            # 解析技能（逗號分隔 → JSON 陣列）
-            skills = row.get('技能', '').split(',') if row.get('技能') else []
-            skills = [s.strip() for s in skills if s.strip()]
-            
-            # 生成唯一 ID（使用 name + email hash）
-            candidate_id = f"{row.get('姓名', 'unknown')}_{i}".replace(' ', '_')
-            
-            cursor.execute(sql, (
-                candidate_id,
-                row.get('姓名', ''),
-                row.get('Email', ''),
-                row.get('電話', ''),
-                row.get('地點', ''),
-                row.get('目前職位', ''),
-                int(row.get('總年資(年)', 0)) if row.get('總年資(年)') else 0,
-                int(row.get('轉職次數', 0)) if row.get('轉職次數') else 0,
-                int(row.get('平均任職(月)', 0)) if row.get('平均任職(月)') else 0,
-                int(row.get('最近gap(月)', 0)) if row.get('最近gap(月)') else 0,
-                json.dumps(skills),
-                row.get('學歷', ''),
-                row.get('來源', ''),
-                row.get('工作經歷JSON', '') or '{}',
-                row.get('離職原因', ''),
-                int(row.get('穩定性評分', 0)) if row.get('穩定性評分') else 0,
-                row.get('學歷JSON', '') or '{}',
-                row.get('DISC/Big Five', '') or '{}',
-                row.get('狀態', '新進'),
-                row.get('獵頭顧問', 'Jacky'),
-                row.get('備註', ''),
-                row.get('履歷連結', '')
-            ))
-            inserted += 1
-            
-            if (i + 1) % 50 == 0:
-                print(f'  ✓ 已匯入 {i + 1} 筆...')
-        
-        except Exception as e:
-            print(f'  ⚠️  第 {i + 1} 筆錯誤：{e}')
-            continue
+    def __call__(self, row, i):
+        if len(row) < self.width:
+            row = row + [None] * (self.width - len(row))
+        name = row[self.id_index] if self.id_index is not None else None
+        values = [make_id(name, i)]
+        append = values.append
+        for k, (index, convert, default) in enumerate(self.plan):
+            value = row[index] if index is not None else None
+            if not value:
+                self.empty[k] += 1
+            try:
+                append(convert(value, default))
+            except ValueError:
+                self.errors[k] += 1
+                raise ValueError(f'{self.mapping.columns[k].source} 無法轉換：{value!r}')
+        return tuple(values)
     
+    def stats(self):
+        """每個欄位的轉換統計 {CSV 欄位: {'empty': n, 'errors': n}}"""
+        return {
+            column.source: {'empty': self.empty[k], 'errors': self.errors[k]}
+            for k, column in enumerate(self.mapping.columns)
+        }
+    
+    def print_stats(self, total):
+        if self.missing:
+            print(f'  ℹ️  試算表缺少欄位（使用預設值）：{", ".join(self.missing)}')
+        for source, counts in self.stats().items():
+            if counts['errors']:
+                print(f'  ⚠️  {source}：{counts["errors"]}/{total} 筆轉換失敗')
+
+CANDIDATE_MAPPING = TableMapping(
+    'candidates_pipeline',
+    id_source='姓名',
+    columns=[
+        Column('name', '姓名', to_text, ''),
+        Column('email', 'Email', to_text, ''),
+        Column('phone', '電話', to_text, ''),
+        Column('location', '地點', to_text, ''),
+        Column('current_position', '目前職位', to_text, ''),
+        Column('years_experience', '總年資(年)', to_int, 0),
+        Column('job_changes', '轉職次數', to_int, 0),
+        Column('avg_tenure_months', '平均任職(月)', to_int, 0),
+        Column('recent_gap_months', '最近gap(月)', to_int, 0),
+        Column('skills', '技能', to_skill_list, '[]'),
+        Column('education', '學歷', to_text, ''),
+        Column('source', '來源', to_text, ''),
+        Column('work_history', '工作經歷JSON', to_json_text, '{}'),
+        Column('leaving_reason', '離職原因', to_text, ''),
+        Column('stability_score', '穩定性評分', to_int, 0),
+        Column('education_details', '學歷JSON', to_json_text, '{}'),
+        Column('personality', 'DISC/Big Five', to_json_text, '{}'),
+        Column('status', '狀態', to_text, '新進'),
+        Column('recruiter', '獵頭顧問', to_text, 'Jacky'),
+        Column('notes', '備註', to_text, ''),
+        Column('resume_url', '履歷連結', to_text, ''),
+    ],
+    update_columns=['name', 'email', 'status']
+)
+
+JOB_MAPPING = TableMapping(
+    'jobs_pipeline',
+    id_source='職位名稱',
+    columns=[
+        Column('position_name', '職位名稱', to_text, ''),
+        Column('client_company', '客戶公司', to_text, ''),
+        Column('department', '部門', to_text, ''),
+        Column('open_positions', '需求人數', to_int, 1),
+        Column('salary_range', '薪資範圍', to_text, ''),
+        Column('key_skills', '主要技能', to_skill_list, '[]'),
+        Column('experience_required', '經驗要求', to_text, ''),
+        Column('education_required', '學歷要求', to_text, ''),
+        Column('location', '工作地點', to_text, ''),
+        Column('job_status', '職位狀態', to_text, '招募中'),
+        Column('language_required', '語言要求', to_text, ''),
+        Column('special_conditions', '特殊條件', to_text, ''),
+        Column('industry_background', '產業背景要求', to_text, ''),
+        Column('team_size', '團隊規模', to_text, ''),
+        Column('key_challenges', '關鍵挑戰', to_text, ''),
+        Column('attractive_points', '吸引亮點', to_text, ''),
+        Column('recruitment_difficulty', '招募困難點', to_text, ''),
+        Column('interview_process', '面試流程', to_text, ''),
+        Column('consultant_notes', '顧問面談備註', to_text, ''),
+    ],
+    update_columns=['position_name']
+)
+
+# 每次 execute_values 送出的筆數
+PAGE_SIZE = 500
+
+# ========================================
+# 索引管理
+# ========================================
+
+# 匯入腳本管理的次要索引：(索引名稱, 方法, 欄位)
+# 名稱與 routes-api.js 建立的相同，不會產生重複索引
+INDEXES = {
+    'candidates_pipeline': [
+        ('idx_candidates_status', 'btree', 'status'),
+        ('idx_candidates_recruiter', 'btree', 'recruiter'),
+        ('idx_candidates_updated', 'btree', 'updated_at DESC'),
+        ('idx_candidates_skills', 'gin', 'skills'),
+    ],
+    'jobs_pipeline': [
+        ('idx_jobs_status', 'btree', 'job_status'),
+        ('idx_jobs_key_skills', 'gin', 'key_skills'),
+    ]
+}
+
+# 線上 API 查詢使用、由 routes-api.js 建立的索引：大量匯入時也不移除
+SHARED_INDEXES = {'idx_candidates_status', 'idx_candidates_recruiter', 'idx_jobs_status'}
+
+# 單次匯入超過這個筆數時（--defer-indexes auto），先移除匯入腳本自己的索引、寫完再重建
+BULK_INDEX_THRESHOLD = 5000
+
+# 重建索引時的 maintenance_work_mem（GIN 建置受益最大）
+INDEX_BUILD_MEM = '256MB'
+
+def column_type(cursor, table, column):
+    cursor.execute(
+        'SELECT data_type FROM information_schema.columns WHERE table_name = %s AND column_name = %s',
+        (table, column)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+@tracer.traced('create_indexes')
+def create_indexes(conn, table):
+    """
+    建立 table 的次要索引（已存在則略過）；GIN 只建在 JSONB 欄位上
+
+    以 CREATE INDEX CONCURRENTLY 建立，重建期間 API 仍可寫入（不能在交易內執行，
+    所以暫時切成 autocommit）。上次建立被中斷留下的 INVALID 索引先移除再重建。
+    """
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SET maintenance_work_mem = '{INDEX_BUILD_MEM}'")
+        cursor.execute(
+            'SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid '
+            'WHERE i.indrelid = %s::regclass AND NOT i.indisvalid',
+            (table,)
+        )
+        invalid = {row[0] for row in cursor.fetchall()}
+        for name, method, column in INDEXES[table]:
+            if method == 'gin' and column_type(cursor, table, column) != 'jsonb':
+                # 舊版 schema（init-schema-v2.sql）的技能欄位是 TEXT
+                print(f'  ℹ️  {table}.{column} 不是 JSONB，略過 GIN 索引 {name}')
+                continue
+            if name in invalid:
+                print(f'  ⚠️  {name} 上次建立未完成（INVALID），移除後重建')
+                cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+            cursor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING {method} ({column})')
+        cursor.execute('RESET maintenance_work_mem')
+    finally:
+        cursor.close()
+        conn.autocommit = autocommit
+
+def drop_indexes(conn, table):
+    """
+    大量匯入前移除匯入腳本自己的次要索引
+
+    主鍵保留（ON CONFLICT 需要），SHARED_INDEXES 保留（匯入期間 API 仍在查詢）。
+    """
+    cursor = conn.cursor()
+    for name, _, _ in INDEXES[table]:
+        if name not in SHARED_INDEXES:
+            cursor.execute(f'DROP INDEX IF EXISTS {name}')
     conn.commit()
-    print(f'✅ 成功匯入 {inserted} 位候選人')
     cursor.close()
-    return inserted
 
-def import_jobs(conn, rows):
-    """匯入職缺資料"""
-    if not rows:
-        print('❌ 沒有職缺資料')
-        return 0
+@tracer.traced('analyze')
+def analyze(conn, table):
+    cursor = conn.cursor()
+    cursor.execute(f'ANALYZE {table}')
+    conn.commit()
+    cursor.close()
+
+def should_defer_indexes(mode, row_count):
+    if mode == 'always':
+        return True
+    if mode == 'never':
+        return False
+    return row_count >= BULK_INDEX_THRESHOLD
+
+# ========================================
+# 重複候選人合併
+# ========================================
+
+def merge_duplicates(header, rows, groups):
+    """
+    每群保留最早的一列（ID 不變），空白欄位以同群其他列依序補齊
+
+    回傳 (要略過的列號, 合併明細)；rows 中保留的列會被更新。
+    """
+    id_index = next((i for i, name in enumerate(header) if name.strip() == CANDIDATE_MAPPING.id_source), None)
     
-    print(f'\n📊 匯入 {len(rows)} 個職缺...')
+    def row_id(i):
+        return make_id(rows[i][id_index] if id_index is not None and id_index < len(rows[i]) else None, i)
     
-    cursor = conn.cursor()
+    skip = set()
+    report = []
+    for group in groups:
+        keep, *others = group['rows']
+        merged = list(rows[keep]) + [''] * (len(header) - len(rows[keep]))
+        filled = []
+        for other in others:
+            for k, value in enumerate(rows[other][:len(header)]):
+                if value and not merged[k]:
+                    merged[k] = value
+                    filled.append(header[k].strip())
+        rows[keep] = merged
+        skip.update(others)
+        report.append({
+            'kept': row_id(keep),
+            'merged': [{'id': row_id(i), 'reason': group['reasons'][i]} for i in others],
+            'filled_columns': sorted(set(filled))
+        })
+    return skip, report
+
+def dedup_candidates(header, rows, threshold=DEDUP_THRESHOLD, report_path=None):
+    """合併重複候選人，回傳要略過的列號"""
+    groups = CandidateDeduper(header, threshold).find(rows)
+    skip, report = merge_duplicates(header, rows, groups)
+    tracer.count('duplicates', len(skip))
+    if skip:
+        print(f'  🧹 合併重複候選人：{len(groups)} 組，略過 {len(skip)} 列')
+        for entry in report[:5]:
+            merged = ', '.join(f"{m['id']}（{m['reason']}）" for m in entry['merged'])
+            print(f"     {entry['kept']} ← {merged}")
+        if len(report) > 5:
+            print(f'     …另有 {len(report) - 5} 組')
+    else:
+        print('  🧹 沒有重複的候選人')
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({'threshold': threshold, 'groups': report}, f, ensure_ascii=False, indent=2)
+        print(f'  📄 合併明細：{report_path}')
+    return skip
+
+def import_rows(conn, mapping, header, rows, label, unit, defer_indexes='auto', skip=()):
+    """依欄位對應轉換資料列後批次寫入；轉換失敗的列略過並列出；skip 為不匯入的列號"""
+    transform = mapping.compile(header)
+    
+    with tracer.span('transform'):
+        values = []
+        for i, row in enumerate(rows):
+            if i in skip:
+                continue
+            try:
+                values.append(transform(row, i))
+            except ValueError as e:
+                print(f'  ⚠️  第 {i + 1} {unit}錯誤：{e}')
+                tracer.count('errors')
+    transform.print_stats(len(rows) - len(skip))
     
-    # 清空現有資料（如果重新匯入）
-    # cursor.execute('TRUNCATE TABLE jobs_pipeline CASCADE')
+    deferred = should_defer_indexes(defer_indexes, len(values))
+    if deferred:
+        print(f'  🗂️  大量匯入：先移除 {mapping.table} 匯入用的次要索引，完成後重建')
     
-    inserted = 0
-    for i, row in enumerate(rows):
-        try:
-            # 解析技能（逗號分隔 → JSON 陣列）
-            key_skills = row.get('主要技能', '').split(',') if row.get('主要技能') else []
-            key_skills = [s.strip() for s in key_skills if s.strip()]
-            
-            # 生成唯一 ID
-            job_id = f"{row.get('職位名稱', 'unknown')}_{i}".replace(' ', '_')
-            
-            sql = """
-            INSERT INTO jobs_pipeline (
-                id, position_name, client_company, department,
-                open_positions, salary_range, key_skills,
-                experience_required, education_required, location,
-                job_status, language_required, special_conditions,
-                industry_background, team_size, key_challenges,
-                attractive_points, recruitment_difficulty,
-                interview_process, consultant_notes,
-                created_at, updated_at
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-            ON CONFLICT (id) DO UPDATE SET
-                position_name = EXCLUDED.position_name,
-                updated_at = NOW();
-            """
-            
-            cursor.execute(sql, (
-                job_id,
-                row.get('職位名稱', ''),
-                row.get('客戶公司', ''),
-                row.get('部門', ''),
-                int(row.get('需求人數', 1)) if row.get('需求人數') else 1,
-                row.get('薪資範圍', ''),
-                json.dumps(key_skills),
-                row.get('經驗要求', ''),
-                row.get('學歷要求', ''),
-                row.get('工作地點', ''),
-                row.get('職位狀態', '招募中'),
-                row.get('語言要求', ''),
-                row.get('特殊條件', ''),
-                row.get('產業背景要求', ''),
-                row.get('團隊規模', ''),
-                row.get('關鍵挑戰', ''),
-                row.get('吸引亮點', ''),
-                row.get('招募困難點', ''),
-                row.get('面試流程', ''),
-                row.get('顧問面談備註', '')
-            ))
-            inserted += 1
-            
-            if (i + 1) % 20 == 0:
-                print(f'  ✓ 已匯入 {i + 1} 個...')
+    try:
+        if deferred:
+            drop_indexes(conn, mapping.table)
+        cursor = conn.cursor()
+        with tracer.span('insert'):
+            for start in range(0, len(values), PAGE_SIZE):
+                page = values[start:start + PAGE_SIZE]
+                execute_values(cursor, mapping.sql, page, template=mapping.template, page_size=PAGE_SIZE)
+                tracer.count('inserted', len(page))
+                print(f'  ✓ 已匯入 {start + len(page)} {unit}...')
         
-        except Exception as e:
-            print(f'  ⚠️  第 {i + 1} 個錯誤：{e}')
-            continue
+        with tracer.span('commit'):
+            conn.commit()
+        cursor.close()
+    finally:
+        # 匯入失敗也要把索引建回來；上次匯入被中斷而缺少的索引也在這裡補上（IF NOT EXISTS，INVALID 的會重建）
+        conn.rollback()
+        if deferred:
+            print(f'  🗂️  重建 {mapping.table} 索引...')
+        create_indexes(conn, mapping.table)
     
-    conn.commit()
-    print(f'✅ 成功匯入 {inserted} 個職缺')
-    cursor.close()
-    return inserted
+    analyze(conn, mapping.table)
+    print(f'✅ 成功匯入 {len(values)} {unit}{label}')
+    return len(values)
+
+@tracer.traced('import_candidates')
+def import_candidates(conn, header, rows, defer_indexes='auto', dedup=True,
+                      dedup_threshold=DEDUP_THRESHOLD, dedup_report=None):
+    """匯入候選人資料（先合併重複的候選人）"""
+    if not rows:
+        print('❌ 沒有候選人資料')
+        return 0
+    
+    print(f'\n📊 匯入 {len(rows)} 位候選人...')
+    skip = dedup_candidates(header, rows, dedup_threshold, dedup_report) if dedup else set()
+    return import_rows(conn, CANDIDATE_MAPPING, header, rows, '候選人', '位', defer_indexes, skip)
+
+@tracer.traced('import_jobs')
+def import_jobs(conn, header, rows, defer_indexes='auto'):
+    """匯入職缺資料"""
+    if not rows:
+        print('❌ 沒有職缺資料')
+        return 0
+    
+    print(f'\n📊 匯入 {len(rows)} 個職缺...')
+    return import_rows(conn, JOB_MAPPING, header, rows, '職缺', '個', defer_indexes)
 
 def main():
+    parser = argparse.ArgumentParser(description='從 Google Sheets CSV export 匯入到 PostgreSQL')
+    parser.add_argument('--trace', help='輸出各階段耗時與筆數（.json 或 .prom，亦可用環境變數 STEP1NE_TRACE）')
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR, help='本機快照目錄（亦可用環境變數 SHEET_SNAPSHOT_DIR）')
+    parser.add_argument('--offline', action='store_true', help='不下載，只從快照目錄匯入（<key>.csv，可用測試資料）')
+    parser.add_argument('--force', action='store_true', help='內容未變更也重新匯入')
+    parser.add_argument('--defer-indexes', choices=['auto', 'always', 'never'], default='auto',
+                        help=f'匯入期間移除匯入腳本自己的次要索引（API 共用的保留）、完成後重建（auto：單次超過 {BULK_INDEX_THRESHOLD} 筆時）')
+    parser.add_argument('--no-dedup', action='store_true', help='不合併重複的候選人')
+    parser.add_argument('--dedup-threshold', type=float, default=DEDUP_THRESHOLD,
+                        help=f'近似重複的相似度門檻（姓名 + 技能 + 工作經歷，預設 {DEDUP_THRESHOLD}）')
+    parser.add_argument('--dedup-report', help='輸出候選人合併明細 JSON')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    tracer.configure(args.trace)
+    
     print('🔄 開始從 Google Sheets 匯入資料...\n')
     
     try:
@@ -298,29 +651,30 @@ def main():
         
         conn.commit()
         cursor.close()
+        for table in INDEXES:
+            create_indexes(conn, table)
         print('✅ 資料庫連線成功\n')
         
-        # 下載並匯入候選人資料
-        candidates_csv = fetch_csv(
-            SHEETS['candidates']['sheet_id'],
-            SHEETS['candidates']['gid'],
-            SHEETS['candidates']['name']
-        )
-        
-        if candidates_csv:
-            rows = parse_csv(candidates_csv)
-            import_candidates(conn, rows)
-        
-        # 下載並匯入職缺資料
-        jobs_csv = fetch_csv(
-            SHEETS['jobs']['sheet_id'],
-            SHEETS['jobs']['gid'],
-            SHEETS['jobs']['name']
-        )
-        
-        if jobs_csv:
-            rows = parse_csv(jobs_csv)
-            import_jobs(conn, rows)
+        # 下載並匯入候選人、職缺資料（內容與上次匯入相同時跳過）
+        importers = {
+            'candidates': functools.partial(import_candidates, dedup=not args.no_dedup,
+                                            dedup_threshold=args.dedup_threshold,
+                                            dedup_report=args.dedup_report),
+            'jobs': import_jobs
+        }
+        for key, importer in importers.items():
+            sheet = SHEETS[key]
+            snapshot = SheetSnapshot(args.snapshot_dir, key)
+            csv_text = fetch_csv(sheet['sheet_id'], sheet['gid'], sheet['name'], snapshot, args.offline)
+            if not csv_text:
+                continue
+            if not args.force and snapshot.is_imported(csv_text):
+                print(f'⏭️  {sheet["name"]} 內容與上次匯入相同，跳過（--force 可強制重新匯入）')
+                tracer.count('skipped_unchanged')
+                continue
+            header, rows = parse_csv(csv_text)
+            if importer(conn, header, rows, args.defer_indexes):
+                snapshot.mark_imported(csv_text)
         
         # 驗證資料
         print('\n\n📈 匯入結果統計：')
@@ -338,10 +692,12 @@ def main():
         conn.close()
         
         print('\n✅ 匯入完成！')
+        if tracer.enabled:
+            print(f'⏱️  追蹤結果：{tracer.output}')
         
     except Exception as e:
         print(f'\n❌ 匯入失敗：{e}')
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
+    run_with_profile(main, 'import-csv-data')
@@ -3,24 +3,337 @@
 批量匹配腳本 - Batch Matcher
 一個職缺 vs 多個候選人的批量匹配
 
-輸入：公司畫像 JSON + 候選人畫像陣列 JSON
-輸出：批量匹配報告（JSON）
+輸入：公司畫像 JSON + 候選人畫像陣列 JSON（或 --db：直接從 candidates_pipeline 讀取履歷）
+輸出：批量匹配報告（JSON）；--persist-db 時每位候選人的分數另寫入 match_results
 """
 
 import json
 import argparse
 import subprocess
 import os
+import sys
 import tempfile
-from typing import Dict, List
+import importlib.util
+import itertools
+import heapq
+import shutil
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Iterator, List, Optional
 
-def batch_match(company_persona: Dict, candidate_personas: List[Dict]) -> List[Dict]:
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pyutils.tracing import tracer
+from pyutils.profiling import add_profile_arguments, run_with_profile
+from pyutils.memory_budget import MemoryBudget, format_size
+from pyutils import ipc, jsoncodec, match_results, shardnet
+from pyutils.score_store import ScoreStore, new_meta
+from pyutils.taxonomy import role_taxonomy
+
+# --in-process 時每次整批計算技能覆蓋率的候選人數
+IN_PROCESS_CHUNK = 500
+
+# 分片匹配：coordinator 每次送給 worker 的候選人數
+SHARD_BLOCK = 500
+
+# 分片匹配時輸出檔保留的匹配報告數（摘要仍涵蓋全部候選人）
+DEFAULT_TOP_K = 100
+
+# --shards 啟動本機 worker 後，等待開始監聽的秒數
+WORKER_STARTUP_SECONDS = 30
+# --save-scores 的預設目錄（可用環境變數 MATCH_SCORES_DIR 覆寫）
+DEFAULT_SCORES_DIR = os.environ.get('MATCH_SCORES_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.match-scores'
+)
+
+# --db：server-side cursor 每次 fetch 的筆數
+DB_FETCH_SIZE = 1000
+
+# --db 讀取的 candidates_pipeline 欄位（對應 generate-candidate-persona.py 的履歷欄位）
+DB_RESUME_COLUMNS = ('id', 'name', 'years_experience', 'job_changes', 'education', 'work_history', 'skills', 'notes')
+
+# ReportStore 落地後仍保留在記憶體中的欄位（排序與摘要只需要這些）
+SUMMARY_FIELDS = ('candidateName', '總分', '等級', '推薦優先級')
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """逐筆讀取 JSON 陣列檔案（元素為物件），不把整個陣列載入記憶體"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f'{path} 不是 JSON 陣列')
+        buffer = buffer[1:]
+        eof = False
+        while True:
+            buffer = buffer.lstrip(' \t\r\n,')
+            if buffer.startswith(']'):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                # 物件還沒讀完整，再讀下一段
+                if eof:
+                    raise ValueError(f'{path} JSON 陣列不完整')
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield item
+            buffer = buffer[end:]
+
+
+class ReportStore:
+    """
+    可落地的匹配報告清單（介面與 list 相容：append / sort / len / iter / 切片）
+
+    接近記憶體預算時把完整報告寫到暫存檔（JSON Lines），記憶體只保留
+    SUMMARY_FIELDS 與檔案位置，排序與摘要照常運作。
+    """
+
+    def __init__(self, budget: Optional[MemoryBudget] = None):
+        self.budget = budget
+        self.reports: List[Dict] = []
+        self.index: List[tuple] = []  # 落地後：(摘要欄位, 檔案位置)
+        self.spill_file = None
+
+    @property
+    def spilled(self) -> bool:
+        return self.spill_file is not None
+
+    def append(self, report: Dict):
+        if self.spilled:
+            self._write(report)
+            return
+        self.reports.append(report)
+        if self.budget and self.budget.near_limit():
+            self.spill()
+
+    def spill(self):
+        """把目前在記憶體中的報告搬到暫存檔"""
+        self.spill_file = tempfile.TemporaryFile(mode='w+b', suffix='.jsonl')
+        for report in self.reports:
+            self._write(report)
+        self.budget.note_degraded(f'{len(self.reports)} 份匹配報告改存到暫存檔，之後的報告直接落地')
+        self.reports = []
+
+    def _write(self, report: Dict):
+        offset = self.spill_file.tell()
+        self.spill_file.write(jsoncodec.dumps(report, compact=True) + b'\n')
+        self.index.append(({k: report.get(k) for k in SUMMARY_FIELDS}, offset))
+
+    def _read(self, offset: int) -> Dict:
+        self.spill_file.seek(offset)
+        report = jsoncodec.loads(self.spill_file.readline())
+        self.spill_file.seek(0, os.SEEK_END)
+        return report
+
+    def sort(self, key=None, reverse=False):
+        if self.spilled:
+            self.index.sort(key=(lambda item: key(item[0])) if key else None, reverse=reverse)
+        else:
+            self.reports.sort(key=key, reverse=reverse)
+
+    def __len__(self):
+        return len(self.index) if self.spilled else len(self.reports)
+
+    def __iter__(self):
+        if not self.spilled:
+            return iter(self.reports)
+        return (self._read(offset) for _, offset in self.index)
+
+    def __getitem__(self, item):
+        if not self.spilled:
+            return self.reports[item]
+        if isinstance(item, slice):
+            return [self._read(offset) for _, offset in self.index[item]]
+        return self._read(self.index[item][1])
+
+    def close(self):
+        if self.spill_file is not None:
+            self.spill_file.close()
+
+
+def write_batch_report(path: str, summary: Dict, reports: Iterable[Dict], compact: bool = False):
+    """逐筆寫出批量匹配報告（內容與 jsoncodec.dump 整份報告相同）"""
+    if compact:
+        head, middle, item_prefix, separator, tail, empty_tail = (
+            b'{"summary":', b',"matches":[', b'', b',', b']}', b']}'
+        )
+    else:
+        head, middle, item_prefix, separator, tail, empty_tail = (
+            b'{\n  "summary": ', b',\n  "matches": [', b'\n    ', b',', b'\n  ]\n}', b']\n}'
+        )
+    with open(path, 'wb') as f:
+        f.write(head + jsoncodec.dumps(summary, compact).replace(b'\n', b'\n  ') + middle)
+        count = 0
+        for report in reports:
+            if count:
+                f.write(separator)
+            f.write(item_prefix + jsoncodec.dumps(report, compact).replace(b'\n', b'\n    '))
+            count += 1
+        f.write(tail if count else empty_tail)
+
+
+@tracer.traced()
+def load_persona_matcher():
+    """載入 match-personas.py 的 PersonaMatcher（檔名含連字號，無法直接 import）"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    spec = importlib.util.spec_from_file_location('match_personas', os.path.join(script_dir, 'match-personas.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.PersonaMatcher()
+
+
+@tracer.traced()
+def load_persona_generator():
+    """載入 generate-candidate-persona.py 的 CandidatePersonaGenerator"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    spec = importlib.util.spec_from_file_location('generate_candidate_persona',
+                                                  os.path.join(script_dir, 'generate-candidate-persona.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.CandidatePersonaGenerator()
+
+
+def build_candidate_query(status: Optional[List[str]] = None, recruiter: Optional[str] = None,
+                          updated_since: Optional[str] = None, limit: Optional[int] = None):
+    """組出 candidates_pipeline 查詢（條件皆為參數，不拼接使用者輸入）"""
+    conditions = []
+    params: List = []
+    if status:
+        conditions.append('status = ANY(%s)')
+        params.append(list(status))
+    if recruiter:
+        conditions.append('recruiter = %s')
+        params.append(recruiter)
+    if updated_since:
+        conditions.append('updated_at >= %s')
+        params.append(updated_since)
+    sql = f'SELECT {", ".join(DB_RESUME_COLUMNS)} FROM candidates_pipeline'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY id'
+    if limit:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    return sql, params
+
+
+def _skill_list(value) -> List[str]:
+    """skills 欄位：JSONB 陣列，或舊版 schema 的 TEXT（JSON 字串或逗號分隔）"""
+    if isinstance(value, list):
+        return [str(s) for s in value]
+    if not value:
+        return []
+    try:
+        parsed = json.loads(value)
+        if isinstance(parsed, list):
+            return [str(s) for s in parsed]
+    except ValueError:
+        pass
+    return [s.strip() for s in value.replace('、', ',').split(',') if s.strip()]
+
+
+def row_to_resume(row: tuple) -> Dict:
+    """candidates_pipeline 資料列 → generate-candidate-persona.py 的履歷格式"""
+    record = dict(zip(DB_RESUME_COLUMNS, row))
+    return {
+        "id": record['id'],
+        "name": record['name'] or 'Unknown',
+        "years": record['years_experience'] or 0,
+        "jobChanges": record['job_changes'] or 0,
+        "education": record['education'] or '',
+        "workHistory": record['work_history'] or [],
+        "skills": _skill_list(record['skills']),
+        "notes": record['notes'] or ''
+    }
+
+
+def iter_db_personas(database_url: str, query: tuple, fetch_size: int = DB_FETCH_SIZE) -> Iterator[Dict]:
+    """
+    以具名（server-side）cursor 每次 fetch fetch_size 筆履歷，邊讀邊生成人才畫像
+
+    記憶體中同時只有一批資料列；生成失敗的候選人略過並列出。
+    """
+    try:
+        import psycopg2
+    except ImportError:  # 選用依賴：只有 --db 需要
+        raise SystemExit("❌ --db 需要安裝 psycopg2（pip install psycopg2-binary）")
+    
+    generator = load_persona_generator()
+    sql, params = query
+    conn = psycopg2.connect(database_url)
+    try:
+        conn.set_session(readonly=True)
+        cursor = conn.cursor(name='batch_match_candidates')
+        cursor.execute(sql, params)
+        while True:
+            with tracer.span('db_fetch'):
+                rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            tracer.count('db_rows', len(rows))
+            for row in rows:
+                try:
+                    persona = generator.generate_persona(row_to_resume(row))
+                except Exception as e:
+                    print(f"✗ 候選人 {row[0]} - 畫像生成失敗: {e}")
+                    tracer.count('errors')
+                    continue
+                yield persona
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def candidate_role_family(persona: Dict) -> Optional[str]:
+    """候選人畫像的職務類別；舊畫像沒有「職務」欄位時由職稱即時分類"""
+    basic = persona.get('基本結構', {})
+    role = basic.get('職務')
+    if role is not None:
+        return role.get('職務類別')
+    return role_taxonomy().classify(basic.get('職稱', '')).family
+
+
+def company_role_family(persona: Dict) -> Optional[str]:
+    role = persona.get('職務')
+    if role is not None:
+        return role.get('職務類別')
+    return role_taxonomy().classify(persona.get('jobTitle', '')).family
+
+
+def filter_by_role(company_persona: Dict, candidate_personas: Iterable[Dict]) -> Iterator[Dict]:
+    """
+    評分前先以職務類別篩選：只保留與職缺同類別的候選人
+
+    任一方無法分類（職稱不在 role-taxonomy.json 內）時不篩除，避免漏掉候選人。
+    """
+    family = company_role_family(company_persona)
+    if family is None:
+        print("⚠️  職缺職稱無法分類，不依職務篩選")
+        yield from candidate_personas
+        return
+    skipped = 0
+    for persona in candidate_personas:
+        candidate_family = candidate_role_family(persona)
+        if candidate_family is None or candidate_family == family:
+            yield persona
+        else:
+            skipped += 1
+            tracer.count('role_filtered')
+    print(f"🎯 職務篩選（{family}）：略過 {skipped} 位其他職務類別的候選人")
+
+
+def batch_match(company_persona: Dict, candidate_personas: Iterable[Dict], store: Optional[ReportStore] = None,
+                in_process: bool = False) -> List[Dict]:
     """
     批量匹配（使用 subprocess 調用 match-personas.py）
     
     Args:
         company_persona: 公司畫像
-        candidate_personas: 候選人畫像列表
+        candidate_personas: 候選人畫像列表（或逐筆產生的 iterator）
+        store: 報告存放處；給定 ReportStore 時可在接近記憶體預算時落地
+        in_process: 在本行程內以 PersonaMatcher.match_batch 整批匹配（技能覆蓋率一次算完）
         
     Returns:
         匹配報告列表（按總分排序）
@@ -29,50 +342,67 @@ def batch_match(company_persona: Dict, candidate_personas: List[Dict]) -> List[D
     script_dir = os.path.dirname(os.path.abspath(__file__))
     match_script = os.path.join(script_dir, 'match-personas.py')
     
-    reports = []
+    reports = store if store is not None else []
+    
+    if in_process:
+        matcher = load_persona_matcher()
+        candidates = iter(candidate_personas)
+        while True:
+            chunk = list(itertools.islice(candidates, IN_PROCESS_CHUNK))
+            if not chunk:
+                break
+            for report in matcher.match_batch(chunk, company_persona):
+                reports.append(report)
+                print(f"✓ {report['candidateName']} - {report['總分']}分 ({report['等級']})")
+        reports.sort(key=lambda x: x['總分'], reverse=True)
+        return reports
+    
+    # 以 stdin/stdout 與子行程交換資料（有 msgpack 時用 MessagePack），不寫暫存檔；
+    # 公司畫像對每位候選人都一樣，只編碼一次
+    fmt = ipc.default_format()
+    company_bytes = ipc.encode(company_persona, fmt)
     
     for idx, candidate_persona in enumerate(candidate_personas):
         try:
-            # 創建臨時檔案
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f_candidate:
-                json.dump(candidate_persona, f_candidate, ensure_ascii=False, indent=2)
-                candidate_file = f_candidate.name
-            
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f_company:
-                json.dump(company_persona, f_company, ensure_ascii=False, indent=2)
-                company_file = f_company.name
-            
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f_result:
-                result_file = f_result.name
+            request = ipc.envelope({
+                'candidate': ipc.encode(candidate_persona, fmt),
+                'company': company_bytes
+            }, fmt)
             
             # 調用 match-personas.py
             cmd = [
                 'python3',
                 match_script,
-                '--candidate', candidate_file,
-                '--company', company_file,
-                '--output', result_file
+                '--stdio', fmt
             ]
             
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
+            # 追蹤開啟時，子行程的 span 寫到暫存檔後併入本行程
+            trace_file = None
+            if tracer.enabled:
+                with tempfile.NamedTemporaryFile(suffix='.trace.json', delete=False) as f_trace:
+                    trace_file = f_trace.name
+                cmd += ['--trace', trace_file]
+            
+            with tracer.span('match_subprocess'):
+                result = subprocess.run(cmd, input=request, check=True, capture_output=True)
+                if trace_file:
+                    tracer.merge(jsoncodec.load(trace_file))
+                    os.unlink(trace_file)
             
             # 讀取結果
-            with open(result_file, 'r', encoding='utf-8') as f:
-                report = json.load(f)
+            report = ipc.decode(result.stdout, fmt)
             
             reports.append(report)
+            tracer.count('pairs')
             
             print(f"✓ {report['candidateName']} - {report['總分']}分 ({report['等級']})")
             
-            # 清理臨時檔案
-            os.unlink(candidate_file)
-            os.unlink(company_file)
-            os.unlink(result_file)
-            
         except subprocess.CalledProcessError as e:
-            print(f"✗ 候選人 {idx+1} - 匹配失敗: {e.stderr}")
+            print(f"✗ 候選人 {idx+1} - 匹配失敗: {e.stderr.decode('utf-8', 'replace')}")
+            tracer.count('errors')
         except Exception as e:
             print(f"✗ 候選人 {idx+1} - 匹配失敗: {e}")
+            tracer.count('errors')
     
     # 按總分排序（降序）
     reports.sort(key=lambda x: x['總分'], reverse=True)
@@ -104,6 +434,10 @@ def generate_summary(reports: List[Dict]) -> Dict:
     # 平均分
     avg_score = sum(r['總分'] for r in reports) / total_candidates if total_candidates > 0 else 0
     
+    return format_summary(total_candidates, grade_counts, avg_score, top_5)
+
+
+def format_summary(total_candidates: int, grade_counts: Dict, avg_score: float, top_5: List[Dict]) -> Dict:
     return {
         "total_candidates": total_candidates,
         "grade_distribution": grade_counts,
@@ -120,42 +454,449 @@ def generate_summary(reports: List[Dict]) -> Dict:
     }
 
 
+# ========================================
+# 分片匹配（coordinator / worker）
+# ========================================
+
+class ShardPartial:
+    """
+    一個分片的部分結果：前 top_k 份報告、等級直方圖與分數直方圖
+
+    總分已四捨五入到小數一位，分數直方圖最多 1001 格。coordinator 依分數由高到低
+    展開加總，順序與 generate_summary 對排序後報告逐筆加總相同，平均分完全一致。
+    報告帶著候選人在輸入中的序號，同分時依序號排序（與單一行程的穩定排序相同）。
+    """
+    
+    def __init__(self, top_k: int, writer: Optional[match_results.MatchResultWriter] = None,
+                 collect_scores: bool = False):
+        self.top_k = top_k
+        self.writer = writer  # 有值時每筆分數也寫入 match_results（seq = 輸入序號）
+        self.score_rows: Optional[List[list]] = [] if collect_scores else None  # --save-scores：每位候選人的分數列
+        self.heap: List[tuple] = []  # (總分, -序號, 報告)；堆頂是目前保留的最後一名
+        self.grade_counts: Dict[str, int] = {}
+        self.score_counts: Dict[float, int] = {}
+        self.count = 0
+        self.errors = 0
+    
+    def add(self, index: int, report: Dict):
+        score = report['總分']
+        self.count += 1
+        if self.writer:
+            self.writer.add(index, report)
+        if self.score_rows is not None:
+            self.score_rows.append([index, report.get('candidateId'), report.get('candidateName'), score,
+                                    report.get('維度評分', {})])
+        self.grade_counts[report['等級']] = self.grade_counts.get(report['等級'], 0) + 1
+        self.score_counts[score] = self.score_counts.get(score, 0) + 1
+        item = (score, -index, report)
+        if len(self.heap) < self.top_k:
+            heapq.heappush(self.heap, item)
+        elif item[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, item)
+    
+    def result(self) -> Dict:
+        top = sorted(self.heap, key=lambda item: (-item[0], -item[1]))
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "grade_counts": self.grade_counts,
+            "score_counts": [[score, n] for score, n in self.score_counts.items()],
+            "top": [[-neg_index, report] for _, neg_index, report in top],
+            "score_rows": self.score_rows
+        }
+
+
+def merge_partials(partials: List[Dict], top_k: int, scores: Optional[ScoreStore] = None):
+    """
+    合併各分片結果；scores 有值時依 (總分降序, 序號) 填入所有候選人的分數
+    
+    Returns:
+        (與 generate_summary 相同的摘要, 前 top_k 份報告, 這些報告在輸入中的序號)
+    """
+    total_candidates = sum(p['count'] for p in partials)
+    grade_counts = {'S': 0, 'A': 0, 'B': 0, 'C': 0, 'D': 0}
+    score_counts: Dict[float, int] = {}
+    for partial in partials:
+        for grade, n in partial['grade_counts'].items():
+            grade_counts[grade] = grade_counts.get(grade, 0) + n
+        for score, n in partial['score_counts']:
+            score_counts[score] = score_counts.get(score, 0) + n
+    
+    ordered_scores = itertools.chain.from_iterable(
+        itertools.repeat(score, score_counts[score]) for score in sorted(score_counts, reverse=True)
+    )
+    avg_score = sum(ordered_scores) / total_candidates if total_candidates > 0 else 0
+    
+    # 各分片的 top 已依 (總分降序, 序號) 排好，k-way merge 取前 top_k
+    merged = heapq.merge(*(p['top'] for p in partials), key=lambda item: (-item[1]['總分'], item[0]))
+    top = list(itertools.islice(merged, top_k))
+    reports = [report for _, report in top]
+    
+    if scores is not None:
+        rows = itertools.chain.from_iterable(p.get('score_rows') or () for p in partials)
+        for _, candidate_id, name, score, dimensions in sorted(rows, key=lambda row: (-row[3], row[0])):
+            scores.add({'candidateId': candidate_id, 'candidateName': name, '總分': score, '維度評分': dimensions})
+    summary = format_summary(total_candidates, grade_counts, avg_score, reports[:5])
+    return summary, reports, [index for index, _ in top]
+
+
+def match_block(matcher, company_persona: Dict, offset: int, candidates: List[Dict], partial: ShardPartial):
+    """worker：匹配一批候選人並累加到 partial；整批失敗時逐筆重試，只略過出錯的候選人"""
+    try:
+        reports = matcher.match_batch(candidates, company_persona)
+    except Exception:
+        reports = []
+        for idx, candidate in enumerate(candidates):
+            try:
+                reports.append(matcher.match(candidate, company_persona))
+            except Exception as e:
+                print(f"✗ 候選人 {offset + idx + 1} - 匹配失敗: {e}")
+                partial.errors += 1
+                reports.append(None)
+    for idx, report in enumerate(reports):
+        if report is not None:
+            partial.add(offset + idx, report)
+
+
+def run_worker(address: str):
+    """
+    worker 模式：監聽 address，每個 coordinator 連線一個 session
+    
+        {"op": "start", "company": {...}, "top_k": K, "persist": {...}} → {"ok": true}
+        {"op": "match", "offset": n, "candidates": [...]}               → {"ok": true, "matched": m}
+        {"op": "finish"}                                                → ShardPartial.result()
+    
+    persist（{"run_id", "job_id"}）有值時，worker 自行以 COPY 把分數寫入 match_results
+    （使用本機的 DATABASE_URL / POSTGRES_URI），finish 時 commit。
+    """
+    matcher = load_persona_matcher()
+    database_url = os.environ.get('DATABASE_URL') or os.environ.get('POSTGRES_URI')
+    
+    def handle(conn):
+        company_persona = None
+        partial = None
+        db = None
+        try:
+            while True:
+                message = shardnet.recv_message(conn)
+                if message is None:
+                    return
+                request, fmt = message
+                op = request.get('op')
+                try:
+                    if op == 'start':
+                        company_persona = request['company']
+                        writer = None
+                        persist = request.get('persist')
+                        if persist:
+                            if not database_url:
+                                raise RuntimeError("worker 沒有設定 DATABASE_URL / POSTGRES_URI")
+                            db = db or match_results.connect(database_url)
+                            writer = match_results.MatchResultWriter(db, persist['run_id'], persist['job_id'])
+                        partial = ShardPartial(request['top_k'], writer, request.get('save_scores', False))
+                        reply = {"ok": True}
+                    elif op == 'match' and partial is not None:
+                        match_block(matcher, company_persona, request['offset'], request['candidates'], partial)
+                        if partial.writer:
+                            partial.writer.flush()
+                        reply = {"ok": True, "matched": len(request['candidates'])}
+                    elif op == 'finish' and partial is not None:
+                        if partial.writer:
+                            db.commit()
+                        reply = partial.result()
+                        partial = None
+                    else:
+                        reply = {"ok": False, "error": f"無效的請求：{op}"}
+                except Exception as e:
+                    if db is not None:
+                        db.rollback()
+                    reply = {"ok": False, "error": str(e)}
+                shardnet.send_message(conn, reply, fmt)
+        finally:
+            if db is not None:
+                db.close()
+    
+    print(f"🛰️  分片 worker 監聽 {address}")
+    shardnet.serve(address, handle)
+
+
+def _exchange(sock, request: Dict, fmt: str) -> Dict:
+    shardnet.send_message(sock, request, fmt)
+    message = shardnet.recv_message(sock)
+    if message is None:
+        raise ConnectionError("worker 關閉了連線")
+    reply = message[0]
+    if reply.get('ok') is False:
+        raise RuntimeError(reply.get('error'))
+    return reply
+
+
+def distributed_match(company_persona: Dict, candidate_personas: Iterable[Dict], addresses: List[str],
+                      top_k: int = DEFAULT_TOP_K, wait: float = 0, persist: Optional[Dict] = None,
+                      scores: Optional[ScoreStore] = None):
+    """
+    coordinator：候選人切成 SHARD_BLOCK 筆一批，各 worker 做完一批再領下一批
+    
+    Args:
+        addresses: worker 位址（unix:/path 或 host:port）
+        top_k: 保留的匹配報告數（至少 5，摘要的 Top 5 需要）
+        wait: 連線失敗時的重試秒數（剛啟動的本機 worker）
+        persist: {"run_id", "job_id"}：各 worker 把分數寫入 match_results
+        scores: 有值時各 worker 回傳全部候選人的分數，依批量排序填入
+        
+    Returns:
+        (與 generate_summary 相同的摘要, 前 top_k 份報告, 這些報告在輸入中的序號)
+    """
+    top_k = max(top_k, 5)
+    fmt = ipc.default_format()
+    candidates = iter(candidate_personas)
+    lock = threading.Lock()
+    partials: List[Dict] = []
+    failures: List[str] = []
+    next_offset = [0]
+    
+    def next_block():
+        with lock:
+            block = list(itertools.islice(candidates, SHARD_BLOCK))
+            offset = next_offset[0]
+            next_offset[0] += len(block)
+            return offset, block
+    
+    def drive(address: str):
+        taken = False
+        try:
+            with shardnet.connect(address, wait) as sock:
+                _exchange(sock, {"op": "start", "company": company_persona, "top_k": top_k, "persist": persist,
+                                 "save_scores": scores is not None}, fmt)
+                while True:
+                    offset, block = next_block()
+                    if not block:
+                        break
+                    taken = True
+                    with tracer.span('shard_block'):
+                        _exchange(sock, {"op": "match", "offset": offset, "candidates": block}, fmt)
+                    tracer.count('pairs', len(block))
+                    print(f"✓ {address} - 候選人 {offset + 1}-{offset + len(block)}")
+                partial = _exchange(sock, {"op": "finish"}, fmt)
+            with lock:
+                partials.append(partial)
+        except Exception as e:
+            if not taken:
+                # 還沒領到候選人：其他 worker 會接手，結果仍然完整
+                print(f"⚠️  worker {address} 無法使用：{e}")
+                return
+            with lock:
+                failures.append(f"{address}: {e}")
+    
+    threads = [threading.Thread(target=drive, args=(address,)) for address in addresses]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if failures:
+        raise RuntimeError("分片匹配失敗（結果不完整）：" + "；".join(failures))
+    if next_block()[1]:
+        raise RuntimeError("沒有可用的 worker")
+    
+    errors = sum(p['errors'] for p in partials)
+    if errors:
+        print(f"⚠️  {errors} 位候選人匹配失敗")
+        tracer.count('errors', errors)
+    return merge_partials(partials, top_k, scores)
+
+
+@contextmanager
+def local_workers(count: int):
+    """在本機啟動 count 個 worker 行程（Unix socket），結束時關閉"""
+    directory = tempfile.mkdtemp(prefix='batch-match-shards-')
+    script = os.path.abspath(__file__)
+    addresses = [f"unix:{os.path.join(directory, f'shard-{i}.sock')}" for i in range(count)]
+    processes = [
+        subprocess.Popen(['python3', script, '--worker', '--listen', address])
+        for address in addresses
+    ]
+    try:
+        yield addresses
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
 def main():
     parser = argparse.ArgumentParser(description="批量匹配（一個職缺 vs 多個候選人）")
-    parser.add_argument("--company", required=True, help="公司畫像 JSON 檔案")
-    parser.add_argument("--candidates", required=True, help="候選人畫像陣列 JSON 檔案（不是資料夾）")
-    parser.add_argument("--output", required=True, help="輸出批量匹配報告 JSON 檔案")
+    parser.add_argument("--company", help="公司畫像 JSON 檔案")
+    parser.add_argument("--candidates", help="候選人畫像陣列 JSON 檔案（不是資料夾）")
+    parser.add_argument("--output", help="輸出批量匹配報告 JSON 檔案")
+    parser.add_argument("--trace", help="輸出耗時追蹤（.json 或 .prom，亦可用環境變數 STEP1NE_TRACE）")
+    parser.add_argument("--compact", action="store_true", help="輸出不縮排的 JSON（檔案較小、寫入較快）")
+    parser.add_argument("--in-process", action="store_true", help="不啟動子行程，在本行程內整批匹配（技能覆蓋率以稀疏矩陣一次算完）")
+    parser.add_argument("--same-role", action="store_true", help="只匹配與職缺同一職務類別的候選人（職稱無法分類者仍會匹配）")
+    parser.add_argument("--shards", type=int, help="在本機啟動 N 個分片 worker 行程平行匹配（輸出只保留前 --top-k 份報告）")
+    parser.add_argument("--workers", help="改用已啟動的分片 worker（逗號分隔，unix:/path 或 host:port；TCP 需設定 SHARD_SECRET）")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help=f"分片匹配時輸出的報告數（預設 {DEFAULT_TOP_K}；摘要涵蓋全部候選人）")
+    parser.add_argument("--worker", action="store_true", help="以分片 worker 模式執行，等待 coordinator 連線")
+    parser.add_argument("--listen", help="worker 監聽位址（unix:/path 或 host:port；TCP 需設定 SHARD_SECRET）")
+    parser.add_argument("--db", action="store_true", help="直接從 candidates_pipeline 讀取履歷並即時生成畫像（DATABASE_URL / POSTGRES_URI），取代 --candidates")
+    parser.add_argument("--status", nargs="+", help="--db：只取這些狀態的候選人")
+    parser.add_argument("--recruiter", help="--db：只取這位獵頭顧問的候選人")
+    parser.add_argument("--updated-since", help="--db：只取 updated_at 在這之後的候選人（例如 2026-01-01）")
+    parser.add_argument("--limit", type=int, help="--db：最多讀取的候選人數")
+    parser.add_argument("--fetch-size", type=int, default=DB_FETCH_SIZE, help=f"--db：每次 fetch 的筆數（預設 {DB_FETCH_SIZE}）")
+    parser.add_argument("--persist-db", action="store_true", help="把每位候選人的分數寫入 match_results（DATABASE_URL / POSTGRES_URI）")
+    parser.add_argument("--persist-top-k", type=int, default=DEFAULT_TOP_K, help=f"--persist-db：保存完整報告的人數（預設 {DEFAULT_TOP_K}）")
+    parser.add_argument("--run-id", help="--persist-db：指定 run_id（預設為 <jobId>-<時間>-<亂數>）")
+    parser.add_argument("--save-scores", action="store_true", help="保存每位候選人的維度分數（供 rerank.py 換權重重新排序）")
+    parser.add_argument("--scores-dir", default=DEFAULT_SCORES_DIR, help="--save-scores 的輸出目錄（亦可用環境變數 MATCH_SCORES_DIR）")
+    parser.add_argument("--memory-budget", help="記憶體預算（例如 512M、2G）：分階段統計用量，接近預算時改用串流與暫存檔")
+    ipc.add_stdio_argument(parser)
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
+    if args.worker:
+        if not args.listen:
+            parser.error("--worker 需要 --listen")
+        try:
+            run_worker(args.listen)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        return
+    ipc.require_files(parser, args, ["company", "output"] if args.db else ["company", "candidates", "output"])
+    database_url = os.environ.get('DATABASE_URL') or os.environ.get('POSTGRES_URI')
+    if (args.db or args.persist_db) and not database_url:
+        parser.error("--db / --persist-db 需要環境變數 DATABASE_URL 或 POSTGRES_URI")
+    if args.workers:
+        try:
+            for address in args.workers.split(','):
+                shardnet.shared_secret(address)
+        except ValueError as e:
+            parser.error(str(e))
+    tracer.configure(args.trace)
+    
+    # --stdio 時 stdin 為 {"company": {...}, "candidates": [...]}，結果寫到 stdout
+    response_stream = ipc.claim_stdout() if args.stdio else None
+    
+    budget = MemoryBudget.from_arg(args.memory_budget)
+    if budget:
+        budget.start()
+        print(f"🧠 記憶體預算：{format_size(budget.budget)}（候選人畫像逐筆讀取）")
+    stage = budget.stage if budget else (lambda name: nullcontext())
     
     print(f"🔍 開始批量匹配...")
-    print(f"   公司畫像：{args.company}")
-    print(f"   候選人畫像：{args.candidates}")
+    print(f"   公司畫像：{args.company or 'stdin'}")
+    print(f"   候選人畫像：{'candidates_pipeline（即時生成）' if args.db else args.candidates or 'stdin'}")
     print()
     
-    # 讀取公司畫像
-    with open(args.company, 'r', encoding='utf-8') as f:
-        company_persona = json.load(f)
+    with tracer.span('load_input'), stage('load_input'):
+        request = ipc.read_request(args.stdio) if args.stdio else None
+        
+        # 讀取公司畫像
+        company_persona = request["company"] if request else jsoncodec.load(args.company)
+        
+        # 讀取候選人畫像陣列（有記憶體預算時逐筆讀取）
+        if args.db:
+            # 資料庫來源：邊 fetch 邊生成畫像，不經過中間 JSON 檔
+            query = build_candidate_query(args.status, args.recruiter, args.updated_since, args.limit)
+            candidate_personas = iter_db_personas(database_url, query, args.fetch_size)
+        elif request:
+            candidate_personas = request["candidates"]
+        elif budget:
+            candidate_personas = iter_json_array(args.candidates)
+        else:
+            candidate_personas = jsoncodec.load(args.candidates)
     
-    # 讀取候選人畫像陣列
-    with open(args.candidates, 'r', encoding='utf-8') as f:
-        candidate_personas = json.load(f)
+    if args.same_role:
+        candidate_personas = filter_by_role(company_persona, candidate_personas)
+    
+    # 結果寫入 match_results：先登記 run（status = running），完成後才標記 complete
+    db = None
+    persist = None
+    if args.persist_db:
+        db = match_results.connect(database_url)
+        match_results.ensure_schema(db)
+        job_id = company_persona.get('jobId')
+        run_id = args.run_id or match_results.new_run_id(job_id)
+        match_results.start_run(db, run_id, job_id, company_persona.get('companyId'))
+        persist = {"run_id": run_id, "job_id": str(job_id)}
+        print(f"🗄️  寫入 match_results（run {run_id}）")
     
     # 執行批量匹配
-    reports = batch_match(company_persona, candidate_personas)
+    store = None
+    summary = None
+    sharded = bool(args.shards or args.workers)
+    scores = None
+    if args.save_scores:
+        scores_run_id = persist['run_id'] if persist else match_results.new_run_id(company_persona.get('jobId'))
+        scores = ScoreStore(new_meta(scores_run_id, company_persona))
+    try:
+        with stage('batch_match'):
+            if sharded:
+                # 分片匹配：摘要由各分片的部分結果合併，reports 只有前 top_k 份
+                workers = local_workers(args.shards) if args.shards else nullcontext(args.workers.split(','))
+                top_k = max(args.top_k, args.persist_top_k) if persist else args.top_k
+                with workers as addresses:
+                    print(f"🛰️  分片匹配：{len(addresses)} 個 worker")
+                    wait = WORKER_STARTUP_SECONDS if args.shards else 0
+                    try:
+                        summary, reports, seqs = distributed_match(company_persona, candidate_personas, addresses,
+                                                                   top_k, wait, persist, scores)
+                    except RuntimeError as e:
+                        print(f"❌ {e}")
+                        sys.exit(1)
+                # 分片模式的 seq 是輸入序號（與各 worker 寫入的分數列相同）
+                persisted_top = list(zip(seqs, reports))[:args.persist_top_k]
+                reports = reports[:args.top_k]
+            else:
+                store = ReportStore(budget) if budget else None
+                reports = batch_match(company_persona, candidate_personas, store, args.in_process)
+        
+        # 生成摘要
+        if summary is None:
+            with tracer.span('generate_summary'), stage('generate_summary'):
+                summary = generate_summary(reports)
+        
+        # 分數寫入 match_results（分片模式已由各 worker 寫入），前 top-K 補上完整報告
+        if db is not None:
+            with tracer.span('persist_db'), stage('persist_db'):
+                if not sharded:
+                    match_results.persist_reports(db, run_id, job_id, reports)
+                    persisted_top = enumerate(reports[:args.persist_top_k])
+                match_results.complete_run(db, run_id, summary, persisted_top)
+    except BaseException:
+        if db is not None:
+            match_results.fail_run(db, run_id)
+            db.close()
+        raise
+    if db is not None:
+        db.close()
     
-    # 生成摘要
-    summary = generate_summary(reports)
-    
-    # 組合完整報告
-    batch_report = {
-        "summary": summary,
-        "matches": reports
-    }
+    # 保存維度分數（依批量排序）
+    if scores is not None:
+        with tracer.span('save_scores'), stage('save_scores'):
+            if not sharded:
+                for report in reports:
+                    scores.add(report)
+            scores_path = os.path.join(args.scores_dir, f"{scores.meta['run_id']}.scores")
+            scores.save(scores_path)
     
     # 輸出結果
-    with open(args.output, 'w', encoding='utf-8') as f:
-        json.dump(batch_report, f, ensure_ascii=False, indent=2)
+    with tracer.span('write_output'), stage('write_output'):
+        if args.stdio:
+            ipc.write_response(response_stream, {"summary": summary, "matches": list(reports)}, args.stdio)
+        elif budget:
+            write_batch_report(args.output, summary, reports, args.compact)
+        else:
+            batch_report = {
+                "summary": summary,
+                "matches": reports
+            }
+            jsoncodec.dump(batch_report, args.output, compact=args.compact)
+    
+    if store is not None:
+        store.close()
     
     print()
     print(f"✅ 批量匹配完成！")
@@ -167,8 +908,14 @@ def main():
     for i, candidate in enumerate(summary['top_5'], 1):
         print(f"   {i}. {candidate['name']} - {candidate['total_score']}分 ({candidate['grade']}級)")
     print()
-    print(f"📄 完整報告已儲存：{args.output}")
+    print(f"📄 完整報告已儲存：{args.output or 'stdout'}")
+    if scores is not None:
+        print(f"🧮 維度分數已儲存：{scores_path}（python3 rerank.py --scores {scores_path} --weights 技能=0.5,成長=0.2）")
+    if tracer.enabled:
+        print(f"⏱️  追蹤結果：{tracer.output}")
+    if budget:
+        budget.report()
 
 
 if __name__ == "__main__":
-    main()
+    run_with_profile(main, "batch-match")
@@ -9,8 +9,70 @@
 
 import json
 import argparse
+import os
+import sys
+from dataclasses import dataclass
 from typing import Dict, List, Any
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pyutils.tracing import tracer
+from pyutils.profiling import add_profile_arguments, run_with_profile
+from pyutils import ipc, jsoncodec
+from pyutils.taxonomy import industry_taxonomy, role_taxonomy
+
+
+@dataclass
+class NormalizedResume:
+    """
+    正規化後的履歷（每份履歷只解析一次，各畫像區塊都從這裡讀取）
+    """
+    candidate_id: Any
+    name: str
+    years: float
+    job_changes: int
+    education: Any
+    work_history: List[Dict]   # workHistory 已 json.loads
+    skills: List[str]          # 去除空白，保留原大小寫
+    skills_lower: List[str]
+    text: str                  # 備註 + 技能（小寫），供關鍵字比對
+
+
+def normalize_resume(candidate: Dict) -> NormalizedResume:
+    """解析候選人履歷：workHistory 只 json.loads 一次，技能只切割/轉小寫一次"""
+    work_history = candidate.get("workHistory", [])
+    if isinstance(work_history, str):
+        try:
+            work_history = json.loads(work_history)
+        except:
+            work_history = []
+    if not isinstance(work_history, list):
+        work_history = []
+    
+    # 技能組合（支援 list 或 string）
+    skills_data = candidate.get("skills", "")
+    if isinstance(skills_data, list):
+        skills = [s.strip() for s in skills_data if s.strip()]
+        skills_text = " ".join(skills_data).lower()
+    elif isinstance(skills_data, str):
+        skills = [s.strip() for s in skills_data.split("、") if s.strip()] if skills_data else []
+        skills_text = skills_data.lower()
+    else:
+        skills = []
+        skills_text = ""
+    
+    return NormalizedResume(
+        candidate_id=candidate.get("id", "UNKNOWN"),
+        name=candidate.get("name", "Unknown"),
+        years=candidate.get("years", 0),
+        job_changes=candidate.get("jobChanges", 0),
+        education=candidate.get("education", ""),
+        work_history=work_history,
+        skills=skills,
+        skills_lower=[s.lower() for s in skills],
+        text=candidate.get("notes", "").lower() + " " + skills_text
+    )
+
+
 class CandidatePersonaGenerator:
     """人才畫像生成器"""
     
@@ -38,8 +100,24 @@ class CandidatePersonaGenerator:
     }
     
     def __init__(self):
-        pass
+        # 技能（小寫）→ 所屬分類；批量產生時同樣的技能只比對一次
+        self._skill_category_cache: Dict[str, List[str]] = {}
+        self._category_keywords = {
+            category: [kw.lower() for kw in keywords]
+            for category, keywords in self.SKILL_CATEGORIES.items()
+        }
+    
+    def _skill_categories(self, skill: str) -> List[str]:
+        categories = self._skill_category_cache.get(skill)
+        if categories is None:
+            categories = [
+                category for category, keywords in self._category_keywords.items()
+                if any(kw in skill for kw in keywords)
+            ]
+            self._skill_category_cache[skill] = categories
+        return categories
     
+    @tracer.traced()
     def generate_persona(self, candidate_data: Dict) -> Dict:
         """
         生成人才畫像
@@ -50,33 +128,32 @@ class CandidatePersonaGenerator:
         Returns:
             人才畫像（結構化JSON）
         """
+        resume = normalize_resume(candidate_data)
         persona = {
-            "candidateId": candidate_data.get("id", "UNKNOWN"),
-            "name": candidate_data.get("name", "Unknown"),
-            "基本結構": self._extract_basic_structure(candidate_data),
-            "能力層級": self._assess_capability_level(candidate_data),
-            "工作動機": self._infer_motivation(candidate_data),
-            "性格與工作風格": self._infer_work_style(candidate_data),
-            "不適配條件": self._extract_incompatibility(candidate_data)
+            "candidateId": resume.candidate_id,
+            "name": resume.name,
+            "基本結構": self._extract_basic_structure(resume),
+            "能力層級": self._assess_capability_level(resume),
+            "工作動機": self._infer_motivation(resume),
+            "性格與工作風格": self._infer_work_style(resume),
+            "不適配條件": self._extract_incompatibility(resume)
         }
+        tracer.count("personas")
         
         return persona
     
-    def _extract_basic_structure(self, candidate: Dict) -> Dict:
+    def _extract_basic_structure(self, resume: NormalizedResume) -> Dict:
         """提取基本結構"""
-        # 解析工作經歷
-        work_history = candidate.get("workHistory", [])
-        if isinstance(work_history, str):
-            try:
-                work_history = json.loads(work_history)
-            except:
-                work_history = []
+        work_history = resume.work_history
         
         # 最新職稱
         latest_position = work_history[0].get("position", "Unknown") if work_history else "Unknown"
         
+        # 職務（職稱對照 role-taxonomy.json：職務類別 / 標準職稱 / 職級）
+        role = role_taxonomy().classify(latest_position)
+        
         # 年資區間
-        total_years = candidate.get("years", 0)
+        total_years = resume.years
         if total_years >= 10:
             year_range = "10年+"
         elif total_years >= 7:
@@ -90,45 +167,29 @@ class CandidatePersonaGenerator:
         else:
             year_range = "<1年"
         
-        # 技能組合（支援 list 或 string）
-        skills_data = candidate.get("skills", "")
-        if isinstance(skills_data, list):
-            skills = [s.strip() for s in skills_data if s.strip()]
-        elif isinstance(skills_data, str):
-            skills = [s.strip() for s in skills_data.split("、") if s.strip()] if skills_data else []
-        else:
-            skills = []
-        
-        # 產業背景（從工作經歷推斷）
-        industries = set()
+        # 產業背景（從工作經歷的公司名稱 / 產業欄位推斷，對照 industry-taxonomy.json）
+        taxonomy = industry_taxonomy()
+        industries = []
         for job in work_history:
-            company = job.get("company", "")
-            # 簡化判斷（實際應用可用更複雜的邏輯）
-            if "建設" in company or "建築" in company or "營造" in company:
-                industries.add("營建業")
-            elif "科技" in company or "軟體" in company:
-                industries.add("科技業")
+            for tag in taxonomy.infer(job.get("industry", ""), job.get("company", "")):
+                if tag not in industries:
+                    industries.append(tag)
         
         # 教育背景
-        education = candidate.get("education", "")
+        education = resume.education
         
         return {
             "職稱": latest_position,
+            "職務": role.to_persona(),
             "年資區間": year_range,
-            "技能組合": skills[:10],  # 前 10 個技能
-            "產業背景": list(industries) if industries else ["Unknown"],
+            "技能組合": resume.skills[:10],  # 前 10 個技能
+            "產業背景": industries if industries else ["Unknown"],
             "教育背景": education
         }
     
-    def _assess_capability_level(self, candidate: Dict) -> Dict:
+    def _assess_capability_level(self, resume: NormalizedResume) -> Dict:
         """評估能力層級"""
-        skills_data = candidate.get("skills", "")
-        if isinstance(skills_data, list):
-            skills_list = [s.strip().lower() for s in skills_data if s.strip()]
-        elif isinstance(skills_data, str):
-            skills_list = [s.strip().lower() for s in skills_data.split("、") if s.strip()] if skills_data else []
-        else:
-            skills_list = []
+        skills_list = resume.skills_lower
         
         # 分類技能
         categorized = {
@@ -138,9 +199,8 @@ class CandidatePersonaGenerator:
         }
         
         for skill in skills_list:
-            for category, keywords in self.SKILL_CATEGORIES.items():
-                if any(kw.lower() in skill for kw in keywords):
-                    categorized[category].append(skill)
+            for category in self._skill_categories(skill):
+                categorized[category].append(skill)
         
         # 評估層級
         tech_level = "進階" if len(categorized["技術能力"]) >= 5 else "中級" if len(categorized["技術能力"]) >= 3 else "初級"
@@ -152,13 +212,10 @@ class CandidatePersonaGenerator:
             "延伸能力": categorized["延伸能力"][:5]  # 最多 5 個
         }
     
-    def _infer_motivation(self, candidate: Dict) -> Dict:
+    def _infer_motivation(self, resume: NormalizedResume) -> Dict:
         """推測工作動機（基於履歷關鍵字 + 職涯軌跡）"""
-        # 取得備註欄位（如果有）
-        notes = candidate.get("notes", "").lower()
-        skills_data = candidate.get("skills", "")
-        skills = " ".join(skills_data).lower() if isinstance(skills_data, list) else (skills_data.lower() if isinstance(skills_data, str) else "")
-        combined_text = notes + " " + skills
+        # 備註 + 技能
+        combined_text = resume.text
         
         # 匹配動機關鍵字
         detected_motivations = []
@@ -168,7 +225,7 @@ class CandidatePersonaGenerator:
         
         # 如果沒有明確關鍵字，根據年資推測
         if not detected_motivations:
-            years = candidate.get("years", 0)
+            years = resume.years
             if years >= 5:
                 detected_motivations.append("想技術成長")  # 資深人才通常追求技術深化
             elif years >= 2:
@@ -182,20 +239,9 @@ class CandidatePersonaGenerator:
             "排除動機": []  # 需要面試確認，無法從履歷判斷
         }
     
-    def _infer_work_style(self, candidate: Dict) -> Dict:
+    def _infer_work_style(self, resume: NormalizedResume) -> Dict:
         """推測性格與工作風格"""
-        notes = candidate.get("notes", "").lower()
-        skills_data = candidate.get("skills", "")
-        skills = " ".join(skills_data).lower() if isinstance(skills_data, list) else (skills_data.lower() if isinstance(skills_data, str) else "")
-        work_history = candidate.get("workHistory", [])
-        
-        if isinstance(work_history, str):
-            try:
-                work_history = json.loads(work_history)
-            except:
-                work_history = []
-        
-        combined_text = notes + " " + skills
+        combined_text = resume.text
         
         # 匹配工作風格關鍵字
         style_scores = {}
@@ -205,8 +251,8 @@ class CandidatePersonaGenerator:
                 style_scores[style] = score
         
         # 根據工作經歷補充判斷
-        job_changes = candidate.get("jobChanges", 0)
-        years = candidate.get("years", 0)
+        job_changes = resume.job_changes
+        years = resume.years
         
         if job_changes == 0:
             style_scores["穩定型"] = style_scores.get("穩定型", 0) + 2
@@ -238,7 +284,7 @@ class CandidatePersonaGenerator:
         }
         return feature_map.get(style, ["特徵待確認"])
     
-    def _extract_incompatibility(self, candidate: Dict) -> Dict:
+    def _extract_incompatibility(self, resume: NormalizedResume) -> Dict:
         """提取不適配條件（需要面試確認，這裡給預設值）"""
         # 這部分通常無法從履歷判斷，需要面試時詢問
         # 這裡僅提供框架
@@ -251,29 +297,41 @@ class CandidatePersonaGenerator:
 
 def main():
     parser = argparse.ArgumentParser(description="生成候選人人才畫像")
-    parser.add_argument("--resume", required=True, help="候選人履歷 JSON 檔案")
-    parser.add_argument("--output", required=True, help="輸出人才畫像 JSON 檔案")
+    parser.add_argument("--resume", help="候選人履歷 JSON 檔案")
+    parser.add_argument("--output", help="輸出人才畫像 JSON 檔案")
+    parser.add_argument("--trace", help="輸出耗時追蹤（.json 或 .prom，亦可用環境變數 STEP1NE_TRACE）")
+    parser.add_argument("--compact", action="store_true", help="輸出不縮排的 JSON（檔案較小、寫入較快）")
+    ipc.add_stdio_argument(parser)
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
+    ipc.require_files(parser, args, ["resume", "output"])
+    tracer.configure(args.trace)
     
-    # 讀取履歷
-    with open(args.resume, 'r', encoding='utf-8') as f:
-        candidate_data = json.load(f)
+    # 讀取履歷（--stdio 時 stdin 為 {"resume": {...}}）
+    if args.stdio:
+        response_stream = ipc.claim_stdout()
+        candidate_data = ipc.read_request(args.stdio)["resume"]
+    else:
+        candidate_data = jsoncodec.load(args.resume)
     
     # 生成人才畫像
     generator = CandidatePersonaGenerator()
     persona = generator.generate_persona(candidate_data)
     
     # 輸出結果
-    with open(args.output, 'w', encoding='utf-8') as f:
-        json.dump(persona, f, ensure_ascii=False, indent=2)
+    if args.stdio:
+        ipc.write_response(response_stream, persona, args.stdio)
+    else:
+        jsoncodec.dump(persona, args.output, compact=args.compact)
     
-    print(f"✅ 人才畫像已生成：{args.output}")
+    print(f"✅ 人才畫像已生成：{args.output or 'stdout'}")
     print(f"   候選人：{persona['name']}")
-    print(f"   職稱：{persona['基本結構']['職稱']}")
+    print(f"   職稱：{persona['基本結構']['職稱']}（{persona['基本結構']['職務']['職務類別'] or '未分類'}，"
+          f"{persona['基本結構']['職務']['職級']}）")
     print(f"   工作風格：{persona['性格與工作風格']['主要類型']}")
     print(f"   主要動機：{persona['工作動機']['主要動機']}")
 
 
 if __name__ == "__main__":
-    main()
+    run_with_profile(main, "generate-candidate-persona")
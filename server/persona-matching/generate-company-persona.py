@@ -7,10 +7,17 @@
 輸出：公司畫像（JSON）
 """
 
-import json
 import argparse
+import os
+import sys
 from typing import Dict, List, Any
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pyutils.tracing import tracer
+from pyutils.profiling import add_profile_arguments, run_with_profile
+from pyutils import ipc, jsoncodec
+from pyutils.taxonomy import industry_taxonomy, role_taxonomy, skill_taxonomy
+
 class CompanyPersonaGenerator:
     """公司畫像生成器"""
     
@@ -41,6 +48,7 @@ class CompanyPersonaGenerator:
     def __init__(self):
         pass
     
+    @tracer.traced()
     def generate_persona(self, job_data: Dict, company_data: Dict) -> Dict:
         """
         生成公司畫像
@@ -57,14 +65,18 @@ class CompanyPersonaGenerator:
             "companyName": company_data.get("name", "Unknown Company"),
             "jobId": job_data.get("id", "UNKNOWN"),
             "jobTitle": job_data.get("title", "Unknown Position"),
+            "職務": role_taxonomy().classify(job_data.get("title", "")).to_persona(),
             
             "公司階段": self._identify_company_stage(company_data),
+            "產業": self._identify_industry(company_data),
             "技術成熟度": self._assess_tech_maturity(job_data, company_data),
+            "技能需求": self._extract_required_skills(job_data),
             "用人風格": self._identify_management_style(job_data, company_data),
             "工作環境": self._describe_work_environment(job_data, company_data),
             "成長路徑": self._define_growth_path(job_data, company_data),
             "風險因子": self._identify_risk_factors(job_data, company_data)
         }
+        tracer.count("personas")
         
         return persona
     
@@ -90,6 +102,27 @@ class CompanyPersonaGenerator:
         
         return "成長期"  # 預設
     
+    def _identify_industry(self, company: Dict) -> List[str]:
+        """識別公司產業（industry 欄位優先，其次公司名稱與描述，對照 industry-taxonomy.json）"""
+        industries = industry_taxonomy().infer(
+            company.get("industry", ""),
+            company.get("name", ""),
+            company.get("description", "")
+        )
+        return industries if industries else ["Unknown"]
+    
+    def _extract_required_skills(self, job: Dict) -> List[str]:
+        """職缺需要的標準技能（skill-taxonomy.json 的標準名稱）"""
+        taxonomy = skill_taxonomy()
+        required = job.get("required_skills", [])
+        if isinstance(required, str):
+            required = required.replace("、", ",").split(",")
+        ids = taxonomy.normalize(required)
+        for i in taxonomy.infer(job.get("title", ""), job.get("description", ""), job.get("requirements", "")):
+            if i not in ids:
+                ids.append(i)
+        return [taxonomy.names[i] for i in ids]
+    
     def _assess_tech_maturity(self, job: Dict, company: Dict) -> Dict:
         """評估技術成熟度"""
         job_desc = job.get("description", "").lower()
@@ -278,34 +311,47 @@ class CompanyPersonaGenerator:
 
 def main():
     parser = argparse.ArgumentParser(description="生成公司畫像")
-    parser.add_argument("--job", required=True, help="職缺描述 JSON 檔案")
-    parser.add_argument("--company", required=True, help="公司資訊 JSON 檔案")
-    parser.add_argument("--output", required=True, help="輸出公司畫像 JSON 檔案")
+    parser.add_argument("--job", help="職缺描述 JSON 檔案")
+    parser.add_argument("--company", help="公司資訊 JSON 檔案")
+    parser.add_argument("--output", help="輸出公司畫像 JSON 檔案")
+    parser.add_argument("--trace", help="輸出耗時追蹤（.json 或 .prom，亦可用環境變數 STEP1NE_TRACE）")
+    parser.add_argument("--compact", action="store_true", help="輸出不縮排的 JSON（檔案較小、寫入較快）")
+    ipc.add_stdio_argument(parser)
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
+    ipc.require_files(parser, args, ["job", "company", "output"])
+    tracer.configure(args.trace)
     
-    # 讀取職缺描述
-    with open(args.job, 'r', encoding='utf-8') as f:
-        job_data = json.load(f)
-    
-    # 讀取公司資訊
-    with open(args.company, 'r', encoding='utf-8') as f:
-        company_data = json.load(f)
+    if args.stdio:
+        # stdin 為 {"job": {...}, "company": {...}}
+        response_stream = ipc.claim_stdout()
+        request = ipc.read_request(args.stdio)
+        job_data = request["job"]
+        company_data = request["company"]
+    else:
+        # 讀取職缺描述
+        job_data = jsoncodec.load(args.job)
+        
+        # 讀取公司資訊
+        company_data = jsoncodec.load(args.company)
     
     # 生成公司畫像
     generator = CompanyPersonaGenerator()
     persona = generator.generate_persona(job_data, company_data)
     
     # 輸出結果
-    with open(args.output, 'w', encoding='utf-8') as f:
-        json.dump(persona, f, ensure_ascii=False, indent=2)
+    if args.stdio:
+        ipc.write_response(response_stream, persona, args.stdio)
+    else:
+        jsoncodec.dump(persona, args.output, compact=args.compact)
     
-    print(f"✅ 公司畫像已生成：{args.output}")
+    print(f"✅ 公司畫像已生成：{args.output or 'stdout'}")
     print(f"   公司：{persona['companyName']}")
-    print(f"   職缺：{persona['jobTitle']}")
+    print(f"   職缺：{persona['jobTitle']}（{persona['職務']['職務類別'] or '未分類'}）")
     print(f"   公司階段：{persona['公司階段']}")
     print(f"   用人風格：{persona['用人風格']['主要風格']}")
 
 
 if __name__ == "__main__":
-    main()
+    run_with_profile(main, "generate-company-persona")
@@ -7,9 +7,16 @@
 輸出：匹配報告（JSON）
 """
 
-import json
 import argparse
-from typing import Dict, List, Any
+import os
+import sys
+from typing import Dict, List, Any, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pyutils.tracing import tracer
+from pyutils.profiling import add_profile_arguments, run_with_profile
+from pyutils import ipc, jsoncodec
+from pyutils.taxonomy import industry_taxonomy, skill_taxonomy
 
 class PersonaMatcher:
     """畫像匹配分析器"""
@@ -25,19 +32,21 @@ class PersonaMatcher:
     def __init__(self):
         pass
     
-    def match(self, candidate_persona: Dict, company_persona: Dict) -> Dict:
+    @tracer.traced()
+    def match(self, candidate_persona: Dict, company_persona: Dict, skill_overlap: Optional[float] = None) -> Dict:
         """
         執行匹配分析
         
         Args:
             candidate_persona: 人才畫像
             company_persona: 公司畫像
+            skill_overlap: 預先整批算好的技能覆蓋率（0-1，見 match_batch）
             
         Returns:
             匹配報告（包含總分、等級、建議）
         """
         # 計算各維度分數
-        skill_score = self._calculate_skill_match(candidate_persona, company_persona)
+        skill_score = self._calculate_skill_match(candidate_persona, company_persona, skill_overlap)
         growth_score = self._calculate_growth_match(candidate_persona, company_persona)
         culture_score = self._calculate_culture_match(candidate_persona, company_persona)
         motivation_score = self._calculate_motivation_match(candidate_persona, company_persona)
@@ -86,23 +95,50 @@ class PersonaMatcher:
             "推薦優先級": self._get_priority(total_score),
             "推薦原因": self._generate_recommendation_reason(candidate_persona, company_persona, total_score)
         }
+        tracer.count("pairs")
         
         return report
     
-    def _calculate_skill_match(self, candidate: Dict, company: Dict) -> float:
+    @tracer.traced()
+    def match_batch(self, candidate_personas: List[Dict], company_persona: Dict) -> List[Dict]:
+        """
+        一個職缺 vs 多位候選人：技能覆蓋率整批以稀疏矩陣乘積算出，再逐一產生報告
+        """
+        taxonomy = skill_taxonomy()
+        required = taxonomy.normalize(company_persona.get("技能需求", []))
+        overlaps = [None] * len(candidate_personas)
+        if required:
+            candidate_ids = [
+                taxonomy.normalize(p.get("基本結構", {}).get("技能組合", []))
+                for p in candidate_personas
+            ]
+            overlaps = [
+                row[0] if ids else None
+                for ids, row in zip(candidate_ids, taxonomy.overlap_matrix(candidate_ids, [required]))
+            ]
+        return [
+            self.match(persona, company_persona, overlap)
+            for persona, overlap in zip(candidate_personas, overlaps)
+        ]
+    
+    def _calculate_skill_match(self, candidate: Dict, company: Dict, precomputed_overlap: Optional[float] = None) -> float:
         """計算技能匹配度（35%）"""
-        # 技能組合匹配（50%）
-        candidate_skills = set(candidate.get("基本結構", {}).get("技能組合", []))
-        company_techs = set(
-            company.get("技術成熟度", {}).get("核心技術", []) +
-            company.get("技術成熟度", {}).get("新興技術", [])
-        )
-        
-        if not candidate_skills or not company_techs:
-            skill_overlap = 50  # 無資料時給中間分
+        # 技能組合匹配（50%）：依 skill-taxonomy.json 正規化後比對，相關技能給部分分數
+        candidate_skills = candidate.get("基本結構", {}).get("技能組合", [])
+        required_skills = company.get("技能需求", [])
+        
+        if precomputed_overlap is not None:
+            skill_overlap = precomputed_overlap * 100
+        elif required_skills and candidate_skills:
+            taxonomy = skill_taxonomy()
+            candidate_ids = taxonomy.normalize(candidate_skills)
+            required_ids = taxonomy.normalize(required_skills)
+            if candidate_ids and required_ids:
+                skill_overlap = taxonomy.overlap(candidate_ids, required_ids) * 100
+            else:
+                skill_overlap = self._legacy_skill_overlap(candidate, company)
         else:
-            overlap = len(candidate_skills & company_techs)
-            skill_overlap = min((overlap / max(len(company_techs), 1)) * 100, 100)
+            skill_overlap = self._legacy_skill_overlap(candidate, company)
         
         # 能力層級匹配（30%）
         tech_level = candidate.get("能力層級", {}).get("技術能力", "中級")
@@ -110,8 +146,11 @@ class PersonaMatcher:
         
         level_match = self._match_tech_level(tech_level, maturity)
         
-        # 產業背景匹配（20%）
-        industry_match = 80  # 簡化處理，實際應用可更複雜
+        # 產業背景匹配（20%）：查 industry-taxonomy.json 預先算好的相似度矩陣
+        industry_match = industry_taxonomy().fit(
+            candidate.get("基本結構", {}).get("產業背景", []),
+            company.get("產業", [])
+        )
         
         # 加權計算
         score = (
@@ -122,6 +161,19 @@ class PersonaMatcher:
         
         return score
     
+    def _legacy_skill_overlap(self, candidate: Dict, company: Dict) -> float:
+        """舊版公司畫像（沒有技能需求）或技能無法對應到 taxonomy 時：與核心技術完全比對"""
+        candidate_skills = set(candidate.get("基本結構", {}).get("技能組合", []))
+        company_techs = set(
+            company.get("技術成熟度", {}).get("核心技術", []) +
+            company.get("技術成熟度", {}).get("新興技術", [])
+        )
+        
+        if not candidate_skills or not company_techs:
+            return 50  # 無資料時給中間分
+        overlap = len(candidate_skills & company_techs)
+        return min((overlap / max(len(company_techs), 1)) * 100, 100)
+    
     def _match_tech_level(self, candidate_level: str, company_maturity: str) -> float:
         """匹配技術層級與公司成熟度"""
         level_scores = {
@@ -432,28 +484,39 @@ class PersonaMatcher:
 
 def main():
     parser = argparse.ArgumentParser(description="執行人才與公司畫像匹配分析")
-    parser.add_argument("--candidate", required=True, help="候選人畫像 JSON 檔案")
-    parser.add_argument("--company", required=True, help="公司畫像 JSON 檔案")
-    parser.add_argument("--output", required=True, help="輸出匹配報告 JSON 檔案")
+    parser.add_argument("--candidate", help="候選人畫像 JSON 檔案")
+    parser.add_argument("--company", help="公司畫像 JSON 檔案")
+    parser.add_argument("--output", help="輸出匹配報告 JSON 檔案")
+    parser.add_argument("--trace", help="輸出耗時追蹤（.json 或 .prom，亦可用環境變數 STEP1NE_TRACE）")
+    parser.add_argument("--compact", action="store_true", help="輸出不縮排的 JSON（檔案較小、寫入較快）")
+    ipc.add_stdio_argument(parser)
+    add_profile_arguments(parser)
     
     args = parser.parse_args()
+    ipc.require_files(parser, args, ["candidate", "company", "output"])
+    tracer.configure(args.trace)
     
-    # 讀取畫像
-    with open(args.candidate, 'r', encoding='utf-8') as f:
-        candidate_persona = json.load(f)
-    
-    with open(args.company, 'r', encoding='utf-8') as f:
-        company_persona = json.load(f)
+    # 讀取畫像（--stdio 時 stdin 為 {"candidate": {...}, "company": {...}}）
+    if args.stdio:
+        response_stream = ipc.claim_stdout()
+        request = ipc.read_request(args.stdio)
+        candidate_persona = request["candidate"]
+        company_persona = request["company"]
+    else:
+        candidate_persona = jsoncodec.load(args.candidate)
+        company_persona = jsoncodec.load(args.company)
     
     # 執行匹配
     matcher = PersonaMatcher()
     report = matcher.match(candidate_persona, company_persona)
     
     # 輸出報告
-    with open(args.output, 'w', encoding='utf-8') as f:
-        json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.stdio:
+        ipc.write_response(response_stream, report, args.stdio)
+    else:
+        jsoncodec.dump(report, args.output, compact=args.compact)
     
-    print(f"✅ 匹配報告已生成：{args.output}")
+    print(f"✅ 匹配報告已生成：{args.output or 'stdout'}")
     print(f"   候選人：{report['candidateName']}")
     print(f"   職缺：{report['jobTitle']}")
     print(f"   總分：{report['總分']} 分")
@@ -462,4 +525,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_with_profile(main, "match-personas")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+權重 what-if 重新排序 - Rerank
+以批量匹配保存的維度分數（batch-match.py --save-scores）套用新的權重，立即得到新排名，
+不必重跑 PersonaMatcher
+
+輸入：分數檔（.scores 路徑，或 --scores-dir 內的 run_id）+ 權重（--weights 或權重設定檔）
+輸出：新排名（JSON）
+
+    python3 rerank.py --scores ../.match-scores/<run_id>.scores --weights 技能=0.5,成長=0.2,文化=0.2,動機=0.1
+    python3 rerank.py --scores <run_id> --weights-file weights.json --recruiter Jacky --top 50 --output rerank.json
+
+權重設定檔：{"default": {...}, "jobs": {"<jobId>": {...}}, "recruiters": {"<顧問>": {...}}}
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pyutils.tracing import tracer
+from pyutils.profiling import add_profile_arguments, run_with_profile
+from pyutils import jsoncodec
+from pyutils.score_store import DIMENSIONS, ScoreStore, normalize_weights, parse_weights, resolve_weights
+
+# 與 batch-match.py 的 --scores-dir 預設相同
+DEFAULT_SCORES_DIR = os.environ.get('MATCH_SCORES_DIR') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.match-scores'
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以保存的維度分數套用新權重重新排序")
+    parser.add_argument("--scores", required=True, help="分數檔路徑，或 --scores-dir 內的 run_id")
+    parser.add_argument("--scores-dir", default=DEFAULT_SCORES_DIR, help="分數檔目錄（亦可用環境變數 MATCH_SCORES_DIR）")
+    parser.add_argument("--weights", help="新權重，例如 技能=0.5,成長=0.2（未指定的維度沿用預設，總和自動縮放為 1）")
+    parser.add_argument("--weights-file", help="權重設定檔 JSON（依 --recruiter 或分數檔的職缺選用）")
+    parser.add_argument("--recruiter", help="--weights-file：使用這位獵頭顧問的權重")
+    parser.add_argument("--top", type=int, default=20, help="回傳人數（預設 20）")
+    parser.add_argument("--output", help="輸出新排名 JSON 檔案（未指定時只印出）")
+    parser.add_argument("--trace", help="輸出耗時追蹤（.json 或 .prom，亦可用環境變數 STEP1NE_TRACE）")
+    parser.add_argument("--compact", action="store_true", help="輸出不縮排的 JSON（檔案較小、寫入較快）")
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    tracer.configure(args.trace)
+
+    path = args.scores
+    if not os.path.exists(path):
+        path = os.path.join(args.scores_dir, f"{args.scores}.scores")
+    if not os.path.exists(path):
+        parser.error(f"找不到分數檔：{args.scores}")
+
+    with tracer.span('load_scores'):
+        store = ScoreStore.open(path)
+    job = store.meta.get('job_title') or store.meta.get('job_id')
+    print(f"🧮 分數檔：{path}（{job}，{len(store)} 位候選人）")
+
+    # 權重：--weights > 權重設定檔 > 預設
+    try:
+        weights = {}
+        if args.weights_file:
+            weights = resolve_weights(jsoncodec.load(args.weights_file), store.meta.get('job_id'), args.recruiter)
+        if args.weights:
+            weights = {**weights, **parse_weights(args.weights)}
+        vector = normalize_weights(weights)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"⚖️  權重：{'、'.join(f'{name} {value:.2f}' for name, value in zip(DIMENSIONS, vector))}")
+
+    with tracer.span('rerank'):
+        started = time.perf_counter()
+        ranking = store.rerank(weights, args.top)
+        elapsed = (time.perf_counter() - started) * 1000
+    tracer.count('candidates', len(store))
+
+    print()
+    print(f"📊 新排名（{elapsed:.1f} ms）：")
+    for item in ranking:
+        change = item['原名次'] - item['rank']
+        arrow = f"↑{change}" if change > 0 else f"↓{-change}" if change < 0 else "－"
+        print(f"   {item['rank']}. {item['candidateName']} - {item['總分']}分（原 {item['原總分']} 分，第 {item['原名次']} 名 {arrow}）")
+
+    if args.output:
+        result = {
+            "runId": store.meta.get('run_id'),
+            "jobId": store.meta.get('job_id'),
+            "weights": dict(zip(DIMENSIONS, vector)),
+            "ranking": ranking
+        }
+        jsoncodec.dump(result, args.output, compact=args.compact)
+        print(f"\n📄 新排名已儲存：{args.output}")
+
+    if tracer.enabled:
+        print(f"⏱️  追蹤結果：{tracer.output}")
+
+
+if __name__ == "__main__":
+    run_with_profile(main, "rerank")
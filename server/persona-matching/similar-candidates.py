@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+類似候選人查詢 - Similar Candidates
+「再找幾位像這位的人」：在人才畫像索引中找最相似的候選人，不必整批跑 PersonaMatcher
+
+索引更新：人才畫像 JSON（單一畫像或陣列），只重算特徵有變動的候選人
+查詢：索引內的候選人 ID，或一份人才畫像 JSON
+輸出：相似候選人清單（JSON）
+
+    python3 similar-candidates.py --index idx.json --add personas.json
+    python3 similar-candidates.py --index idx.json --like 42 --top 10 --output similar.json
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pyutils.tracing import tracer
+from pyutils.profiling import add_profile_arguments, run_with_profile
+from pyutils import jsoncodec
+from pyutils.persona_index import SimilarCandidateIndex
+
+# 預設索引位置（可用環境變數 SIMILAR_INDEX_PATH 覆寫）
+DEFAULT_INDEX = os.environ.get('SIMILAR_INDEX_PATH') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.persona-index', 'similar-candidates.json'
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="類似候選人查詢（人才畫像 MinHash + LSH 索引）")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help="索引檔案（亦可用環境變數 SIMILAR_INDEX_PATH）")
+    parser.add_argument("--add", help="加入 / 更新索引的人才畫像 JSON（單一畫像或陣列）")
+    parser.add_argument("--remove", nargs="+", metavar="ID", help="從索引移除的候選人 ID")
+    parser.add_argument("--like", metavar="ID", help="查詢：與索引內這位候選人相似的人")
+    parser.add_argument("--persona", help="查詢：與這份人才畫像 JSON 相似的人")
+    parser.add_argument("--top", type=int, default=10, help="回傳人數（預設 10）")
+    parser.add_argument("--compact-index", action="store_true", help="重寫索引快照並清空增量紀錄")
+    parser.add_argument("--output", help="輸出查詢結果 JSON 檔案（未指定時只印出）")
+    parser.add_argument("--trace", help="輸出耗時追蹤（.json 或 .prom，亦可用環境變數 STEP1NE_TRACE）")
+    parser.add_argument("--compact", action="store_true", help="輸出不縮排的 JSON（檔案較小、寫入較快）")
+    add_profile_arguments(parser)
+
+    args = parser.parse_args()
+    if not (args.add or args.remove or args.like or args.persona or args.compact_index):
+        parser.error("請指定 --add、--remove、--like、--persona 或 --compact-index")
+    tracer.configure(args.trace)
+
+    with tracer.span('load_index'):
+        index = SimilarCandidateIndex.open(args.index)
+    print(f"📇 索引：{args.index}（{len(index)} 位候選人）")
+
+    # 更新索引
+    if args.add or args.remove:
+        with tracer.span('update_index'):
+            changed = removed = 0
+            if args.add:
+                personas = jsoncodec.load(args.add)
+                if isinstance(personas, dict):
+                    personas = [personas]
+                for persona in personas:
+                    changed += index.upsert(persona)
+            for candidate_id in args.remove or []:
+                removed += index.remove(candidate_id)
+            index.save()
+        tracer.count('updated', changed + removed)
+        print(f"✅ 索引已更新：新增 / 變更 {changed} 位，移除 {removed} 位（共 {len(index)} 位）")
+
+    if args.compact_index:
+        index.compact()
+        print(f"🗜️  已重寫索引快照")
+
+    # 查詢
+    if args.like or args.persona:
+        with tracer.span('query'):
+            if args.persona:
+                persona = jsoncodec.load(args.persona)
+                results = index.query(persona=persona, top_n=args.top)
+                target_id = persona.get('candidateId')
+                target = persona.get('name') or target_id
+            else:
+                try:
+                    results = index.query(candidate_id=args.like, top_n=args.top)
+                except KeyError as e:
+                    print(f"❌ {e.args[0]}")
+                    sys.exit(1)
+                target_id = args.like
+                target = index.entries[args.like].get('name') or args.like
+
+        print()
+        print(f"👥 與 {target} 相似的候選人：")
+        for i, item in enumerate(results, 1):
+            shared = '、'.join(item['sharedSkills'][:5]) or '無共同技能'
+            print(f"   {i}. {item['name']}（{item['candidateId']}）- 相似度 {item['similarity']}｜{shared}")
+        if not results:
+            print("   （沒有找到相似的候選人）")
+
+        if args.output:
+            jsoncodec.dump({"targetId": target_id, "targetName": target, "results": results}, args.output, compact=args.compact)
+            print(f"\n📄 查詢結果已儲存：{args.output}")
+
+    if tracer.enabled:
+        print(f"⏱️  追蹤結果：{tracer.output}")
+
+
+if __name__ == "__main__":
+    run_with_profile(main, "similar-candidates")
@@ -0,0 +1,6 @@
+"""
+pyutils - server/ 底下 Python 腳本共用的工具模組
+
+import-csv-data.py 與 persona-matching/*.py 都是獨立執行的腳本，
+共用的功能放在這裡，腳本以 sys.path 加入 server/ 後匯入。
+"""
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+dedup.py - 找出同一位候選人的多筆資料列（import-csv-data.py 匯入前合併用）
+
+1. blocking：Email / 電話正規化後相同的列直接視為同一人（電話相同但 Email 不同的除外）
+2. 近似重複：姓名、每項技能、每段經歷的公司與職稱各當一個特徵，特徵集合算 MinHash
+   簽章，LSH 同桶的配對才計算實際 Jaccard 相似度，不必兩兩比較
+
+近似重複只是推測，以下情況不合併：
+- 兩邊都有 Email（或都有電話）但不同：聯絡方式是比姓名可靠的身分依據
+- 任一邊除了姓名以外的特徵（技能、經歷）少於 DEDUP_MIN_FEATURES 個：資料太少時
+  同名的不同人相似度也是 1.0
+
+    groups = CandidateDeduper(header).find(rows)
+"""
+
+import json
+import re
+from typing import Dict, List, Optional, Sequence, Set
+
+from pyutils.minhash import LSHIndex, MinHasher, jaccard, shingles
+from pyutils.tracing import tracer
+
+# 近似重複：姓名 + 技能 + 工作經歷（特徵集合）的 Jaccard 相似度門檻
+DEDUP_THRESHOLD = 0.7
+# 近似重複另外要求姓名相近，避免技能 / 經歷雷同的不同人被合併
+DEDUP_NAME_THRESHOLD = 0.5
+# 近似重複時兩邊都至少要有這麼多個非姓名特徵（技能、經歷的公司 / 職稱）
+DEDUP_MIN_FEATURES = 3
+
+
+def normalize_email(value: Optional[str]) -> str:
+    value = (value or '').strip().lower()
+    return value if '@' in value else ''
+
+
+def normalize_phone(value: Optional[str]) -> str:
+    """只留數字，+886 9xx 轉成 09xx；太短的不當比對依據"""
+    digits = re.sub(r'\D', '', value or '')
+    if digits.startswith('886'):
+        digits = '0' + digits[3:]
+    return digits if len(digits) >= 8 else ''
+
+
+def normalize_name(value: Optional[str]) -> str:
+    """小寫、去除標點與空白；英文姓名的字序不影響（"Chen Wei" = "Wei Chen"）"""
+    name = re.sub(r'[\W_]+', ' ', (value or '').lower()).strip()
+    if name.isascii():
+        name = ' '.join(sorted(name.split()))
+    return name.replace(' ', '')
+
+
+def name_similarity(a: str, b: str) -> float:
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    return jaccard(shingles(a, 2), shingles(b, 2))
+
+
+def work_history_items(value: Optional[str]) -> List[str]:
+    """工作經歷JSON → 公司、職稱清單；不是 JSON 就整段當一項"""
+    try:
+        history = json.loads(value) if value else []
+    except ValueError:
+        return [value]
+    if isinstance(history, dict):
+        history = [history]
+    if not isinstance(history, list):
+        return [str(history)]
+    items = []
+    for job in history:
+        if isinstance(job, dict):
+            items += [f'{key}:{job[key]}' for key in ('company', 'position', 'title') if job.get(key)]
+        else:
+            items.append(str(job))
+    return items
+
+
+class CandidateDeduper:
+    """配對以 union-find 合併成群組，每群保留最早的一列"""
+
+    def __init__(self, header: Sequence[str], threshold: float = DEDUP_THRESHOLD,
+                 min_features: int = DEDUP_MIN_FEATURES):
+        positions = {name.strip(): i for i, name in enumerate(header)}
+        self.name_index = positions.get('姓名')
+        self.email_index = positions.get('Email')
+        self.phone_index = positions.get('電話')
+        self.skills_index = positions.get('技能')
+        self.history_index = positions.get('工作經歷JSON')
+        self.threshold = threshold
+        self.min_features = min_features
+        self.hasher = MinHasher()
+
+    @staticmethod
+    def _field(row: Sequence, index: Optional[int]) -> str:
+        return (row[index] or '') if index is not None and index < len(row) else ''
+
+    def _features(self, row: Sequence) -> Set[str]:
+        """技能與經歷特徵（不含姓名）"""
+        features = {
+            'skill:' + skill.strip().lower()
+            for skill in self._field(row, self.skills_index).split(',') if skill.strip()
+        }
+        features.update(
+            ' '.join(item.lower().split())
+            for item in work_history_items(self._field(row, self.history_index))
+        )
+        return features
+
+    @tracer.traced('find_duplicates')
+    def find(self, rows: Sequence[Sequence]) -> List[Dict]:
+        """回傳重複群組 [{'rows': [列號...], 'reasons': {列號: 原因}}]，列號遞增"""
+        parent = list(range(len(rows)))
+        reasons = {}
+        # 每個群組（以 root 為 key）已知的 Email / 電話
+        contacts = [
+            ({normalize_email(self._field(row, self.email_index))} - {''},
+             {normalize_phone(self._field(row, self.phone_index))} - {''})
+            for row in rows
+        ]
+
+        def root(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(a, b, reason):
+            ra, rb = root(a), root(b)
+            if ra != rb:
+                keep, other = min(ra, rb), max(ra, rb)
+                parent[other] = keep
+                contacts[keep][0].update(contacts[other][0])
+                contacts[keep][1].update(contacts[other][1])
+            reasons.setdefault(a, reason)
+            reasons.setdefault(b, reason)
+
+        def conflicting(ra, rb, kinds=(0, 1)):
+            """兩群都有 Email（kinds 含 0）或都有電話（kinds 含 1）且沒有任何一個相同"""
+            return any(contacts[ra][k] and contacts[rb][k] and not contacts[ra][k] & contacts[rb][k]
+                       for k in kinds)
+
+        # 1. blocking keys；電話相同但 Email 不同（公司總機、家用電話）不合併
+        seen = {}
+        for i in range(len(rows)):
+            for kind, keys in zip(('email', 'phone'), contacts[i]):
+                for key in sorted(keys):
+                    first = seen.setdefault((kind, key), i)
+                    if first == i:
+                        continue
+                    if kind == 'phone' and conflicting(root(first), root(i), kinds=(0,)):
+                        continue
+                    union(first, i, f'{kind} 相同')
+
+        # 2. MinHash + LSH（特徵太少的列不參與）
+        index = LSHIndex()
+        profiles = []
+        names = []
+        for i, row in enumerate(rows):
+            name = normalize_name(self._field(row, self.name_index))
+            features = self._features(row)
+            profile = features | {f'name:{name}'} if name else features
+            profiles.append(profile)
+            names.append(name)
+            if len(features) >= self.min_features:
+                index.add(i, self.hasher.signature(profile))
+
+        compared = 0
+        for a, b in index.candidate_pairs():
+            ra, rb = root(a), root(b)
+            if ra == rb:
+                continue
+            compared += 1
+            if name_similarity(names[a], names[b]) < DEDUP_NAME_THRESHOLD or conflicting(ra, rb):
+                continue
+            similarity = jaccard(profiles[a], profiles[b])
+            if similarity >= self.threshold:
+                union(a, b, f'相似度 {similarity:.2f}')
+        tracer.count('dedup_compared', compared)
+
+        groups = {}
+        for i in range(len(rows)):
+            groups.setdefault(root(i), []).append(i)
+        return [
+            {'rows': members, 'reasons': {i: reasons.get(i, '') for i in members[1:]}}
+            for members in groups.values() if len(members) > 1
+        ]
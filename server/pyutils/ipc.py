@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+ipc.py - persona-matching 腳本的 stdin/stdout 資料交換
+
+原本 personaService.js 與腳本之間靠暫存 JSON 檔傳遞；加上 --stdio 後改為：
+
+- stdin：一個 map，key 對應原本的檔案參數，例如 match-personas.py 是
+  {"candidate": {...}, "company": {...}}
+- stdout：結果本身（MessagePack 或精簡 JSON）
+- 原本印到 stdout 的進度訊息改印到 stderr
+
+    --stdio            MessagePack（需要 pip install msgpack）
+    --stdio json       精簡 JSON（不需額外套件）
+"""
+
+import argparse
+import sys
+from typing import Any, BinaryIO, Dict, Iterable
+
+from pyutils import jsoncodec
+
+try:
+    import msgpack
+except ImportError:  # 選用依賴
+    msgpack = None
+
+FORMATS = ("msgpack", "json")
+
+
+def default_format() -> str:
+    """可用時優先 MessagePack"""
+    return "msgpack" if msgpack else "json"
+
+
+def add_stdio_argument(parser: argparse.ArgumentParser):
+    parser.add_argument("--stdio", nargs="?", const="msgpack", choices=FORMATS,
+                        help="從 stdin 讀取輸入、結果寫到 stdout（預設 MessagePack），取代檔案參數")
+
+
+def require_files(parser: argparse.ArgumentParser, args: argparse.Namespace, names: Iterable[str]):
+    """未使用 --stdio 時，檔案參數為必填"""
+    if args.stdio:
+        return
+    missing = [f"--{name}" for name in names if not getattr(args, name)]
+    if missing:
+        parser.error(f"缺少參數：{' '.join(missing)}（或改用 --stdio）")
+
+
+def _check(fmt: str):
+    if fmt == "msgpack" and msgpack is None:
+        raise SystemExit("❌ --stdio msgpack 需要安裝 msgpack（pip install msgpack），或改用 --stdio json")
+
+
+def encode(obj: Any, fmt: str) -> bytes:
+    _check(fmt)
+    if fmt == "msgpack":
+        return msgpack.packb(obj, use_bin_type=True)
+    return jsoncodec.dumps(obj, compact=True)
+
+
+def decode(data: bytes, fmt: str) -> Any:
+    _check(fmt)
+    if fmt == "msgpack":
+        return msgpack.unpackb(data, raw=False)
+    return jsoncodec.loads(data)
+
+
+def envelope(parts: Dict[str, bytes], fmt: str) -> bytes:
+    """
+    用已編碼的值組出請求 map
+
+    batch-match.py 對每位候選人送出相同的公司畫像，先編碼一次再重複拼接即可。
+    """
+    _check(fmt)
+    if fmt == "msgpack":
+        packer = msgpack.Packer(use_bin_type=True)
+        chunks = [packer.pack_map_header(len(parts))]
+        for key, value in parts.items():
+            chunks += [packer.pack(key), value]
+        return b"".join(chunks)
+    return b"{" + b",".join(jsoncodec.dumps(key) + b":" + value for key, value in parts.items()) + b"}"
+
+
+def read_request(fmt: str) -> Dict:
+    request = decode(sys.stdin.buffer.read(), fmt)
+    if not isinstance(request, dict):
+        raise SystemExit("❌ stdin 的資料必須是 map")
+    return request
+
+
+def claim_stdout() -> BinaryIO:
+    """取得 stdout 的二進位串流給結果使用，之後的 print() 都改到 stderr"""
+    stream = sys.stdout.buffer
+    sys.stdout = sys.stderr
+    return stream
+
+
+def write_response(stream: BinaryIO, obj: Any, fmt: str):
+    stream.write(encode(obj, fmt))
+    stream.flush()
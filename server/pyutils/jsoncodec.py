@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+jsoncodec.py - persona-matching 腳本共用的 JSON 讀寫
+
+有安裝 orjson 就用 orjson（解析與序列化快數倍），沒有就退回標準函式庫 json。
+兩者都輸出 UTF-8、不跳脫中文、indent=2；一般報告（字串、64 位元內的整數、有限的
+浮點數）解析回來的內容相同，但位元組不一定相同：
+
+- 浮點數寫法：orjson 為 1e20、1e-7，json 為 1e+20、1e-07
+- NaN / Infinity：orjson 寫成 null，json 寫成 NaN / Infinity（不是合法 JSON）
+- 超過 64 位元的整數：orjson 是 TypeError，json 照常輸出
+- loads 遇到 NaN / Infinity：orjson 是 ValueError，json 照常解析
+
+需要逐位元組比對（例如檔案雜湊）時不要混用兩種後端。--compact 時不縮排、不留空白，
+批量報告檔案可小一半以上。
+
+    from pyutils import jsoncodec
+
+    data = jsoncodec.load(path)
+    jsoncodec.dump(report, path, compact=args.compact)
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # 選用依賴
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, compact: bool = False) -> bytes:
+    """序列化成 UTF-8 bytes"""
+    if orjson:
+        option = orjson.OPT_NON_STR_KEYS if compact else orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    if compact:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def load(path: str) -> Any:
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def dump(obj: Any, path: str, compact: bool = False):
+    with open(path, "wb") as f:
+        f.write(dumps(obj, compact))
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+match_results.py - 批量匹配結果寫入 PostgreSQL（match_runs / match_results）
+
+每位候選人一列分數（總分、四個維度、等級、優先級）以 COPY 批次寫入；完整報告
+（report JSONB）只保留前 top-K，資料量與寫入時間不隨報告內容膨脹。
+
+分數列以 (run_id, seq) 為主鍵：同一批輸入可能有重複或缺少的 candidateId
+（畫像生成時缺 ID 會填 "UNKNOWN"），candidate_id 只是一般欄位，不影響寫入。
+
+UI / bot 查詢某職缺最近一次完成的匹配（走 idx_match_results_run_score）：
+
+    SELECT candidate_id, candidate_name, total_score, grade, priority, report
+    FROM match_results
+    WHERE run_id = (SELECT run_id FROM match_runs
+                    WHERE job_id = $1 AND status = 'complete'
+                    ORDER BY created_at DESC LIMIT 1)
+    ORDER BY total_score DESC, seq
+    LIMIT 20;
+
+seq 是同分時的先後（與批量報告的排序相同）：單一行程為名次 - 1，分片模式為輸入序號。
+"""
+
+import csv
+import json
+import time
+import uuid
+from io import StringIO
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS match_runs (
+        run_id VARCHAR(160) PRIMARY KEY,
+        job_id VARCHAR(100) NOT NULL,
+        company_id VARCHAR(100),
+        status VARCHAR(20) NOT NULL DEFAULT 'running',
+        total_candidates INT,
+        summary JSONB,
+        created_at TIMESTAMP DEFAULT NOW(),
+        completed_at TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_match_runs_job ON match_runs (job_id, created_at DESC);
+
+    CREATE TABLE IF NOT EXISTS match_results (
+        run_id VARCHAR(160) NOT NULL,
+        seq INT NOT NULL,
+        job_id VARCHAR(100) NOT NULL,
+        candidate_id VARCHAR(100),
+        candidate_name VARCHAR(255),
+        total_score REAL NOT NULL,
+        grade CHAR(1),
+        priority VARCHAR(20),
+        skill_score REAL,
+        growth_score REAL,
+        culture_score REAL,
+        motivation_score REAL,
+        report JSONB,
+        PRIMARY KEY (run_id, seq)
+    );
+    CREATE INDEX IF NOT EXISTS idx_match_results_run_score ON match_results (run_id, total_score DESC, seq);
+    CREATE INDEX IF NOT EXISTS idx_match_results_candidate ON match_results (job_id, candidate_id);
+"""
+
+# COPY 的欄位（report 另外只寫前 top-K）
+COPY_COLUMNS = (
+    'run_id', 'seq', 'job_id', 'candidate_id', 'candidate_name', 'total_score', 'grade', 'priority',
+    'skill_score', 'growth_score', 'culture_score', 'motivation_score'
+)
+
+# 緩衝到這個筆數就送出一次 COPY
+COPY_BATCH = 5000
+
+
+def connect(database_url: str):
+    try:
+        import psycopg2
+    except ImportError:  # 選用依賴：只有寫入資料庫時需要
+        raise SystemExit("❌ 寫入 match_results 需要安裝 psycopg2（pip install psycopg2-binary）")
+    return psycopg2.connect(database_url)
+
+
+def new_run_id(job_id) -> str:
+    return f"{job_id}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def ensure_schema(conn):
+    cursor = conn.cursor()
+    cursor.execute(SCHEMA)
+    conn.commit()
+    cursor.close()
+
+
+def start_run(conn, run_id: str, job_id, company_id):
+    cursor = conn.cursor()
+    cursor.execute(
+        'INSERT INTO match_runs (run_id, job_id, company_id) VALUES (%s, %s, %s)',
+        (run_id, str(job_id), None if company_id is None else str(company_id))
+    )
+    conn.commit()
+    cursor.close()
+
+
+def complete_run(conn, run_id: str, summary: Dict, reports: Iterable[Tuple[int, Dict]]):
+    """寫入前 top-K 的完整報告（(seq, 報告)），並把 run 標記為完成"""
+    from psycopg2.extras import execute_values
+
+    cursor = conn.cursor()
+    rows = [(run_id, seq, json.dumps(report, ensure_ascii=False)) for seq, report in reports]
+    if rows:
+        execute_values(
+            cursor,
+            'UPDATE match_results AS m SET report = v.report::jsonb FROM (VALUES %s) AS v(run_id, seq, report) '
+            'WHERE m.run_id = v.run_id AND m.seq = v.seq',
+            rows
+        )
+    cursor.execute(
+        "UPDATE match_runs SET status = 'complete', total_candidates = %s, summary = %s::jsonb, completed_at = NOW() "
+        "WHERE run_id = %s",
+        (summary['total_candidates'], json.dumps(summary, ensure_ascii=False), run_id)
+    )
+    conn.commit()
+    cursor.close()
+
+
+def fail_run(conn, run_id: str):
+    conn.rollback()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE match_runs SET status = 'failed', completed_at = NOW() WHERE run_id = %s", (run_id,))
+    conn.commit()
+    cursor.close()
+
+
+def _candidate_id(report: Dict) -> Optional[str]:
+    candidate_id = report.get('candidateId')
+    return None if candidate_id is None else str(candidate_id)
+
+
+class MatchResultWriter:
+    """
+    逐筆加入匹配報告，累積 COPY_BATCH 筆以 COPY ... FROM STDIN (FORMAT csv) 寫入
+
+    只寫分數欄位；呼叫端負責 commit（分片 worker 每個 session 結束時 commit 一次）。
+    """
+
+    def __init__(self, conn, run_id: str, job_id, batch_size: int = COPY_BATCH):
+        self.conn = conn
+        self.run_id = run_id
+        self.job_id = str(job_id)
+        self.batch_size = batch_size
+        self.rows: List[tuple] = []
+        self.written = 0
+        self.sql = f"COPY match_results ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+    def add(self, seq: int, report: Dict):
+        scores = report.get('維度評分', {})
+        self.rows.append((
+            self.run_id, seq, self.job_id, _candidate_id(report), report.get('candidateName'),
+            report['總分'], report.get('等級'), report.get('推薦優先級'),
+            scores.get('技能匹配'), scores.get('成長匹配'), scores.get('文化匹配'), scores.get('動機匹配')
+        ))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        buffer = StringIO()
+        csv.writer(buffer).writerows(self.rows)  # None 與空字串寫成空欄位 → NULL
+        buffer.seek(0)
+        cursor = self.conn.cursor()
+        cursor.copy_expert(self.sql, buffer)
+        cursor.close()
+        self.written += len(self.rows)
+        self.rows = []
+
+
+def persist_reports(conn, run_id: str, job_id, reports: Iterable[Dict]) -> int:
+    """單一行程：依排序後順序寫入全部分數列（seq = 名次 - 1）"""
+    writer = MatchResultWriter(conn, run_id, job_id)
+    for seq, report in enumerate(reports):
+        writer.add(seq, report)
+    writer.flush()
+    conn.commit()
+    return writer.written
+
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+memory_budget.py - 記憶體預算與 tracemalloc 分階段統計
+
+大量候選人的批次曾經被 OOM kill 而看不出是哪個資料結構爆掉。
+開啟 --memory-budget 後：
+
+- 以 tracemalloc 記錄每個階段（stage）的目前用量、階段峰值與成長最多的配置位置
+- 呼叫端以 near_limit() 判斷是否接近預算（預設 80%），改用串流 / 落地暫存檔
+- 結束時列出各階段統計、整體峰值與前幾名配置位置
+
+    budget = MemoryBudget.from_arg("512M")
+    budget.start()
+    with budget.stage("load_input"):
+        ...
+    budget.report()
+"""
+
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+TOP_SITES = 5
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    """'512M' / '2G' / '100000' → bytes"""
+    text = text.strip().upper().rstrip("B")
+    unit = text[-1] if text and text[-1] in SIZE_UNITS else ""
+    number = text[:-1] if unit else text
+    return int(float(number) * SIZE_UNITS[unit])
+
+
+def format_size(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class MemoryBudget:
+    """tracemalloc 分階段統計 + 預算門檻"""
+
+    def __init__(self, budget_bytes: int, soft_ratio: float = 0.8, frames: int = 1):
+        self.budget = budget_bytes
+        self.soft_limit = int(budget_bytes * soft_ratio)
+        self.frames = frames
+        self.stages: List[Dict] = []
+        self.degraded: List[str] = []
+        self.peak = 0
+
+    @classmethod
+    def from_arg(cls, value: Optional[str]) -> Optional["MemoryBudget"]:
+        return cls(parse_size(value)) if value else None
+
+    def start(self):
+        tracemalloc.start(self.frames)
+
+    def current(self) -> int:
+        return tracemalloc.get_traced_memory()[0]
+
+    def near_limit(self) -> bool:
+        """目前用量是否已達軟性門檻（呼叫端應改用串流 / 落地）"""
+        return self.current() >= self.soft_limit
+
+    def note_degraded(self, reason: str):
+        """記錄降級動作（列在最後的報告中）"""
+        self.degraded.append(reason)
+        print(f"⚠️  記憶體接近預算（{format_size(self.current())} / {format_size(self.budget)}）：{reason}")
+
+    @contextmanager
+    def stage(self, name: str):
+        before = tracemalloc.take_snapshot()
+        current_before = self.current()
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            current, stage_peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            growth = [
+                stat for stat in after.compare_to(before, "lineno")
+                if stat.size_diff > 0
+            ][:TOP_SITES]
+            self.peak = max(self.peak, stage_peak)
+            self.stages.append({
+                "stage": name,
+                "seconds": time.perf_counter() - started,
+                "before": current_before,
+                "after": current,
+                "peak": stage_peak,
+                "top_sites": [
+                    (f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", stat.size_diff, stat.count_diff)
+                    for stat in growth
+                ]
+            })
+
+    def report(self):
+        print()
+        print(f"🧠 記憶體統計（預算 {format_size(self.budget)}，軟性門檻 {format_size(self.soft_limit)}）")
+        print(f"   {'階段':<20}{'開始':>12}{'結束':>12}{'階段峰值':>12}{'秒數':>9}")
+        for stage in self.stages:
+            print(f"   {stage['stage']:<20}{format_size(stage['before']):>12}{format_size(stage['after']):>12}"
+                  f"{format_size(stage['peak']):>12}{stage['seconds']:>9.2f}")
+
+        worst = max(self.stages, key=lambda s: s["peak"], default=None)
+        if worst and worst["top_sites"]:
+            print(f"\n   峰值最高的階段「{worst['stage']}」成長最多的配置位置：")
+            for site, size, count in worst["top_sites"]:
+                print(f"     +{format_size(size):>10}  {count:>+8} 個物件  {site}")
+
+        # ru_maxrss：Linux 單位為 KB，macOS 為 bytes
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        max_rss *= 1 if sys.platform == "darwin" else 1024
+        print(f"\n   tracemalloc 峰值：{format_size(self.peak)}，行程最大 RSS：{format_size(max_rss)}")
+        if self.peak > self.budget:
+            print(f"   ❌ 峰值超過預算 {format_size(self.peak - self.budget)}")
+        for reason in self.degraded:
+            print(f"   ↪ 已降級：{reason}")
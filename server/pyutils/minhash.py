@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+minhash.py - MinHash 簽章與 LSH 分桶（找相似集合，不必兩兩比較）
+
+- shingles(text)          文字 → 字元 n-gram 集合（中英文都適用）
+- MinHasher.signature(s)  集合 → NUM_PERM 個最小雜湊值；兩個簽章相同位置相等的比例
+                          即 Jaccard 相似度的估計值
+- LSHIndex                簽章切成 bands 段，任一段完全相同的項目落在同一桶，
+                          只有同桶的項目才需要實際比較
+
+雜湊使用 blake2b（不受 PYTHONHASHSEED 影響），簽章可跨行程保存、比較。
+
+    hasher = MinHasher()
+    index = LSHIndex()
+    for key, text in records:
+        index.add(key, hasher.signature(shingles(text)))
+    for a, b in index.candidate_pairs():
+        ...
+"""
+
+import hashlib
+import re
+import struct
+from typing import Dict, Hashable, Iterable, Iterator, List, Set, Tuple
+
+NUM_PERM = 64
+BANDS = 16          # 每段 NUM_PERM / BANDS = 4 個值；Jaccard 約 0.5 以上的配對幾乎都會同桶
+SHINGLE_SIZE = 3
+
+_WORDS = struct.Struct("<16I")   # blake2b 64 bytes = 16 個 32-bit 雜湊值
+_SPACES = re.compile(r"\s+")
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """小寫、合併空白後的字元 n-gram；比 n 短的文字整段當一個 shingle"""
+    text = _SPACES.sub(" ", text.lower()).strip()
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a: Set, b: Set) -> float:
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """每個 shingle 以 NUM_PERM / 16 次 blake2b 取得 NUM_PERM 個獨立雜湊值，逐位置取最小"""
+
+    def __init__(self, num_perm: int = NUM_PERM):
+        if num_perm % 16:
+            raise ValueError("num_perm 必須是 16 的倍數")
+        self.num_perm = num_perm
+        self.salts = [struct.pack("<I", i) for i in range(num_perm // 16)]
+
+    def _hashes(self, shingle: str) -> Tuple[int, ...]:
+        data = shingle.encode("utf-8")
+        values: Tuple[int, ...] = ()
+        for salt in self.salts:
+            values += _WORDS.unpack(hashlib.blake2b(data, digest_size=64, salt=salt).digest())
+        return values
+
+    def signature(self, items: Iterable[str]) -> Tuple[int, ...]:
+        """空集合回傳空 tuple（不參與 LSH）"""
+        rows = [self._hashes(item) for item in items]
+        if not rows:
+            return ()
+        return tuple(min(column) for column in zip(*rows))
+
+
+def estimate_similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """兩個簽章的 Jaccard 估計值"""
+    if not a or len(a) != len(b):
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class LSHIndex:
+    """
+    簽章分段分桶：buckets[(band, 該段的值)] = [key, ...]
+
+    項目可逐筆加入或移除，signatures 保存每個 key 的簽章供查詢與重新計算相似度。
+    """
+
+    def __init__(self, bands: int = BANDS, num_perm: int = NUM_PERM):
+        if num_perm % bands:
+            raise ValueError("num_perm 必須是 bands 的倍數")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], List[Hashable]] = {}
+        self.signatures: Dict[Hashable, Tuple[int, ...]] = {}
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> Iterator[Tuple[int, Tuple[int, ...]]]:
+        rows = self.rows
+        for band in range(self.bands):
+            yield band, signature[band * rows:(band + 1) * rows]
+
+    def add(self, key: Hashable, signature: Tuple[int, ...]):
+        if key in self.signatures:
+            self.remove(key)
+        self.signatures[key] = signature
+        if not signature:
+            return
+        for band_key in self._band_keys(signature):
+            self.buckets.setdefault(band_key, []).append(key)
+
+    def remove(self, key: Hashable):
+        signature = self.signatures.pop(key, None)
+        if not signature:
+            return
+        for band_key in self._band_keys(signature):
+            bucket = self.buckets.get(band_key)
+            if bucket and key in bucket:
+                bucket.remove(key)
+                if not bucket:
+                    del self.buckets[band_key]
+
+    def query(self, signature: Tuple[int, ...]) -> Set[Hashable]:
+        """與 signature 至少有一段相同的 key"""
+        found: Set[Hashable] = set()
+        if not signature:
+            return found
+        for band_key in self._band_keys(signature):
+            found.update(self.buckets.get(band_key, ()))
+        return found
+
+    def candidate_pairs(self) -> Set[Tuple[Hashable, Hashable]]:
+        """所有同桶的 (a, b) 配對（a 先加入），每對只列一次"""
+        order = {key: i for i, key in enumerate(self.signatures)}
+        pairs: Set[Tuple[Hashable, Hashable]] = set()
+        for bucket in self.buckets.values():
+            if len(bucket) < 2:
+                continue
+            for i, a in enumerate(bucket):
+                for b in bucket[i + 1:]:
+                    pairs.add((a, b) if order[a] < order[b] else (b, a))
+        return pairs
+
+    def __len__(self):
+        return len(self.signatures)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+persona_index.py - 「類似候選人」索引（人才畫像的 MinHash + LSH）
+
+特徵取自人才畫像：
+- 技能：基本結構.技能組合，能對應 skill-taxonomy.json 的用標準名稱
+- 特質：能力層級（技術 / 實務 / 延伸能力）、性格與工作風格、工作動機
+
+LSH 簽章只用技能 + 一個「技術能力 | 主要風格 | 主要動機」組合特徵：特質的值只有幾種，
+單獨放進簽章會讓大量候選人同桶，查詢退化成全表掃描。同桶的候選人再以
+技能與特質的 Jaccard 加權重新排序。
+
+磁碟格式（path 為快照，path + ".log" 為增量紀錄，JSONL）：
+
+    {"version": 1, "entries": {"<candidateId>": {"name", "skills", "traits", "signature"}}}
+    {"op": "put", "id": "...", "entry": {...}}
+    {"op": "del", "id": "..."}
+
+載入時讀快照再重播增量紀錄；增量紀錄超過快照筆數的 COMPACT_RATIO 時重寫快照。
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pyutils import jsoncodec
+from pyutils.minhash import LSHIndex, MinHasher, jaccard
+from pyutils.taxonomy import skill_taxonomy
+
+FORMAT_VERSION = 1
+# 類似度 = 技能 Jaccard × SKILL_WEIGHT + 特質 Jaccard × (1 - SKILL_WEIGHT)
+SKILL_WEIGHT = 0.6
+# 特徵集合小（約 10-20 個），每段 2 個值，Jaccard 0.2 以上的配對大多能同桶
+BANDS = 32
+# 增量紀錄筆數超過快照筆數的這個比例（且至少 COMPACT_MIN 筆）時重寫快照
+COMPACT_RATIO = 0.25
+COMPACT_MIN = 1000
+
+
+def persona_features(persona: Dict) -> Tuple[List[str], List[str]]:
+    """人才畫像 → (技能特徵, 特質特徵)，皆已排序"""
+    basic = persona.get("基本結構", {})
+    taxonomy = skill_taxonomy()
+    skills = set()
+    for skill in basic.get("技能組合", []):
+        if not isinstance(skill, str) or not skill.strip():
+            continue
+        ids = taxonomy.normalize([skill])
+        if ids:
+            skills.update(taxonomy.names[i] for i in ids)
+        else:
+            skills.add(skill.strip().lower())
+
+    capability = persona.get("能力層級", {})
+    style = persona.get("性格與工作風格", {})
+    motivation = persona.get("工作動機", {})
+    traits = {
+        f"技術能力:{capability.get('技術能力')}",
+        f"實務能力:{capability.get('實務能力')}",
+        f"主要類型:{style.get('主要類型')}",
+        f"主要動機:{motivation.get('主要動機')}",
+    }
+    if style.get("次要類型"):
+        traits.add(f"次要類型:{style['次要類型']}")
+    traits.update(f"延伸能力:{item}" for item in capability.get("延伸能力", []))
+    traits.update(f"次要動機:{item}" for item in motivation.get("次要動機", []))
+    return sorted(skills), sorted(traits)
+
+
+def similarity(skills_a: Set[str], traits_a: Set[str], skills_b: Set[str], traits_b: Set[str]) -> float:
+    return SKILL_WEIGHT * jaccard(skills_a, skills_b) + (1 - SKILL_WEIGHT) * jaccard(traits_a, traits_b)
+
+
+class SimilarCandidateIndex:
+    """可持久化、可逐筆更新的類似候選人索引"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.log_path = path + ".log"
+        self.hasher = MinHasher()
+        self.lsh = LSHIndex(bands=BANDS)
+        self.entries: Dict[str, Dict] = {}
+        self._sets: Dict[str, Tuple[Set[str], Set[str]]] = {}
+        self._pending: List[Dict] = []
+        self._log_size = 0
+
+    @classmethod
+    def open(cls, path: str) -> "SimilarCandidateIndex":
+        index = cls(path)
+        index._load()
+        return index
+
+    # ---------- 讀寫 ----------
+
+    def _load(self):
+        if os.path.exists(self.path):
+            snapshot = jsoncodec.load(self.path)
+            if snapshot.get("version") != FORMAT_VERSION:
+                raise ValueError(f"索引格式版本不符：{snapshot.get('version')}（需要 {FORMAT_VERSION}），請重建索引")
+            for key, entry in snapshot.get("entries", {}).items():
+                self._apply_put(key, entry)
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    op = jsoncodec.loads(line)
+                    if op["op"] == "put":
+                        self._apply_put(op["id"], op["entry"])
+                    else:
+                        self._apply_delete(op["id"])
+                    self._log_size += 1
+
+    def save(self):
+        """寫出尚未保存的變更（附加到增量紀錄，必要時重寫快照）"""
+        if not self._pending:
+            return
+        if self._log_size + len(self._pending) > max(COMPACT_MIN, len(self.entries) * COMPACT_RATIO):
+            self.compact()
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+        with open(self.log_path, "ab") as f:
+            for op in self._pending:
+                f.write(jsoncodec.dumps(op, compact=True) + b"\n")
+        self._log_size += len(self._pending)
+        self._pending = []
+
+    def compact(self):
+        """重寫快照並清空增量紀錄（先寫暫存檔再 rename）"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        jsoncodec.dump({"version": FORMAT_VERSION, "entries": self.entries}, tmp_path, compact=True)
+        os.replace(tmp_path, self.path)
+        if os.path.exists(self.log_path):
+            os.unlink(self.log_path)
+        self._log_size = 0
+        self._pending = []
+
+    # ---------- 更新 ----------
+
+    def _apply_put(self, key: str, entry: Dict):
+        self.entries[key] = entry
+        self._sets[key] = (set(entry["skills"]), set(entry["traits"]))
+        self.lsh.add(key, tuple(entry["signature"]))
+
+    def _apply_delete(self, key: str):
+        self.entries.pop(key, None)
+        self._sets.pop(key, None)
+        self.lsh.remove(key)
+
+    def _signature(self, skills: List[str], traits: List[str]) -> Tuple[int, ...]:
+        profile = "|".join(
+            next((t for t in traits if t.startswith(prefix)), prefix)
+            for prefix in ("技術能力:", "主要類型:", "主要動機:")
+        )
+        return self.hasher.signature([f"skill:{s}" for s in skills] + [f"profile:{profile}"])
+
+    def upsert(self, persona: Dict) -> bool:
+        """加入或更新一位候選人；特徵沒變時不動索引，回傳是否有變更"""
+        key = str(persona.get("candidateId"))
+        skills, traits = persona_features(persona)
+        current = self.entries.get(key)
+        if current and current["skills"] == skills and current["traits"] == traits \
+                and current.get("name") == persona.get("name"):
+            return False
+        entry = {
+            "name": persona.get("name"),
+            "skills": skills,
+            "traits": traits,
+            "signature": list(self._signature(skills, traits))
+        }
+        self._apply_put(key, entry)
+        self._pending.append({"op": "put", "id": key, "entry": entry})
+        return True
+
+    def remove(self, candidate_id) -> bool:
+        key = str(candidate_id)
+        if key not in self.entries:
+            return False
+        self._apply_delete(key)
+        self._pending.append({"op": "del", "id": key})
+        return True
+
+    # ---------- 查詢 ----------
+
+    def query(self, persona: Optional[Dict] = None, candidate_id=None, top_n: int = 10,
+              exclude: Iterable = ()) -> List[Dict]:
+        """
+        與指定候選人（索引內的 candidate_id 或一份人才畫像）最相似的 top_n 位
+
+        只比較 LSH 同桶的候選人，結果可能少於 top_n。
+        """
+        if persona is not None:
+            skills, traits = persona_features(persona)
+            signature = self._signature(skills, traits)
+            key = str(persona.get("candidateId"))
+        else:
+            key = str(candidate_id)
+            if key not in self.entries:
+                raise KeyError(f"索引中沒有候選人 {candidate_id}")
+            entry = self.entries[key]
+            skills, traits, signature = entry["skills"], entry["traits"], tuple(entry["signature"])
+
+        skill_set, trait_set = set(skills), set(traits)
+        excluded = {key} | {str(item) for item in exclude}
+        scored = []
+        for other in self.lsh.query(signature):
+            if other in excluded:
+                continue
+            other_skills, other_traits = self._sets[other]
+            scored.append((similarity(skill_set, trait_set, other_skills, other_traits), other))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+
+        return [
+            {
+                "candidateId": other,
+                "name": self.entries[other].get("name"),
+                "similarity": round(score, 3),
+                "sharedSkills": sorted(skill_set & self._sets[other][0])
+            }
+            for score, other in scored[:top_n]
+        ]
+
+    def __len__(self):
+        return len(self.entries)
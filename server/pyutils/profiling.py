@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+profiling.py - 所有 Python CLI 共用的 --profile 選項
+
+    --profile                    決定性分析（cProfile）
+    --profile sampling           取樣分析（每 --profile-interval 毫秒記錄一次主執行緒呼叫堆疊）
+    --profile-output PREFIX      輸出檔名前綴（預設 <腳本名>-profile）
+
+輸出：
+- PREFIX.pstats      cProfile 原始資料（僅決定性分析），可用 snakeviz / pstats 開啟
+- PREFIX.collapsed   collapsed stack 格式，可直接餵給 flamegraph.pl / speedscope
+- 終端機列出累計時間最高的函數
+
+用法（腳本端）：
+
+    def main():
+        parser = argparse.ArgumentParser(...)
+        add_profile_arguments(parser)
+        ...
+
+    if __name__ == "__main__":
+        run_with_profile(main, "batch-match")
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+TOP_N = 15
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """把 --profile 相關參數加到腳本的 parser（讓 --help 看得到）"""
+    parser.add_argument("--profile", nargs="?", const="deterministic", choices=["deterministic", "sampling"],
+                        help="效能分析模式（預設 deterministic）")
+    parser.add_argument("--profile-output", help="分析結果輸出檔名前綴")
+    parser.add_argument("--profile-interval", type=float, default=5.0, help="取樣間隔（毫秒，僅 sampling）")
+
+
+def run_with_profile(main: Callable, name: str):
+    """依 sys.argv 的 --profile 參數決定是否在分析器下執行 main()"""
+    parser = argparse.ArgumentParser(add_help=False)
+    add_profile_arguments(parser)
+    args, _ = parser.parse_known_args()
+
+    if not args.profile:
+        return main()
+
+    prefix = args.profile_output or f"{name}-profile"
+    if args.profile == "sampling":
+        profiler = StackSampler(args.profile_interval / 1000)
+    else:
+        profiler = DeterministicProfiler()
+
+    profiler.start()
+    try:
+        return main()
+    finally:
+        profiler.stop()
+        files = profiler.write(prefix)
+        print()
+        print(f"🔬 效能分析（{args.profile}）：{', '.join(files)}")
+        print(format_hotspots(profiler.hotspots()))
+
+
+def _frame_label(filename: str, lineno: int, funcname: str) -> str:
+    """collapsed stack 與報表共用的函數標籤"""
+    if filename == "~":
+        return funcname  # cProfile 內建函數，例如 <built-in method builtins.len>
+    return f"{funcname} ({os.path.basename(filename)}:{lineno})"
+
+
+def format_hotspots(rows: List[Tuple[str, float, float, int]]) -> str:
+    lines = [f"   {'累計(s)':>10} {'自身(s)':>10} {'次數':>10}  函數"]
+    for label, cumulative, own, calls in rows[:TOP_N]:
+        lines.append(f"   {cumulative:>10.4f} {own:>10.4f} {calls:>10}  {label}")
+    return "\n".join(lines)
+
+
+# ========================================
+# 決定性分析（cProfile）
+# ========================================
+
+class DeterministicProfiler:
+    """cProfile 包裝；collapsed stack 由 caller→callee 關係依時間比例展開"""
+
+    MAX_DEPTH = 64
+    MIN_MICROSECONDS = 1
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.stats = None
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.stats = pstats.Stats(self.profile)
+
+    def write(self, prefix: str) -> List[str]:
+        self.stats.dump_stats(prefix + ".pstats")
+        with open(prefix + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, microseconds in sorted(self.collapsed().items()):
+                f.write(f"{stack} {microseconds}\n")
+        return [prefix + ".pstats", prefix + ".collapsed"]
+
+    def hotspots(self) -> List[Tuple[str, float, float, int]]:
+        rows = [
+            (_frame_label(*func), ct, tt, nc)
+            for func, (cc, nc, tt, ct, callers) in self.stats.stats.items()
+        ]
+        rows.sort(key=lambda r: r[1], reverse=True)
+        return rows
+
+    def collapsed(self) -> Dict[str, int]:
+        """
+        把 pstats 的呼叫圖展開成堆疊（單位：微秒）
+
+        cProfile 只記錄 caller→callee 的邊，同一函數被多處呼叫時依各邊的
+        累計時間比例分配，因此深層堆疊是近似值；需要精確堆疊請用 sampling。
+        """
+        stats = self.stats.stats
+        callees: Dict[tuple, List[tuple]] = {}
+        for func, (_, _, _, _, callers) in stats.items():
+            for caller, edge in callers.items():
+                callees.setdefault(caller, []).append((func, edge[3]))
+
+        roots = [func for func, value in stats.items() if not value[4]]
+        result: Dict[str, int] = {}
+
+        def walk(func, path, scale, depth):
+            _, _, own, cumulative, _ = stats[func]
+            label = _frame_label(*func)
+            stack = f"{path};{label}" if path else label
+            self_us = int(own * scale * 1e6)
+            if self_us >= self.MIN_MICROSECONDS:
+                result[stack] = result.get(stack, 0) + self_us
+            if depth >= self.MAX_DEPTH:
+                return
+            for callee, edge_cumulative in callees.get(func, []):
+                callee_cumulative = stats[callee][3]
+                if callee == func or callee_cumulative <= 0 or f";{_frame_label(*callee)};" in f";{stack};":
+                    continue
+                child_scale = scale * edge_cumulative / callee_cumulative
+                if edge_cumulative * scale * 1e6 >= self.MIN_MICROSECONDS:
+                    walk(callee, stack, child_scale, depth + 1)
+
+        for root in roots:
+            walk(root, "", 1.0, 0)
+        return result
+
+
+# ========================================
+# 取樣分析
+# ========================================
+
+class StackSampler:
+    """背景執行緒定期記錄主執行緒的呼叫堆疊（精確堆疊、低額外負擔）"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.target = threading.main_thread().ident
+        self.samples: Dict[Tuple[Tuple[str, int, str], ...], int] = {}
+        self.total = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            key = tuple(reversed(stack))
+            self.samples[key] = self.samples.get(key, 0) + 1
+            self.total += 1
+
+    def write(self, prefix: str) -> List[str]:
+        with open(prefix + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(";".join(_frame_label(*frame) for frame in stack) + f" {count}\n")
+        return [prefix + ".collapsed"]
+
+    def hotspots(self) -> List[Tuple[str, float, float, int]]:
+        """依取樣數換算秒數（累計 = 出現在堆疊中的取樣，自身 = 位於堆疊頂端的取樣）"""
+        seconds_per_sample = self.elapsed / self.total if self.total else 0
+        cumulative: Dict[tuple, int] = {}
+        own: Dict[tuple, int] = {}
+        for stack, count in self.samples.items():
+            for frame in set(stack):
+                cumulative[frame] = cumulative.get(frame, 0) + count
+            if stack:
+                own[stack[-1]] = own.get(stack[-1], 0) + count
+        rows = [
+            (_frame_label(*frame), count * seconds_per_sample, own.get(frame, 0) * seconds_per_sample, count)
+            for frame, count in cumulative.items()
+        ]
+        rows.sort(key=lambda r: r[1], reverse=True)
+        return rows
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+score_store.py - 批量匹配的維度分數（緊湊陣列檔）與權重 what-if 重新排序
+
+批量匹配時把每位候選人的四個維度分數存成欄式陣列（uint16，單位 0.1 分，
+每位候選人 10 bytes），之後換一組權重只要一次加權內積 + 取前 K 名，
+不必重跑 PersonaMatcher.match()。
+
+檔案格式（<run_id>.scores）：
+
+    "MSC1" + uint32 標頭長度 + 標頭 JSON（run / 職缺資訊、candidate_ids、names）
+    + 補齊到 2 bytes + 5 個 uint16 little-endian 欄位（總分、技能、成長、文化、動機）
+
+候選人依原本的批量排序存放（位置 = 原名次 - 1），同分時以原名次排前面。
+
+有安裝 numpy 就用矩陣乘法與 argpartition，沒有就以純 Python 逐列計算
+（10 萬人約數十毫秒）。
+
+    store = ScoreStore.open(path)
+    ranking = store.rerank({"技能匹配": 0.5, "成長匹配": 0.2, "文化匹配": 0.2, "動機匹配": 0.1}, top_k=20)
+"""
+
+import heapq
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence
+
+try:
+    import numpy
+except ImportError:  # 選用依賴
+    numpy = None
+
+DIMENSIONS = ("技能匹配", "成長匹配", "文化匹配", "動機匹配")
+# 與 PersonaMatcher.WEIGHTS 相同（match-personas.py）
+DEFAULT_WEIGHTS = {"技能匹配": 0.35, "成長匹配": 0.25, "文化匹配": 0.25, "動機匹配": 0.15}
+# --weights 可用的簡稱
+SHORT_NAMES = {name[:2]: name for name in DIMENSIONS}
+
+MAGIC = b"MSC1"
+_HEADER = struct.Struct("<4sI")
+SCALE = 10  # 分數以 0.1 分為單位存成整數
+
+
+def parse_weights(text: str) -> Dict[str, float]:
+    """'技能=0.5,成長=0.2' 或 JSON 物件 → {維度: 權重}"""
+    text = text.strip()
+    if text.startswith("{"):
+        items = json.loads(text).items()
+    else:
+        items = []
+        for part in text.split(","):
+            name, _, value = part.partition("=")
+            if not value:
+                raise ValueError(f"無法解析的權重：{part}（需要 維度=權重）")
+            items.append((name, value))
+    return validate_weights(items)
+
+
+def validate_weights(items: Iterable) -> Dict[str, float]:
+    """(維度或簡稱, 權重) → {維度: 權重}；未知的維度、不是數字的權重都是 ValueError"""
+    weights = {}
+    for name, value in items:
+        name = SHORT_NAMES.get(str(name).strip(), str(name).strip())
+        if name not in DIMENSIONS:
+            raise ValueError(f"未知的維度：{name}（可用：{'、'.join(DIMENSIONS)}）")
+        try:
+            weights[name] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} 的權重不是數字：{value!r}")
+    return weights
+
+
+def normalize_weights(weights: Dict[str, float]) -> List[float]:
+    """未指定的維度沿用預設權重，再等比例縮放成總和 1（總分維持 0-100）"""
+    merged = {**DEFAULT_WEIGHTS, **weights}
+    values = [float(merged[name]) for name in DIMENSIONS]
+    if any(value < 0 for value in values):
+        raise ValueError("權重不能是負數")
+    total = sum(values)
+    if total <= 0:
+        raise ValueError("權重總和必須大於 0")
+    return [value / total for value in values]
+
+
+def resolve_weights(profiles: Dict, job_id=None, recruiter: Optional[str] = None) -> Dict[str, float]:
+    """
+    權重設定檔 → 這次要用的權重（獵頭顧問 > 職缺 > default > 預設權重）
+
+        {"default": {...}, "jobs": {"<jobId>": {...}}, "recruiters": {"<顧問>": {...}}}
+
+    維度名稱與 --weights 相同（可用簡稱）；選中的設定有未知維度時是 ValueError。
+    """
+    if recruiter and recruiter in profiles.get("recruiters", {}):
+        label, profile = f"recruiters.{recruiter}", profiles["recruiters"][recruiter]
+    elif job_id is not None and str(job_id) in profiles.get("jobs", {}):
+        label, profile = f"jobs.{job_id}", profiles["jobs"][str(job_id)]
+    elif "default" in profiles:
+        label, profile = "default", profiles["default"]
+    else:
+        return dict(DEFAULT_WEIGHTS)
+    if not isinstance(profile, dict):
+        raise ValueError(f"權重設定檔的 {label} 必須是物件")
+    try:
+        return validate_weights(profile.items())
+    except ValueError as e:
+        raise ValueError(f"權重設定檔的 {label}：{e}")
+
+
+def _to_units(score) -> int:
+    return max(0, min(0xFFFF, int(round(float(score) * SCALE))))
+
+
+class ScoreStore:
+    """一次批量匹配的分數欄位：columns[0] 為原總分，columns[1:] 依 DIMENSIONS 順序"""
+
+    def __init__(self, meta: Optional[Dict] = None):
+        self.meta = dict(meta or {})
+        self.candidate_ids: List = []
+        self.names: List = []
+        self.columns = [array("H") for _ in range(len(DIMENSIONS) + 1)]
+        self._matrix = None
+
+    def add(self, report: Dict):
+        """依批量排序的順序逐筆加入匹配報告"""
+        scores = report.get("維度評分", {})
+        self.candidate_ids.append(report.get("candidateId"))
+        self.names.append(report.get("candidateName"))
+        self.columns[0].append(_to_units(report["總分"]))
+        for column, name in zip(self.columns[1:], DIMENSIONS):
+            column.append(_to_units(scores.get(name, 0)))
+        self._matrix = None
+
+    @classmethod
+    def from_reports(cls, reports: Iterable[Dict], meta: Optional[Dict] = None) -> "ScoreStore":
+        store = cls(meta)
+        for report in reports:
+            store.add(report)
+        return store
+
+    def __len__(self):
+        return len(self.candidate_ids)
+
+    # ---------- 讀寫 ----------
+
+    def save(self, path: str):
+        """寫入暫存檔再 rename"""
+        header = dict(self.meta, count=len(self), dimensions=list(DIMENSIONS),
+                      candidate_ids=self.candidate_ids, names=self.names)
+        header_bytes = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        padding = (_HEADER.size + len(header_bytes)) % 2
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, len(header_bytes)) + header_bytes + b"\0" * padding)
+            for column in self.columns:
+                if sys.byteorder == "big":
+                    column = array("H", column)
+                    column.byteswap()
+                column.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path: str) -> "ScoreStore":
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, header_size = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"不是分數檔：{path}")
+        header = json.loads(data[_HEADER.size:_HEADER.size + header_size])
+        if header.get("dimensions") != list(DIMENSIONS):
+            raise ValueError(f"分數檔的維度不符：{header.get('dimensions')}")
+        store = cls()
+        store.candidate_ids = header.pop("candidate_ids")
+        store.names = header.pop("names")
+        store.meta = header
+        offset = _HEADER.size + header_size
+        offset += offset % 2
+        count = header["count"]
+        for column in store.columns:
+            column.frombytes(data[offset:offset + 2 * count])
+            if sys.byteorder == "big":
+                column.byteswap()
+            offset += 2 * count
+        return store
+
+    # ---------- 重新排序 ----------
+
+    def _weighted_totals(self, weights: Sequence[float]):
+        """
+        加權總分（單位 0.1 分、已四捨五入成整數），與批量匹配的「總分」同樣以 0.1 分排序
+
+        預設權重直接用保存的原總分：維度分數存的是四捨五入後的值，重新加權可能與
+        原總分差 0.1，名次就會跟著變動。
+        """
+        if all(abs(a - b) < 1e-12 for a, b in zip(weights, normalize_weights({}))):
+            if numpy is not None:
+                return numpy.frombuffer(self.columns[0], dtype=numpy.uint16).astype(numpy.float64)
+            return list(self.columns[0])
+        if numpy is not None:
+            if self._matrix is None:
+                self._matrix = numpy.array([numpy.frombuffer(column, dtype=numpy.uint16) for column in self.columns[1:]],
+                                           dtype=numpy.float64)
+            return numpy.rint(numpy.asarray(weights) @ self._matrix)
+        w0, w1, w2, w3 = weights
+        return [round(w0 * a + w1 * b + w2 * c + w3 * d) for a, b, c, d in zip(*self.columns[1:])]
+
+    def _top_positions(self, totals, top_k: int) -> List[int]:
+        """加權總分最高的 top_k 個位置；同分時原名次在前"""
+        count = len(self)
+        top_k = min(top_k, count)
+        if top_k <= 0:
+            return []
+        if numpy is not None:
+            if top_k < count:
+                # 第 top_k 名的分數以上全部取出，再依 (分數降序, 位置) 排序，邊界同分也不會亂序
+                threshold = numpy.partition(totals, count - top_k)[count - top_k]
+                positions = numpy.flatnonzero(totals >= threshold)
+            else:
+                positions = numpy.arange(count)
+            order = numpy.lexsort((positions, -totals[positions]))
+            return positions[order][:top_k].tolist()
+        return heapq.nsmallest(top_k, range(count), key=lambda i: (-totals[i], i))
+
+    def rerank(self, weights: Dict[str, float], top_k: int = 20) -> List[Dict]:
+        """以新權重重新計算總分，回傳前 top_k 名（含原總分與原名次）；預設權重時名次與原排序相同"""
+        vector = normalize_weights(weights)
+        totals = self._weighted_totals(vector)
+        results = []
+        for rank, position in enumerate(self._top_positions(totals, top_k), 1):
+            results.append({
+                "rank": rank,
+                "candidateId": self.candidate_ids[position],
+                "candidateName": self.names[position],
+                "總分": float(totals[position]) / SCALE,
+                "原總分": self.columns[0][position] / SCALE,
+                "原名次": position + 1,
+                "維度評分": {name: column[position] / SCALE for name, column in zip(DIMENSIONS, self.columns[1:])}
+            })
+        return results
+
+
+def new_meta(run_id: str, company_persona: Dict) -> Dict:
+    return {
+        "run_id": run_id,
+        "job_id": company_persona.get("jobId"),
+        "company_id": company_persona.get("companyId"),
+        "job_title": company_persona.get("jobTitle"),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
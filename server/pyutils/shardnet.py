@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+shardnet.py - 分片匹配的 coordinator / worker 連線（TCP 或 Unix socket）
+
+位址格式：
+
+    unix:/tmp/shard-0.sock     Unix domain socket（同一台機器）
+    127.0.0.1:7401             TCP
+    :7401                      TCP，等同 127.0.0.1:7401（要對外監聽請寫 0.0.0.0:7401）
+
+TCP 連線建立後先以環境變數 SHARD_SECRET 做雙向 HMAC-SHA256 challenge-response，
+通過才交換訊息（未設定 SHARD_SECRET 時不能使用 TCP）；Unix socket 靠檔案權限保護。
+
+每則訊息一個 frame：1 byte 格式（m = MessagePack、j = JSON）+ 4 bytes 長度（big-endian）
++ 以 ipc.encode 編碼的內容；worker 以收到的格式回覆。
+"""
+
+import hashlib
+import hmac
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+from pyutils import ipc
+
+_HEADER = struct.Struct(">cI")
+_FORMAT_CODES = {"msgpack": b"m", "json": b"j"}
+_CODE_FORMATS = {code: fmt for fmt, code in _FORMAT_CODES.items()}
+
+SECRET_ENV = "SHARD_SECRET"
+_NONCE_SIZE = 32
+_DIGEST_SIZE = hashlib.sha256().digest_size
+HANDSHAKE_TIMEOUT = 10  # 秒；沒有在時間內完成握手的連線直接關閉
+
+
+def parse_address(text: str) -> Tuple[int, Any]:
+    """位址字串 → (socket family, address)"""
+    if text.startswith("unix:"):
+        return socket.AF_UNIX, text[len("unix:"):]
+    host, _, port = text.rpartition(":")
+    if not port.isdigit():
+        raise ValueError(f"無法解析的位址：{text}（需要 unix:/path 或 host:port）")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def shared_secret(text: str) -> Optional[bytes]:
+    """TCP 位址需要的共用密鑰（SHARD_SECRET）；Unix socket 回傳 None，TCP 未設定時是 ValueError"""
+    if parse_address(text)[0] != socket.AF_INET:
+        return None
+    secret = os.environ.get(SECRET_ENV, "")
+    if not secret:
+        raise ValueError(f"TCP 分片連線需要設定環境變數 {SECRET_ENV}（coordinator 與 worker 相同）")
+    return secret.encode("utf-8")
+
+
+def _sign(secret: bytes, role: bytes, nonce: bytes) -> bytes:
+    return hmac.new(secret, role + nonce, hashlib.sha256).digest()
+
+
+def _handshake(sock: socket.socket, secret: bytes, server: bool):
+    """
+    雙向驗證：worker 送 nonce，coordinator 回 HMAC(worker nonce) + 自己的 nonce，
+    worker 再回 HMAC(coordinator nonce)；任一方驗證失敗都是 ConnectionError
+    """
+    sock.settimeout(HANDSHAKE_TIMEOUT)
+    if server:
+        nonce = os.urandom(_NONCE_SIZE)
+        sock.sendall(nonce)
+        reply = _recv_exact(sock, _DIGEST_SIZE + _NONCE_SIZE)
+        if reply is None or not hmac.compare_digest(reply[:_DIGEST_SIZE], _sign(secret, b"coordinator", nonce)):
+            raise ConnectionError("分片連線驗證失敗（SHARD_SECRET 不符）")
+        sock.sendall(_sign(secret, b"worker", reply[_DIGEST_SIZE:]))
+    else:
+        challenge = _recv_exact(sock, _NONCE_SIZE)
+        if challenge is None:
+            raise ConnectionError("worker 在驗證前關閉了連線")
+        nonce = os.urandom(_NONCE_SIZE)
+        sock.sendall(_sign(secret, b"coordinator", challenge) + nonce)
+        reply = _recv_exact(sock, _DIGEST_SIZE)
+        if reply is None or not hmac.compare_digest(reply, _sign(secret, b"worker", nonce)):
+            raise ConnectionError("worker 驗證失敗（SHARD_SECRET 不符）")
+    sock.settimeout(None)
+
+
+def connect(text: str, wait: float = 0) -> socket.socket:
+    """連線到 worker（TCP 時先完成握手）；wait > 0 時在這段時間內重試（等剛啟動的 worker 開始監聽）"""
+    family, address = parse_address(text)
+    secret = shared_secret(text)
+    deadline = time.monotonic() + wait
+    while True:
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.connect(address)
+            break
+        except OSError:
+            sock.close()
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+    if secret is not None:
+        try:
+            _handshake(sock, secret, server=False)
+        except BaseException:
+            sock.close()
+            raise
+    return sock
+
+
+def send_message(sock: socket.socket, obj: Any, fmt: str):
+    payload = ipc.encode(obj, fmt)
+    sock.sendall(_HEADER.pack(_FORMAT_CODES[fmt], len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Optional[Tuple[Any, str]]:
+    """讀取一則訊息，回傳 (內容, 格式)；對方關閉連線時回傳 None"""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    code, size = _HEADER.unpack(header)
+    payload = _recv_exact(sock, size)
+    if payload is None:
+        raise ConnectionError("連線在訊息傳送途中中斷")
+    fmt = _CODE_FORMATS[code]
+    return ipc.decode(payload, fmt), fmt
+
+
+def serve(text: str, handle: Callable[[socket.socket], None]):
+    """
+    監聽 text 位址，每個連線一個執行緒呼叫 handle(conn)；不會返回
+
+    TCP 的連線要先通過 SHARD_SECRET 握手才交給 handle，未設定 SHARD_SECRET 時是 ValueError。
+    """
+    family, address = parse_address(text)
+    secret = shared_secret(text)
+    server = socket.socket(family, socket.SOCK_STREAM)
+    if family == socket.AF_INET:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    elif os.path.exists(address):
+        os.unlink(address)  # 上次留下的 socket 檔
+    server.bind(address)
+    server.listen()
+
+    def run(conn: socket.socket):
+        with conn:
+            if secret is not None:
+                try:
+                    _handshake(conn, secret, server=True)
+                except OSError:  # 含 ConnectionError、逾時
+                    return
+            handle(conn)
+
+    while True:
+        conn, _ = server.accept()
+        threading.Thread(target=run, args=(conn,), daemon=True).start()
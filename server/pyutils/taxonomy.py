@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+taxonomy.py - 讀取 server/taxonomy/*.json 並預先建好查詢結構
+
+與 taxonomy/matchSkills.js、scripts/backfill-role-industry.js 使用同一份資料，
+載入一次後：
+
+- IndustryTaxonomy.infer(text)    從公司名稱 / 描述推斷產業 tag（一個編譯好的 regex）
+- IndustryTaxonomy.fit(a, b)      兩組產業 tag 的適配分數（查預先算好的相似度矩陣）
+- SkillTaxonomy.normalize(skills) 技能字串 → 標準技能 ID
+- SkillTaxonomy.overlap_matrix()  整批候選人 × 職缺的技能覆蓋率（稀疏矩陣乘積）
+- RoleTaxonomy.classify(title)    職稱 → 角色 ID / 職務類別 / 標準職稱 / 職級（字元 trie 一次掃描）
+
+    from pyutils.taxonomy import industry_taxonomy, skill_taxonomy
+
+    tags = industry_taxonomy().infer("大成營造股份有限公司")   # ["Construction"]
+    score = industry_taxonomy().fit(["Construction"], ["Energy"])
+    role = role_taxonomy().classify("資深後端工程師")   # family="Backend", seniority="Senior"
+"""
+
+import functools
+import json
+import os
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+TAXONOMY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "taxonomy")
+
+# 產業相似度（0-100）
+SAME_INDUSTRY = 100
+RELATED_INDUSTRY = 75   # related 欄位列出的跨領域鄰近產業
+SAME_SECTOR = 60        # 同一 sector
+UNRELATED_INDUSTRY = 30
+# 任一方沒有產業資訊（或只有 Other / Startup 這類不分領域的 tag）時的分數，與舊版固定值相同
+UNKNOWN_INDUSTRY = 80
+
+# 不代表特定領域的 tag：只與自己完全相同時算分，其餘視為未知
+NEUTRAL_TAGS = ("Other", "Startup")
+
+# 職稱關鍵字 → 職務類別（取自 scripts/backfill-role-industry.js 的 ROLE_KEYWORD_RULES，
+# 英數關鍵字要求整字命中，所以另外補上 designer）；標準職稱（canonicalRoles）本身也是別名，
+# 比對時取最長者，不依規則順序
+ROLE_KEYWORDS = {
+    "PM": ["product manager", "product owner", "technical pm", "program manager", "project manager", "產品", "pm"],
+    "UIUX": ["ui/ux", "uiux", "ui designer", "ux designer", "product designer", "interaction designer",
+             "設計", "design", "designer", "visual"],
+    "Mobile": ["react native", "flutter engineer", "ios", "android", "mobile", "行動"],
+    "Data": ["machine learning", "ml engineer", "deep learning", "data engineer", "data analyst", "data scientist",
+             "bi analyst", "analytics", "data", "數據", "ai engineer", "人工智慧"],
+    "DevOps": ["devops", "sre", "site reliability", "infrastructure", "cloud engineer", "platform engineer"],
+    "Backend": ["backend", "後端", "server engineer", "api engineer"],
+    "Frontend": ["frontend", "前端", "web developer", "ui engineer"],
+    "Fullstack": ["fullstack", "full stack", "full-stack", "全端", "software engineer", "software developer", "軟體工程師"],
+    "QA": ["qa engineer", "quality assurance", "sdet", "test engineer", "automation test", "品質保證", "測試工程"],
+    "Security": ["security", "資安", "infosec", "penetration", "ciso"],
+    "BIM": ["bim", "mep", "建築", "structural"],
+    "Finance": ["finance", "financial analyst", "財務", "會計", "accountant", "auditor", "cfo", "treasury"],
+    "Sales": ["sales", "業務", "account executive", "business development", "pre-sales", "bd manager"],
+    "HR": ["recruiter", "talent acquisition", "hr manager", "hrbp", "人資", "人力資源", "c&b"],
+}
+
+# 職級（與 backfill-role-industry.js 的 deriveSeniority 相同，依序第一個命中者；都沒有則為 IC）
+SENIORITY_RULES = [
+    ("CXO", ["cto", "ceo", "cfo", "ciso", "coo"]),
+    ("VP", ["vp", "vice president", "副總"]),
+    ("Director", ["director", "總監"]),
+    ("Manager", ["engineering manager", "manager", "經理"]),
+    ("Principal", ["principal", "首席", "distinguished"]),
+    ("Staff", ["staff"]),
+    ("Lead", ["tech lead", "team lead", "lead"]),
+    ("Senior", ["senior", "sr", "資深"]),
+    ("Junior", ["junior", "jr", "初級"]),
+    ("Intern", ["intern", "實習"]),
+]
+DEFAULT_SENIORITY = "IC"
+# 這些職稱的 manager 是職務名稱而不是職級
+NOT_MANAGER_LEVEL = re.compile(r"project manager|product manager")
+
+
+def _load(name: str) -> Dict:
+    with open(os.path.join(TAXONOMY_DIR, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _compile_aliases(aliases: Iterable[str]):
+    """所有別名編成一個 regex（長的優先），每個別名一個 group；回傳 (pattern, 依 group 順序的別名)"""
+    ordered = sorted(aliases, key=len, reverse=True)
+    if not ordered:
+        return None, []
+    return re.compile("|".join(f"({_alias_pattern(a)})" for a in ordered)), ordered
+
+
+def _alias_pattern(alias: str) -> str:
+    """英數別名要求前後不是英數字（避免 'si' 命中 'sinyi'），中文別名直接子字串比對"""
+    escaped = re.escape(alias)
+    if alias.isascii():
+        return rf"(?<![a-z0-9]){escaped}(?![a-z0-9])"
+    return escaped
+
+
+class IndustryTaxonomy:
+    """industry-taxonomy.json：別名索引 + 產業相似度矩陣"""
+
+    def __init__(self, data: Dict):
+        industries = data.get("industries", [])
+        self.tags: List[str] = [item["tag"] for item in industries]
+        self.labels: Dict[str, str] = {item["tag"]: item.get("label", item["tag"]) for item in industries}
+        self.index: Dict[str, int] = {tag: i for i, tag in enumerate(self.tags)}
+
+        # 別名 → tag；長的別名優先，避免 "金融" 先於 "金融科技" 命中
+        self.aliases: Dict[str, str] = {}
+        for item in industries:
+            for alias in [item["tag"]] + item.get("aliases", []):
+                alias = alias.lower()
+                if len(alias) >= 2 and alias not in self.aliases:
+                    self.aliases[alias] = item["tag"]
+        self.pattern, ordered = _compile_aliases(self.aliases)
+        self._group_tags = [self.aliases[a] for a in ordered]
+
+        self.matrix = self._build_matrix(industries)
+
+    def _build_matrix(self, industries: List[Dict]) -> List[List[int]]:
+        """tag × tag 相似度，載入時算好，匹配時只查表"""
+        size = len(industries)
+        sectors = [item.get("sector") for item in industries]
+        matrix = [[UNRELATED_INDUSTRY] * size for _ in range(size)]
+        for i in range(size):
+            for j in range(size):
+                if i == j:
+                    matrix[i][j] = SAME_INDUSTRY
+                elif self.tags[i] in NEUTRAL_TAGS or self.tags[j] in NEUTRAL_TAGS:
+                    matrix[i][j] = UNKNOWN_INDUSTRY
+                elif sectors[i] and sectors[i] == sectors[j]:
+                    matrix[i][j] = SAME_SECTOR
+        for item in industries:
+            i = self.index[item["tag"]]
+            for related in item.get("related", []):
+                j = self.index.get(related)
+                if j is not None and i != j:
+                    matrix[i][j] = matrix[j][i] = max(matrix[i][j], RELATED_INDUSTRY)
+        return matrix
+
+    def infer(self, *texts: str) -> List[str]:
+        """從文字推斷產業 tag（依出現順序、不重複）"""
+        if self.pattern is None:
+            return []
+        found: List[str] = []
+        for text in texts:
+            if not text:
+                continue
+            for match in self.pattern.finditer(text.lower()):
+                tag = self._group_tags[match.lastindex - 1]
+                if tag not in found:
+                    found.append(tag)
+        return found
+
+    def fit(self, candidate_tags: Iterable[str], company_tags: Iterable[str]) -> float:
+        """兩組產業的最佳配對分數；任一方無可辨識的產業時回傳 UNKNOWN_INDUSTRY"""
+        rows = [self.index[t] for t in candidate_tags if t in self.index]
+        cols = [self.index[t] for t in company_tags if t in self.index]
+        if not rows or not cols:
+            return UNKNOWN_INDUSTRY
+        matrix = self.matrix
+        return max(matrix[i][j] for i in rows for j in cols)
+
+
+@functools.lru_cache(maxsize=None)
+def industry_taxonomy() -> IndustryTaxonomy:
+    """每個行程只載入一次"""
+    return IndustryTaxonomy(_load("industry-taxonomy.json"))
+
+
+class SkillTaxonomy:
+    """
+    skill-taxonomy.json + skill-relations.json：標準技能 ID 與技能相關度稀疏矩陣
+
+    related[i] 是第 i 個技能那一列的非零項 {j: 權重}（含自己 = 1.0），
+    同族技能給 family 權重、pairs 補充跨族關係，取最高者。
+    """
+
+    def __init__(self, skills: Dict[str, List[str]], relations: Dict):
+        self.names: List[str] = list(skills)
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+
+        # 別名（小寫）→ ID；與 matchSkills.js 相同，標準名稱本身也是別名
+        self.aliases: Dict[str, int] = {}
+        for name, aliases in skills.items():
+            for alias in [name] + aliases:
+                self.aliases.setdefault(alias.lower(), self.index[name])
+        # 自由文字比對時略過兩個字母的英文別名（ts、pm、dd…容易誤判），標準名稱除外
+        self.pattern, ordered = _compile_aliases(
+            a for a in self.aliases
+            if len(a) >= 3 or (len(a) == 2 and not a.isascii()) or self.names[self.aliases[a]].lower() == a
+        )
+        self._group_ids = [self.aliases[a] for a in ordered]
+        self._normalize_cache: Dict[str, List[int]] = {}
+
+        self.related: List[Dict[int, float]] = [{i: 1.0} for i in range(len(self.names))]
+        for family in relations.get("families", []):
+            ids = [self.index[name] for name in family["skills"] if name in self.index]
+            for i in ids:
+                for j in ids:
+                    if i != j:
+                        self._relate(i, j, family["weight"])
+        for a, b, weight in relations.get("pairs", []):
+            if a in self.index and b in self.index:
+                self._relate(self.index[a], self.index[b], weight)
+                self._relate(self.index[b], self.index[a], weight)
+
+    def _relate(self, i: int, j: int, weight: float):
+        if weight > self.related[i].get(j, 0):
+            self.related[i][j] = weight
+
+    def normalize(self, skills: Iterable[str]) -> List[int]:
+        """技能字串 → 標準技能 ID（不重複）；先查完整別名，否則在字串中找別名"""
+        ids: List[int] = []
+        for skill in skills:
+            if not isinstance(skill, str):
+                continue
+            found = self._normalize_cache.get(skill)
+            if found is None:
+                key = skill.strip().lower()
+                found = [self.aliases[key]] if key in self.aliases else self.infer(key)
+                self._normalize_cache[skill] = found
+            for i in found:
+                if i not in ids:
+                    ids.append(i)
+        return ids
+
+    def infer(self, *texts: str) -> List[int]:
+        """從職缺描述等文字找出提到的標準技能 ID"""
+        if self.pattern is None:
+            return []
+        ids: List[int] = []
+        for text in texts:
+            if not text:
+                continue
+            for match in self.pattern.finditer(text.lower()):
+                i = self._group_ids[match.lastindex - 1]
+                if i not in ids:
+                    ids.append(i)
+        return ids
+
+    def overlap_matrix(self, candidates: Sequence[Sequence[int]], jobs: Sequence[Sequence[int]]) -> List[List[float]]:
+        """
+        候選人 × 職缺的技能覆蓋率（0-1）
+
+        每項需求技能取候選人技能中相關度最高者（完全相同 = 1.0），再對需求技能取平均。
+        等同把候選人技能列向量與 related 稀疏矩陣以 (max, ×) 相乘後，再乘上職缺需求矩陣：
+        只走訪非零項，整批職缺共用一次候選人展開。
+        """
+        # 需求技能 → 需要它的職缺
+        required: Dict[int, List[int]] = {}
+        sizes = []
+        for j, ids in enumerate(jobs):
+            unique = set(ids)
+            sizes.append(len(unique))
+            for r in unique:
+                required.setdefault(r, []).append(j)
+
+        related = self.related
+        result = []
+        for ids in candidates:
+            best: Dict[int, float] = {}
+            for c in set(ids):
+                for r, weight in related[c].items():
+                    if r in required and weight > best.get(r, 0):
+                        best[r] = weight
+            row = [0.0] * len(sizes)
+            for r, weight in best.items():
+                for j in required[r]:
+                    row[j] += weight
+            result.append([row[j] / sizes[j] if sizes[j] else 0.0 for j in range(len(sizes))])
+        return result
+
+    def overlap(self, candidate_ids: Sequence[int], required_ids: Sequence[int]) -> float:
+        return self.overlap_matrix([candidate_ids], [required_ids])[0][0]
+
+
+@functools.lru_cache(maxsize=None)
+def skill_taxonomy() -> SkillTaxonomy:
+    """每個行程只載入一次"""
+    skills = {name: aliases for name, aliases in _load("skill-taxonomy.json").items() if name != "_meta"}
+    return SkillTaxonomy(skills, _load("skill-relations.json"))
+
+
+class RoleMatch(NamedTuple):
+    role_id: int            # RoleTaxonomy.roles 的索引；-1 表示無法辨識
+    family: Optional[str]
+    role: Optional[str]
+    seniority: str
+
+    def to_persona(self) -> Dict:
+        """寫進畫像的欄位（role_id 依載入順序編號，不落地）"""
+        return {"職務類別": self.family, "標準職稱": self.role, "職級": self.seniority}
+
+
+class RoleTaxonomy:
+    """
+    role-taxonomy.json：職稱 → (職務類別, 標準職稱) 的字元 trie + 職級規則
+
+    roles[i] = (family, canonical role)，i 即角色 ID，批次作業可直接當分桶索引。
+    trie 以小寫字元逐層建立，終點節點存角色 ID；classify() 從每個起點往下走，
+    取最長的命中（"data engineer" 優先於 "data"），同長取最先出現者。
+    英數別名要求前後不是英數字，與其他 taxonomy 相同。
+    """
+
+    _END = ""  # 終點節點的 key（字元不會是空字串）
+
+    def __init__(self, data: Dict, keywords: Dict[str, List[str]] = ROLE_KEYWORDS):
+        self.roles: List[Tuple[str, str]] = []
+        self.index: Dict[Tuple[str, str], int] = {}
+        self.families: List[str] = [family for family in data if family != "_meta"]
+        self.labels: Dict[str, str] = {family: data[family].get("label", family) for family in self.families}
+        self.trie: Dict = {}
+
+        aliases: Dict[str, int] = {}
+        for family in self.families:
+            for role in data[family].get("canonicalRoles", []):
+                aliases.setdefault(role.lower(), self._role_id(family, role))
+        for family, words in keywords.items():
+            roles = data.get(family, {}).get("canonicalRoles", [])
+            for word in words:
+                # 與 backfill-role-industry.js 相同：取名稱含關鍵字的標準職稱，否則取第一個
+                role = next((r for r in roles if word in r.lower()), roles[0] if roles else family)
+                aliases.setdefault(word, self._role_id(family, role))
+        for alias, role_id in aliases.items():
+            node = self.trie
+            for char in alias:
+                node = node.setdefault(char, {})
+            node[self._END] = role_id
+
+        self.seniority_patterns = [
+            (level, re.compile("|".join(_alias_pattern(word) for word in words)))
+            for level, words in SENIORITY_RULES
+        ]
+        self._cache: Dict[str, RoleMatch] = {}
+
+    def _role_id(self, family: str, role: str) -> int:
+        key = (family, role)
+        if key not in self.index:
+            self.index[key] = len(self.roles)
+            self.roles.append(key)
+        return self.index[key]
+
+    def classify(self, title: str) -> RoleMatch:
+        """職稱 → RoleMatch；同一職稱只解析一次"""
+        if not isinstance(title, str):
+            title = ""
+        found = self._cache.get(title)
+        if found is None:
+            text = title.strip().lower()
+            role_id = self._lookup(text)
+            family, role = self.roles[role_id] if role_id >= 0 else (None, None)
+            found = RoleMatch(role_id, family, role, self._seniority(text))
+            self._cache[title] = found
+        return found
+
+    def _lookup(self, text: str) -> int:
+        best_id, best_length = -1, 0
+        size = len(text)
+        for start in range(size):
+            if start and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+                continue
+            node = self.trie
+            end = start
+            while end < size:
+                node = node.get(text[end])
+                if node is None:
+                    break
+                end += 1
+                role_id = node.get(self._END)
+                if role_id is not None and end - start > best_length:
+                    if not (end < size and _is_word_char(text[end - 1]) and _is_word_char(text[end])):
+                        best_id, best_length = role_id, end - start
+        return best_id
+
+    def _seniority(self, text: str) -> str:
+        for level, pattern in self.seniority_patterns:
+            if pattern.search(text):
+                if level == "Manager" and NOT_MANAGER_LEVEL.search(text):
+                    continue
+                return level
+        return DEFAULT_SENIORITY
+
+
+def _is_word_char(char: str) -> bool:
+    """英數字（中文字不算，中文別名直接子字串比對）"""
+    return char.isascii() and char.isalnum()
+
+
+@functools.lru_cache(maxsize=None)
+def role_taxonomy() -> RoleTaxonomy:
+    """每個行程只載入一次"""
+    return RoleTaxonomy(_load("role-taxonomy.json"))
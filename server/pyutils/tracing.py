@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+tracing.py - 輕量追蹤與計數
+
+記錄每個階段（span）的耗時、資料筆數與吞吐量，執行結束後輸出成
+JSON 或 Prometheus text format，用來找出夜間批次的時間花在哪裡。
+
+    from pyutils.tracing import tracer
+
+    with tracer.span("import_candidates") as span:
+        for row in rows:
+            ...
+            span.count("rows")
+
+    @tracer.traced("generate_persona")
+    def generate_persona(...): ...
+
+輸出方式（擇一）：
+- CLI 參數 --trace out.json / --trace out.prom（呼叫 tracer.configure）
+- 環境變數 STEP1NE_TRACE=out.json
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class SpanStats:
+    """同一個 span 路徑的累計統計"""
+
+    __slots__ = ("calls", "total", "min", "max", "counters")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.counters: Dict[str, float] = {}
+
+    def add(self, duration: float, counters: Dict[str, float]):
+        self.calls += 1
+        self.total += duration
+        self.min = min(self.min, duration)
+        self.max = max(self.max, duration)
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self, path: str) -> Dict:
+        return {
+            "span": path,
+            "calls": self.calls,
+            "total_s": round(self.total, 6),
+            "avg_s": round(self.total / self.calls, 6) if self.calls else 0,
+            "min_s": round(self.min, 6) if self.calls else 0,
+            "max_s": round(self.max, 6),
+            "counters": self.counters,
+            # 吞吐量：span 內計數 ÷ span 累計秒數
+            "throughput_per_s": {
+                name: round(value / self.total, 2) if self.total > 0 else 0
+                for name, value in self.counters.items()
+            }
+        }
+
+
+class _ActiveSpan:
+    """進行中的 span，提供 count() 累加計數"""
+
+    __slots__ = ("path", "started", "counters")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.perf_counter()
+        self.counters: Dict[str, float] = {}
+
+    def count(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+
+class Tracer:
+    """以 span 路徑（父/子）彙總耗時與計數"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.spans: Dict[str, SpanStats] = {}
+        self.counters: Dict[str, float] = {}
+        self.started_at = time.time()
+        self.output: Optional[str] = None
+        self._registered = False
+
+    # ---------- 設定 ----------
+
+    def configure(self, output: Optional[str] = None):
+        """
+        設定輸出檔案（.prom 為 Prometheus 格式，其餘為 JSON）
+
+        未指定時沿用環境變數 STEP1NE_TRACE；程式結束時自動輸出。
+        """
+        self.output = output or os.environ.get("STEP1NE_TRACE") or None
+        if self.output and not self._registered:
+            atexit.register(self._export_at_exit)
+            self._registered = True
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.output)
+
+    # ---------- 記錄 ----------
+
+    def _stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def current_path(self) -> str:
+        stack = self._stack()
+        return stack[-1].path if stack else ""
+
+    @contextmanager
+    def span(self, name: str):
+        stack = self._stack()
+        path = f"{stack[-1].path}/{name}" if stack else name
+        active = _ActiveSpan(path)
+        stack.append(active)
+        try:
+            yield active
+        finally:
+            stack.pop()
+            duration = time.perf_counter() - active.started
+            with self.lock:
+                stats = self.spans.get(path)
+                if stats is None:
+                    stats = self.spans[path] = SpanStats()
+                stats.add(duration, active.counters)
+                for counter, value in active.counters.items():
+                    self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def traced(self, name: Optional[str] = None):
+        """把函數（或方法）包成 span 的 decorator"""
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name: str, value: float = 1):
+        """累加到目前的 span；不在任何 span 內時只累加全域計數"""
+        stack = self._stack()
+        if stack:
+            stack[-1].count(name, value)
+        else:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, data: Dict, prefix: Optional[str] = None):
+        """
+        合併另一個行程輸出的 JSON 追蹤結果
+
+        prefix 預設為目前的 span 路徑，子行程的 span 會掛在它底下。
+        """
+        prefix = self.current_path() if prefix is None else prefix
+        with self.lock:
+            for item in data.get("spans", []):
+                path = f"{prefix}/{item['span']}" if prefix else item["span"]
+                stats = self.spans.get(path)
+                if stats is None:
+                    stats = self.spans[path] = SpanStats()
+                stats.calls += item["calls"]
+                stats.total += item["total_s"]
+                stats.min = min(stats.min, item["min_s"])
+                stats.max = max(stats.max, item["max_s"])
+                for counter, value in item.get("counters", {}).items():
+                    stats.counters[counter] = stats.counters.get(counter, 0) + value
+
+    # ---------- 輸出 ----------
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            return {
+                "started_at": self.started_at,
+                "duration_s": round(time.time() - self.started_at, 3),
+                "pid": os.getpid(),
+                "counters": dict(self.counters),
+                "spans": [stats.to_dict(path) for path, stats in sorted(self.spans.items())]
+            }
+
+    def to_prometheus(self) -> str:
+        data = self.to_dict()
+        lines = [
+            "# HELP step1ne_span_seconds_total Total time spent in span",
+            "# TYPE step1ne_span_seconds_total counter",
+        ]
+        for item in data["spans"]:
+            lines.append(f'step1ne_span_seconds_total{{span="{item["span"]}"}} {item["total_s"]}')
+        lines += [
+            "# HELP step1ne_span_calls_total Number of times span was entered",
+            "# TYPE step1ne_span_calls_total counter",
+        ]
+        for item in data["spans"]:
+            lines.append(f'step1ne_span_calls_total{{span="{item["span"]}"}} {item["calls"]}')
+        lines += [
+            "# HELP step1ne_span_items_total Items processed inside span",
+            "# TYPE step1ne_span_items_total counter",
+        ]
+        for item in data["spans"]:
+            for counter, value in item["counters"].items():
+                lines.append(f'step1ne_span_items_total{{span="{item["span"]}",counter="{counter}"}} {value}')
+        lines += [
+            "# HELP step1ne_items_total Items processed in this run",
+            "# TYPE step1ne_items_total counter",
+        ]
+        for counter, value in sorted(data["counters"].items()):
+            lines.append(f'step1ne_items_total{{counter="{counter}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: Optional[str] = None):
+        path = path or self.output
+        if not path:
+            return
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".prom"):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def _export_at_exit(self):
+        try:
+            self.export()
+        except OSError:
+            pass
+
+
+# 每個行程共用一個 tracer
+tracer = Tracer()
@@ -0,0 +1,77 @@
+"""pyutils/dedup.py：匯入前的重複候選人合併"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pyutils.dedup import CandidateDeduper
+
+HEADER = ['姓名', 'Email', '電話', '技能', '工作經歷JSON']
+HISTORY = json.dumps([
+    {'company': '台積電', 'position': '資深工程師'},
+    {'company': '聯發科', 'position': '工程師'},
+], ensure_ascii=False)
+
+
+def find(rows):
+    return CandidateDeduper(HEADER).find(rows)
+
+
+def test_same_name_with_different_contacts_is_not_merged():
+    rows = [
+        ['王小明', 'a@x.com', '0911111111', 'Python, Go, SQL, Docker', HISTORY],
+        ['王小明', 'b@y.com', '0922222222', 'Python, Go, SQL, Docker', HISTORY],
+    ]
+    assert find(rows) == []
+
+
+def test_sparse_rows_with_same_name_are_not_merged():
+    assert find([['王小明', 'a@x.com', '', 'Python', ''], ['王小明', '', '0922222222', 'Python', '']]) == []
+    assert find([['陳怡君', '', '', '', ''], ['陳怡君', '', '', '', '']]) == []
+
+
+def test_near_duplicate_without_conflicting_contacts_is_merged():
+    rows = [
+        ['王小明', 'a@x.com', '', 'Python, Go, SQL, Docker', HISTORY],
+        ['王小明', '', '0911111111', 'Python, Go, SQL, Docker', HISTORY],
+    ]
+    groups = find(rows)
+    assert [group['rows'] for group in groups] == [[0, 1]]
+    assert groups[0]['reasons'][1].startswith('相似度')
+
+
+def test_blocking_key_merges_regardless_of_features():
+    rows = [
+        ['王小明', 'A@X.com', '', '', ''],
+        ['Wang Xiaoming', 'a@x.com ', '', '', ''],
+    ]
+    groups = find(rows)
+    assert [group['rows'] for group in groups] == [[0, 1]]
+    assert groups[0]['reasons'][1] == 'email 相同'
+
+
+def test_conflict_is_checked_against_the_whole_group():
+    # 0、1 以電話合併後帶有 a@x.com；2 雖與 1 近似，但 Email 與整群衝突
+    rows = [
+        ['王小明', 'a@x.com', '0911111111', '', ''],
+        ['王小明', '', '0911111111', 'Python, Go, SQL, Docker', HISTORY],
+        ['王小明', 'b@y.com', '', 'Python, Go, SQL, Docker', HISTORY],
+    ]
+    assert [group['rows'] for group in find(rows)] == [[0, 1]]
+
+
+def test_shared_phone_with_different_emails_is_not_merged():
+    rows = [
+        ['王小明', 'ming@a.com', '02-2345-6789', 'Python', ''],
+        ['陳大華', 'hua@b.com', '02-2345-6789', 'Revit', ''],
+    ]
+    assert find(rows) == []
+
+
+def test_same_email_with_different_phones_is_merged():
+    rows = [
+        ['王小明', 'ming@a.com', '0911111111', '', ''],
+        ['王小明', 'ming@a.com', '0922222222', '', ''],
+    ]
+    assert [group['rows'] for group in find(rows)] == [[0, 1]]
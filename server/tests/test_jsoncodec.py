@@ -0,0 +1,41 @@
+"""pyutils/jsoncodec.py：orjson 與標準函式庫 json 兩種後端"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pyutils import jsoncodec
+
+REPORT = {
+    'candidateId': 12345,
+    'candidateName': '王小明',
+    '總分': 82.5,
+    '維度評分': {'技能匹配': 88.0, '成長匹配': 75.3, '文化匹配': 80.0, '動機匹配': 1e-7},
+    '技能組合': ['Python', 'Go', 'SQL'],
+    'summary': {'A': 3, 'B': 0, 'ratio': 1e20, 'missing': None, 'ok': True},
+}
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def backend(request, monkeypatch):
+    if request.param == 'orjson':
+        if jsoncodec.orjson is None:
+            pytest.skip('orjson 未安裝')
+    else:
+        monkeypatch.setattr(jsoncodec, 'orjson', None)
+    return request.param
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_reports_round_trip_to_the_same_values(backend, compact):
+    data = jsoncodec.dumps(REPORT, compact)
+    assert json.loads(data) == REPORT
+    assert jsoncodec.loads(data) == REPORT
+    assert '王小明' in data.decode('utf-8')
+
+
+def test_compact_output_has_no_whitespace(backend):
+    assert b' ' not in jsoncodec.dumps({'a': [1, 2], 'b': 'x'}, compact=True)
@@ -0,0 +1,62 @@
+"""pyutils/score_store.py：保存的維度分數與權重重新排序"""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pyutils import score_store
+from pyutils.score_store import DEFAULT_WEIGHTS, DIMENSIONS, ScoreStore
+
+
+def batch_reports(count, seed=7):
+    """仿 PersonaMatcher：未四捨五入的維度分數加權後才四捨五入成總分；依總分穩定排序（大量同分）"""
+    rng = random.Random(seed)
+    reports = []
+    for i in range(count):
+        raw = {name: rng.choice([60, 70, 75, 80, 85, 90]) + rng.random() for name in DIMENSIONS}
+        total = sum(raw[name] * DEFAULT_WEIGHTS[name] for name in DIMENSIONS)
+        reports.append({
+            'candidateId': i,
+            'candidateName': f'c{i}',
+            '總分': round(total, 1),
+            '維度評分': {name: round(value, 1) for name, value in raw.items()}
+        })
+    reports.sort(key=lambda x: x['總分'], reverse=True)
+    return reports
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        if score_store.numpy is None:
+            pytest.skip('numpy 未安裝')
+    else:
+        monkeypatch.setattr(score_store, 'numpy', None)
+    return request.param
+
+
+def test_default_weights_keep_original_order(backend, tmp_path):
+    reports = batch_reports(2000)
+    path = str(tmp_path / 'run.scores')
+    ScoreStore.from_reports(reports).save(path)
+    ranking = ScoreStore.open(path).rerank({}, top_k=len(reports))
+    assert [item['rank'] for item in ranking] == [item['原名次'] for item in ranking]
+    assert [item['總分'] for item in ranking] == [report['總分'] for report in reports]
+
+
+def test_new_weights_rank_on_rounded_totals_with_ties_in_original_order(backend):
+    store = ScoreStore.from_reports(batch_reports(2000))
+    ranking = store.rerank({'技能匹配': 1, '成長匹配': 0, '文化匹配': 0, '動機匹配': 0}, top_k=2000)
+    keys = [(-item['總分'], item['原名次']) for item in ranking]
+    assert keys == sorted(keys)
+    assert all(item['總分'] == item['維度評分']['技能匹配'] for item in ranking)
+
+
+def test_weight_profiles_accept_short_names_and_reject_unknown_dimensions():
+    profiles = {'default': {'技能': 0.9, '動機': 0.1}, 'recruiters': {'Jacky': {'技能匹配': 1, '文花': 2}}}
+    assert score_store.resolve_weights(profiles) == {'技能匹配': 0.9, '動機匹配': 0.1}
+    with pytest.raises(ValueError, match='文花'):
+        score_store.resolve_weights(profiles, recruiter='Jacky')
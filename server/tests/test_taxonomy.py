@@ -0,0 +1,21 @@
+"""pyutils/taxonomy.py：產業推斷"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pyutils.taxonomy import industry_taxonomy
+
+
+def test_generic_tech_companies_are_recognised():
+    # 舊版以「科技 / 軟體」判定為科技業，taxonomy 至少要涵蓋這些公司名稱
+    taxonomy = industry_taxonomy()
+    for company in ('宏碁軟體', 'XX科技股份有限公司', '精誠資訊', 'Acme Software Inc'):
+        assert taxonomy.infer(company) == ['Tech'], company
+
+
+def test_longer_aliases_win_over_generic_tech():
+    taxonomy = industry_taxonomy()
+    assert taxonomy.infer('金融科技公司') == ['Fintech']
+    assert taxonomy.infer('software as a service') == ['SaaS']
+    assert taxonomy.infer('EdTech') == ['Education']